@@ -0,0 +1,173 @@
+#     Copyright (C) 2007 William McCune
+#
+#     This file is part of the LADR Deduction Library.
+#
+#     The LADR Deduction Library is free software; you can redistribute it
+#     and/or modify it under the terms of the GNU General Public License
+#     as published by the Free Software Foundation; either version 2 of the
+#     License, or (at your option) any later version.
+#
+#     The LADR Deduction Library is distributed in the hope that it will be
+#     useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+#     MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#     GNU General Public License for more details.
+#
+#     You should have received a copy of the GNU General Public License
+#     along with the LADR Deduction Library; if not, write to the Free Software
+#     Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+
+# system imports
+
+import threading
+import Queue
+
+# local imports
+
+from utilities import State
+from programs import Job, Prover9, Mace4
+from supervisor import call_later
+
+# Running Prover9 and Mace4 from other programs, without the GUI:
+#
+#     search = prove(input, {'max_seconds': 60})
+#     for event in search:              # or search.wait()
+#         if event.kind == 'proof':
+#             print event.data
+#     print search.message, search.solution
+#
+# A search starts at once and runs on the supervisor (no thread per
+# search).  Its events are 'proof' or 'model' (each solution as soon as
+# it is extracted), 'stats' (the statistics on stderr, every few
+# seconds, as a dict), and finally 'done' (the exit message).
+# cancel() stops it softly, keeping its statistics and solutions.
+
+Stats_interval = 2.0  # seconds
+
+class Event:
+    def __init__(self, kind, data):
+        self.kind = kind
+        self.data = data
+
+    def __repr__(self):
+        return '<Event %s>' % self.kind
+
+# end class Event
+
+def option_commands(options):
+    "LADR commands for a dictionary of options: True/False for flags."
+    lines = []
+    for name in sorted(options):
+        value = options[name]
+        if value is True:
+            lines.append('set(%s).\n' % name)
+        elif value is False:
+            lines.append('clear(%s).\n' % name)
+        else:
+            lines.append('assign(%s, %s).\n' % (name, value))
+    return ''.join(lines)
+
+class Search(Job):
+    """
+    A Job with an event queue.  Iterate over it (or over events()) for
+    the events; wait() for the end; cancel() to stop it.
+    """
+    def __init__(self, program, input, options=None,
+                 stats_interval=Stats_interval, **kwargs):
+        if options:
+            input = option_commands(options) + input
+        input = 'assign(report_stderr, 2).\n' + input  # for the stats
+        Job.__init__(self, program, input, **kwargs)
+        self.kind = program.solution_name.lower()  # proof, model
+        self.queue = Queue.Queue()
+        self.done = threading.Event()
+        self.message = None
+        self.stats_interval = stats_interval
+        self.start()
+        if self.state == State.running and stats_interval:
+            call_later(stats_interval, self.poll_stats)
+
+    def stats(self):
+        "The latest statistics, as a dict (values are strings)."
+        info = self.get_stderr_info()
+        return dict(info) if info else {}
+
+    def poll_stats(self):
+        if self.state in [State.running, State.suspended]:
+            self.queue.put(Event('stats', self.stats()))
+            call_later(self.stats_interval, self.poll_stats)
+
+    # Job hooks, called from worker threads
+
+    def solution_found(self, solution):
+        self.queue.put(Event(self.kind, solution))
+
+    def finished(self):
+        if self.state == State.error:
+            self.message = 'Program_Not_Found'
+        else:
+            self.message = (self.limit_message or
+                            self.program.exit_message(self.exit_code))
+            self.queue.put(Event('stats', self.stats()))
+        self.queue.put(Event('done', self.message))
+        self.done.set()
+
+    # For the caller
+
+    def events(self, timeout=None):
+        """Generate the events, ending with 'done'.  With a timeout
+        (seconds), stop early if no event comes in that time."""
+        while True:
+            try:
+                event = self.queue.get(True, timeout or 1e9)
+            except Queue.Empty:
+                return
+            yield event
+            if event.kind == 'done':
+                return
+
+    def __iter__(self):
+        return self.events()
+
+    def solutions(self):
+        "Generate the solutions as they are found."
+        for event in self.events():
+            if event.kind == self.kind:
+                yield event.data
+
+    def wait(self, timeout=None):
+        "Wait for the end; return the solution (None if none or timeout)."
+        self.done.wait(timeout)
+        return self.solution
+
+    def cancel(self, hard=False):
+        "Stop the search; with hard, kill it without waiting for results."
+        if hard:
+            self.kill()
+        else:
+            self.stop()
+
+    def close(self):
+        "Free the spools (after the search is done)."
+        self.done_with_job()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, type, value, tb):
+        if not self.done.isSet():
+            self.cancel()
+            self.done.wait()
+        self.close()
+        return False
+
+# end class Search
+
+def prove(input, options=None, **kwargs):
+    """Start a Prover9 search.  kwargs go to programs.Job (deadline,
+    priority, profile, filter_output)."""
+    return Search(Prover9(), input, options, **kwargs)
+
+def find_models(input, options=None, **kwargs):
+    "Start a Mace4 search (see prove)."
+    return Search(Mace4(), input, options, **kwargs)
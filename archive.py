@@ -0,0 +1,256 @@
+#     Copyright (C) 2007 William McCune
+#
+#     This file is part of the LADR Deduction Library.
+#
+#     The LADR Deduction Library is free software; you can redistribute it
+#     and/or modify it under the terms of the GNU General Public License
+#     as published by the Free Software Foundation; either version 2 of the
+#     License, or (at your option) any later version.
+#
+#     The LADR Deduction Library is distributed in the hope that it will be
+#     useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+#     MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#     GNU General Public License for more details.
+#
+#     You should have received a copy of the GNU General Public License
+#     along with the LADR Deduction Library; if not, write to the Free Software
+#     Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+
+# system imports
+
+import re
+import zlib
+import bisect
+import tempfile
+import threading
+
+try:
+    import lzma
+except ImportError:
+    try:
+        from backports import lzma
+    except ImportError:
+        lzma = None
+
+# local imports
+
+from spool import spool_dir
+
+# Output with print_gen or print_kept can be enormous, but clause
+# listings compress very well.  An Archive compresses the stream as it
+# arrives, in independently compressed frames, and keeps an index of
+# the frames so that a reader can decompress just the part it needs.
+
+Frame_size = 1024 * 1024  # uncompressed bytes per frame
+
+Big_output_pattern = re.compile(
+    r'(^|\n)\s*set\s*\(\s*print_(gen|kept)\s*\)\s*\.')
+
+def wants_archive(input):
+    "Does this input ask for the kind of output that should be compressed?"
+    return Big_output_pattern.search(input) != None
+
+class Archive:
+    """
+    A compressed, append-only byte stream with a frame index.  It has
+    the same interface as spool.Spool (write, getvalue, readlines,
+    chunks, len, close), so it can be used for the stdout of a job,
+    plus read(offset, n), find(), head(), tail() and write_to().
+    """
+    def __init__(self, method='zlib', frame_size=Frame_size, quota=None,
+                 file=None):
+        if method == 'lzma' and not lzma:
+            method = 'zlib'
+        self.method = method
+        self.frame_size = frame_size
+        self.quota = quota
+        if file:
+            self.file = file  # frames already written (see reopen)
+        else:
+            self.file = tempfile.TemporaryFile('w+b', dir=spool_dir())
+        self.pending = []        # data not yet in a frame
+        self.pending_size = 0
+        self.starts = []         # uncompressed offset of each frame
+        self.index = []          # (file offset, compressed length, length)
+        self.framed = 0          # uncompressed bytes in frames
+        self.size = 0            # total uncompressed bytes
+        self.disk_bytes = 0
+        self.truncated = False
+        self.closed = False
+        self.lock = threading.RLock()
+
+    def __len__(self):
+        return self.size
+
+    def compress(self, data):
+        if self.method == 'lzma':
+            return lzma.compress(data)
+        else:
+            return zlib.compress(data, 6)
+
+    def decompress(self, data):
+        if self.method == 'lzma':
+            return lzma.decompress(data)
+        else:
+            return zlib.decompress(data)
+
+    def write(self, data):
+        with self.lock:
+            if self.truncated or self.closed:
+                return
+            self.pending.append(data)
+            self.pending_size += len(data)
+            while self.pending_size >= self.frame_size and not self.truncated:
+                buf = ''.join(self.pending)
+                self.pending = [buf[self.frame_size:]]
+                self.pending_size = len(self.pending[0])
+                self.add_frame(buf[:self.frame_size])
+            self.size = self.framed + self.pending_size
+
+    def add_frame(self, data):
+        packed = self.compress(data)
+        if self.quota and self.quota.reserve(len(packed)) < len(packed):
+            # Out of disk quota: keep what is already in frames.
+            self.truncated = True
+            self.pending = []
+            self.pending_size = 0
+            return
+        self.file.seek(0, 2)
+        offset = self.file.tell()
+        self.file.write(packed)
+        self.starts.append(self.framed)
+        self.index.append((offset, len(packed), len(data)))
+        self.framed += len(data)
+        self.disk_bytes += len(packed)
+
+    def frame(self, i):
+        (offset, packed_len, _) = self.index[i]
+        self.file.flush()
+        self.file.seek(offset)
+        return self.decompress(self.file.read(packed_len))
+
+    def chunks(self):
+        "Generate the uncompressed data, one frame at a time."
+        i = 0
+        while True:
+            with self.lock:
+                if i < len(self.index):
+                    data = self.frame(i)
+                elif i == len(self.index):
+                    data = ''.join(self.pending)
+                else:
+                    return
+            i += 1
+            if data:
+                yield data
+
+    def read(self, offset, n):
+        "Uncompressed bytes [offset, offset+n), decompressing only those frames."
+        with self.lock:
+            end = min(offset + n, self.size)
+            parts = []
+            i = max(0, bisect.bisect_right(self.starts, offset) - 1)
+            pos = self.starts[i] if self.starts else 0
+            while pos < end:
+                if i < len(self.index):
+                    data = self.frame(i)
+                else:
+                    data = ''.join(self.pending)
+                    if not data:
+                        break
+                parts.append(data[max(0, offset - pos):end - pos])
+                pos += len(data)
+                i += 1
+            return ''.join(parts)
+
+    def head(self, n):
+        return self.read(0, n)
+
+    def tail(self, n):
+        return self.read(max(0, self.size - n), n)
+
+    def find(self, s):
+        "Like str.find, but frame by frame (matches may cross frames)."
+        overlap = ''
+        base = 0  # offset of overlap in the stream
+        for data in self.chunks():
+            buf = overlap + data
+            i = buf.find(s)
+            if i >= 0:
+                return base + i
+            keep = min(len(buf), max(0, len(s) - 1))
+            overlap = buf[len(buf) - keep:]
+            base += len(buf) - keep
+        return -1
+
+    def getvalue(self):
+        return ''.join(list(self.chunks()))
+
+    def readlines(self):
+        return self.getvalue().splitlines(True)
+
+    def stdin_file(self):
+        return None  # always fed through a pipe, frame by frame
+
+    def write_to(self, f):
+        for data in self.chunks():
+            f.write(data)
+
+    def frames(self):
+        """Generate (compressed frame, length), for copying the archive
+        without compressing it again; the data not yet in a frame comes
+        last, compressed now."""
+        i = 0
+        while True:
+            with self.lock:
+                if i < len(self.index):
+                    (offset, packed_len, length) = self.index[i]
+                    self.file.flush()
+                    self.file.seek(offset)
+                    packed = self.file.read(packed_len)
+                elif i == len(self.index):
+                    data = ''.join(self.pending)
+                    if not data:
+                        return
+                    (packed, length) = (self.compress(data), len(data))
+                else:
+                    return
+            i += 1
+            yield (packed, length)
+
+    def ratio(self):
+        if self.disk_bytes == 0:
+            return 1.0
+        return float(self.framed) / self.disk_bytes
+
+    def close(self):
+        with self.lock:
+            if not self.closed:
+                self.file.close()
+                if self.quota and self.disk_bytes:
+                    self.quota.release(self.disk_bytes)
+                self.disk_bytes = 0
+                self.pending = []
+                self.closed = True
+
+# end class Archive
+
+def reopen(file, base, index, method='zlib'):
+    """A read-only Archive over frames already in a file (e.g., a session
+    bundle): index is [(offset from base, compressed length, length)]."""
+    a = Archive(method, file=file)
+    for (offset, packed_len, length) in index:
+        a.starts.append(a.framed)
+        a.index.append((base + offset, packed_len, length))
+        a.framed += length
+        a.disk_bytes += packed_len
+    a.size = a.framed
+    return a
+
+def as_text(output):
+    "The output of a job as a string, whether it was archived or not."
+    if isinstance(output, Archive):
+        return output.getvalue()
+    else:
+        return output
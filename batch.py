@@ -0,0 +1,382 @@
+#     Copyright (C) 2007 William McCune
+#
+#     This file is part of the LADR Deduction Library.
+#
+#     The LADR Deduction Library is free software; you can redistribute it
+#     and/or modify it under the terms of the GNU General Public License
+#     as published by the Free Software Foundation; either version 2 of the
+#     License, or (at your option) any later version.
+#
+#     The LADR Deduction Library is distributed in the hope that it will be
+#     useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+#     MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#     GNU General Public License for more details.
+#
+#     You should have received a copy of the GNU General Public License
+#     along with the LADR Deduction Library; if not, write to the Free Software
+#     Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+
+# system imports
+
+import re
+import time
+import threading
+import traceback
+
+# local imports
+
+from utilities import State
+from api import option_commands
+from job_server import pool_client, Remote_profile, encode
+
+# A batch is a set of jobs submitted together to the pool (a job server
+# if PROVER9_MACE4_SERVER is set, else the workers of this process), and
+# watched by one thread: on_done(key, status) is called as each job is
+# over, with the statistics (a dict) in status['stats'].  The keys are
+# the caller's (a point of a sweep, a seed, a goal).  A Job_group is a
+# batch that the GUI can run as if it were one job.
+
+Poll_interval = 0.25  # seconds
+
+def with_options(input, options, program_name):
+    """The input with options (a dict, see api.option_commands) that
+    override those already in it: they go just before the first list of
+    formulas, in an if(program) block."""
+    commands = 'if(%s).\n%send_if.\n\n' % (program_name,
+                                           option_commands(options))
+    m = re.search('^\s*formulas\s*\(', input, re.MULTILINE)
+    if m:
+        return input[:m.start()] + '\n' + commands + input[m.start():]
+    return input + '\n' + commands
+
+def cpu_seconds(status):
+    "The CPU seconds in the statistics of a status, or None."
+    try:
+        return float(status['stats'].get('CPU Seconds'))
+    except (KeyError, TypeError, ValueError):
+        return None
+
+class Batch:
+    def __init__(self, client=None, on_done=None):
+        self.client = client or pool_client()
+        self.on_done = on_done
+        self.keys = {}        # job id -> key
+        self.ids = {}         # key -> job id
+        self.pending = set()  # job ids not yet over
+        self.statuses = {}    # key -> the last status
+        self.lock = threading.Lock()
+        self.watching = False
+        self.done = threading.Event()
+        self.done.set()
+
+    def submit(self, key, program_name, input, deadline=None,
+               priority='batch'):
+        id = self.client.call('submit', program=program_name, input=input,
+                              deadline=deadline, priority=priority)
+        with self.lock:
+            self.keys[id] = key
+            self.ids[key] = id
+            self.pending.add(id)
+            self.done.clear()
+            start = not self.watching
+            self.watching = True
+        if start:
+            t = threading.Thread(target=self.watch, name='batch')
+            t.setDaemon(True)
+            t.start()
+        return id
+
+    def watch(self):
+        try:
+            while self.poll():
+                time.sleep(Poll_interval)
+        except Exception:
+            traceback.print_exc()
+            with self.lock:
+                self.watching = False
+                self.done.set()  # nobody waits forever
+
+    def poll(self):
+        "Look at each pending job once; False (and done) if none is left."
+        with self.lock:
+            pending = sorted(self.pending)
+            if not pending:
+                self.watching = False
+                self.done.set()
+                return False
+        for id in pending:
+            try:
+                status = self.client.call('status', id=id)
+                if status['state'] not in ['done', 'error']:
+                    continue
+                status['stats'] = dict(self.client.call('stats', id=id))
+            except Exception as e:
+                # The job cannot be followed: it is over, as an error.
+                traceback.print_exc()
+                status = {'id': id, 'state': 'error', 'exit_code': None,
+                          'message': '%s: %s' % (e.__class__.__name__, e),
+                          'limit_message': None, 'profile': None,
+                          'stop_reason': None,
+                          'solutions': 0, 'has_solution': False,
+                          'output_bytes': 0, 'times': {}, 'stats': {}}
+            with self.lock:
+                self.pending.discard(id)
+                self.statuses[self.keys[id]] = status
+            if self.on_done:
+                try:
+                    self.on_done(self.keys[id], status)
+                except Exception:
+                    traceback.print_exc()
+        return True
+
+    def call(self, method, key, **params):
+        "A job server method for the job of a key, e.g., call('solution', k)."
+        return self.client.call(method, id=self.ids[key], **params)
+
+    def running(self):
+        "The keys of the jobs not yet over."
+        with self.lock:
+            return [self.keys[id] for id in self.pending]
+
+    def cancel(self, hard=False):
+        "Stop the jobs not yet over (they are reported as usual)."
+        with self.lock:
+            pending = sorted(self.pending)
+        for id in pending:
+            self.client.call('cancel', id=id, hard=hard)
+
+    def wait(self, timeout=None):
+        "Wait for all jobs to be over; return True if they are."
+        self.done.wait(timeout)
+        return self.done.isSet()
+
+    def close(self):
+        "Forget the jobs on the server (after they are over)."
+        with self.lock:
+            ids = [id for id in self.keys if id not in self.pending]
+        for id in ids:
+            self.client.call('remove', id=id)
+        self.client.close()
+
+# end class Batch
+
+class Part:
+    "A job of a Job_group, and its outcome when it is over."
+    def __init__(self, index, label, input):
+        self.index = index
+        self.label = label    # e.g., 'Goal 2: p(a)'
+        self.input = input
+        self.status = None
+        self.message = 'Queued'
+        self.cpu = None
+        self.solution = None
+
+    def header(self):
+        cpu = '%.2f' % self.cpu if self.cpu is not None else '?'
+        return '%% %s.\n%%   %s, %s CPU seconds.\n' % (self.label,
+                                                    self.message, cpu)
+
+# end class Part
+
+class Job_group:
+    """
+    One search as several jobs (parts) on the pool, with the attributes
+    and methods of a programs.Job that the GUI uses, and the same hooks
+    (solution_found, finished), called from the batch's thread.
+    Subclasses make the parts and say how their outcomes combine
+    (part_finished, exit_code_of, solution_of); a part may be added
+    while the others run.
+    """
+    def __init__(self, program, input, parts, filter_output=False,
+                 deadline=None, priority='interactive', profile=None,
+                 options=None, client=None):
+        self.program = program
+        self.input = input
+        self.parts = parts
+        self.filter_output = filter_output
+        self.deadline = deadline
+        self.priority = priority
+        self.full_output = None
+        self.extracted = []
+        self.stop_reason = None
+        self.holds = set()
+        self.profile = Remote_profile('')
+        self.limit_message = None
+        self.output = None
+        self.solution = None
+        self.variants = {}
+        self.exit_code = None
+        self.state = State.ready
+        self.ring = Group_ring(self)
+        self.client = client
+        self.batch = None
+
+    def start(self):
+        self.state = State.running  # before a part can be over
+        try:
+            self.batch = Batch(self.client, self.part_done)
+            for part in list(self.parts):
+                self.submit(part)
+        except Exception as e:  # socket.error, Rpc_error
+            self.output = 'The jobs could not be submitted: %s\n' % e
+            self.state = State.error
+            if self.batch:
+                self.batch.cancel(hard=True)
+            self.finished()
+
+    def submit(self, part):
+        if part not in self.parts:
+            self.parts.append(part)
+        self.batch.submit(part.index, self.program.name, part.input,
+                          deadline=self.deadline, priority=self.priority)
+
+    def part_done(self, index, status):
+        part = [p for p in self.parts if p.index == index][0]
+        part.status = status
+        part.message = status['message']
+        part.cpu = cpu_seconds(status)
+        if status['has_solution']:
+            part.solution = encode(self.batch.call('solution', index))
+            self.extracted.append(part.solution)
+            self.solution_found(self.part_solution(part))
+        if self.state == State.error:
+            return  # finished() has been called
+        self.part_finished(part)
+        # Over when every part is, not when none is running: a part can
+        # be over before the next one is submitted.
+        if all(p.status for p in self.parts) and self.state != State.done:
+            self.fetch_results()
+            self.finished()
+
+    def fetch_results(self):
+        parts = []
+        for part in self.parts:
+            parts.append('\n%% ========== %s ==========\n%s\n' %
+                         (part.label, part.header()))
+            parts.append(self.part_output(part.index))
+        self.output = ''.join(parts)
+        self.solution = self.solution_of()
+        self.exit_code = self.exit_code_of()
+        self.profile = Remote_profile(self.parts[0].status['profile'])
+        self.state = State.done
+
+    def part_output(self, index):
+        parts = []
+        offset = 0
+        while True:
+            r = self.batch.call('output', index, offset=offset)
+            text = r['text'].encode('latin-1')
+            parts.append(text)
+            offset += len(text)
+            if not text or offset >= r['size']:
+                return ''.join(parts)
+
+    # For subclasses
+
+    def part_finished(self, part):
+        pass  # e.g., stop the others, or add parts
+
+    def part_solution(self, part):
+        return part.solution
+
+    def solution_of(self):
+        solutions = [self.part_solution(p) for p in self.parts if p.solution]
+        return '\n'.join(solutions) if solutions else None
+
+    def exit_code_of(self):
+        "0 if every part succeeded, else the exit of the first that did not."
+        for part in self.parts:
+            code = part.status['exit_code']
+            if code != 0:
+                return code if code is not None else -2
+        return 0
+
+    # Hooks for subclasses, as for programs.Job.
+
+    def solution_found(self, solution):
+        pass
+
+    def finished(self):
+        pass
+
+    def get_stderr_info(self):
+        "The totals over the parts, then each part's outcome."
+        if self.state not in [State.running, State.suspended, State.done]:
+            return None
+        totals = {}
+        names = []
+        rows = []
+        for part in self.parts:
+            if part.status:
+                info = part.status['stats'].items()
+            else:
+                try:
+                    info = self.batch.call('stats', part.index)
+                except Exception:  # socket.error, Rpc_error
+                    info = []
+            info = dict([(encode(k), encode(v)) for (k, v) in info])
+            for (name, value) in info.items():
+                if name not in names:
+                    names.append(name)
+                try:
+                    totals[name] = totals.get(name, 0) + float(value)
+                except ValueError:
+                    pass
+            cpu = info.get('CPU Seconds', '?')
+            rows.append((part.label.split(':')[0],
+                         '%s, %s s' % (part.message if part.status
+                                       else 'Running', cpu)))
+        order = ['CPU Seconds', 'Given', 'Generated', 'Kept', 'Proofs',
+                 'Models']  # as in the programs' get_info_from_stderr
+        result = []
+        for name in order + sorted([n for n in names if n not in order]):
+            if name in totals and name != 'Domain Size':
+                value = totals[name]
+                result.append((name, '%.2f' % value if 'CPU' in name
+                               else '%d' % value))
+        return result + rows
+
+    def pause(self):
+        if self.state == State.running:
+            for index in self.batch.running():
+                self.batch.call('pause', index)
+            self.state = State.suspended
+
+    def resume(self):
+        if self.state == State.suspended:
+            for index in self.batch.running():
+                self.batch.call('resume', index)
+            self.state = State.running
+
+    def stop(self, reason='user'):
+        if self.state in [State.running, State.suspended]:
+            self.stop_reason = reason
+            self.batch.cancel()
+            self.state = State.running
+
+    def kill(self):
+        if self.state in [State.running, State.suspended]:
+            self.batch.cancel(hard=True)
+
+    def done_with_job(self):
+        if self.batch and self.state in [State.done, State.error]:
+            self.batch.close()
+            self.batch = None
+
+# end class Job_group
+
+class Group_ring:
+    "Given_ring.lines() of a group: those of its first part still running."
+    def __init__(self, group):
+        self.group = group
+
+    def lines(self):
+        batch = self.group.batch
+        running = batch.running() if batch else []
+        if not running:
+            return (0, [])
+        r = batch.call('given', min(running))
+        return (r['count'], [encode(l) for l in r['lines']])
+
+# end class Group_ring
@@ -0,0 +1,327 @@
+#!/usr/bin/python2
+
+#     Copyright (C) 2007 William McCune
+#
+#     This file is part of the LADR Deduction Library.
+#
+#     The LADR Deduction Library is free software; you can redistribute it
+#     and/or modify it under the terms of the GNU General Public License
+#     as published by the Free Software Foundation; either version 2 of the
+#     License, or (at your option) any later version.
+#
+#     The LADR Deduction Library is distributed in the hope that it will be
+#     useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+#     MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#     GNU General Public License for more details.
+#
+#     You should have received a copy of the GNU General Public License
+#     along with the LADR Deduction Library; if not, write to the Free Software
+#     Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+
+"""
+A/B benchmark of two directories of LADR binaries (for example, the
+stock bin/ and a rebuilt one).  Each problem is run through the same
+pipeline with both sets of binaries, interleaved so that machine noise
+affects both sides equally:
+
+    prover9 -> prooftrans                      (Prover9 problems)
+    mace4 -c -> interpformat -> isofilter      (Mace4 problems)
+
+The downstream stages of both sides get the output of side A, so that
+each pair of runs does exactly the same work.
+
+Usage:
+    python benchmark.py [options] DIR_A DIR_B PROBLEM.in ...
+
+If a PROBLEM is a directory, the *.in files under it are used.  Problems
+with 'Mace4' in their path are given to Mace4, others to Prover9.
+"""
+
+# system imports
+
+import os
+import sys
+import math
+import time
+import random
+import argparse
+import tempfile
+import subprocess
+
+# local imports
+
+from files import *
+
+Programs = ['prover9', 'mace4', 'prooftrans', 'interpformat', 'isofilter']
+
+# Two-sided 95% critical values of Student's t, indexed by degrees of freedom.
+
+T_95 = [None, 12.706, 4.303, 3.182, 2.776, 2.571, 2.447, 2.365, 2.306,
+        2.262, 2.228, 2.201, 2.179, 2.160, 2.145, 2.131, 2.120, 2.110,
+        2.101, 2.093, 2.086, 2.080, 2.074, 2.069, 2.064, 2.060, 2.056,
+        2.052, 2.048, 2.045, 2.042]
+
+def t_95(df):
+    if df < len(T_95):
+        return T_95[df]
+    else:
+        return 1.960
+
+def timed_run(command, input):
+    """Run a command with the given stdin, and return
+    (exit_code, output, cpu_seconds, wall_seconds).  CPU time is
+    user+system time of the child, taken from wait4()."""
+    fin  = tempfile.TemporaryFile('w+b')  # stdin
+    fout = tempfile.TemporaryFile('w+b')  # stdout
+    fin.write(input)
+    fin.seek(0)
+    ferr = open(os.devnull, 'w')
+    start = time.time()
+    process = subprocess.Popen(command, stdin=fin, stdout=fout, stderr=ferr)
+    if hasattr(os, 'wait4'):
+        (_, status, usage) = os.wait4(process.pid, 0)
+        wall = time.time() - start
+        if os.WIFSIGNALED(status):
+            exit_code = -os.WTERMSIG(status)
+        else:
+            exit_code = os.WEXITSTATUS(status)
+        process.returncode = exit_code
+        cpu = usage.ru_utime + usage.ru_stime
+    else:
+        exit_code = process.wait()
+        wall = cpu = time.time() - start
+    fout.seek(0)
+    output = fout.read()
+    fin.close()
+    fout.close()
+    ferr.close()
+    return (exit_code, output, cpu, wall)
+
+def problem_files(paths):
+    problems = []
+    for path in paths:
+        if os.path.isdir(path):
+            for (dir, _, names) in sorted(os.walk(path)):
+                for name in sorted(names):
+                    if name.endswith('.in'):
+                        problems.append(os.path.join(dir, name))
+        else:
+            problems.append(path)
+    return problems
+
+def problem_program(path, forced):
+    if forced:
+        return forced
+    elif 'Mace4' in path.split(os.sep):
+        return 'mace4'
+    else:
+        return 'prover9'
+
+class Side:
+    "One directory of binaries."
+
+    def __init__(self, name, dir):
+        self.name = name
+        self.dir = dir
+
+    def command(self, program, args=[]):
+        fullpath = os.path.join(self.dir, program)
+        if not binary_ok(fullpath):
+            return None
+        else:
+            return [fullpath] + args
+
+    def missing(self, programs):
+        return [p for p in programs if not self.command(p)]
+
+# end class Side
+
+class Benchmark:
+
+    def __init__(self, side_a, side_b, problems,
+                 reps=5, forced_program=None, max_seconds=None,
+                 use_wall=False, verbose=False):
+        self.sides = (side_a, side_b)
+        self.problems = problems
+        self.reps = reps
+        self.forced_program = forced_program
+        self.max_seconds = max_seconds
+        self.use_wall = use_wall
+        self.verbose = verbose
+        # (problem, program) -> ([times A], [times B])
+        self.times = {}
+        # (problem, program) -> number of runs whose exit codes differ
+        self.mismatches = {}
+
+    def record(self, problem, program, run_a, run_b):
+        key = (problem, program)
+        if key not in self.times:
+            self.times[key] = ([], [])
+            self.mismatches[key] = 0
+        index = 3 if self.use_wall else 2
+        self.times[key][0].append(run_a[index])
+        self.times[key][1].append(run_b[index])
+        if run_a[0] != run_b[0]:
+            self.mismatches[key] += 1
+        if self.verbose:
+            sys.stderr.write('%-12s %-40s A=%.3f B=%.3f\n' %
+                             (program, os.path.basename(problem),
+                              run_a[index], run_b[index]))
+
+    def run_pair(self, program, args, input, a_first):
+        """Run one stage on both sides, in the requested order, and
+        return the two results as (A, B)."""
+        (a, b) = self.sides
+        command_a = a.command(program, args)
+        command_b = b.command(program, args)
+        if a_first:
+            run_a = timed_run(command_a, input)
+            run_b = timed_run(command_b, input)
+        else:
+            run_b = timed_run(command_b, input)
+            run_a = timed_run(command_a, input)
+        return (run_a, run_b)
+
+    def run_problem(self, problem, a_first):
+        input = open(problem).read()
+        if self.max_seconds:
+            input = 'assign(max_seconds, %d).\n' % self.max_seconds + input
+        program = problem_program(problem, self.forced_program)
+
+        if program == 'prover9':
+            (a, b) = self.run_pair('prover9', [], input, a_first)
+            self.record(problem, 'prover9', a, b)
+            if a[1].find('== PROOF ==') >= 0:
+                (a, b) = self.run_pair('prooftrans', [], a[1], a_first)
+                self.record(problem, 'prooftrans', a, b)
+        else:
+            (a, b) = self.run_pair('mace4', ['-c'], input, a_first)
+            self.record(problem, 'mace4', a, b)
+            if a[1].find('== MODEL ==') >= 0:
+                (a, b) = self.run_pair('interpformat', [], a[1], a_first)
+                self.record(problem, 'interpformat', a, b)
+                if a[0] == 0 and a[1].count('interpretation') > 1:
+                    (a, b) = self.run_pair('isofilter', [], a[1], a_first)
+                    self.record(problem, 'isofilter', a, b)
+
+    def run(self):
+        # Interleave: every repetition visits all problems (in a fresh
+        # random order), and the side that goes first alternates.
+        order = list(self.problems)
+        for rep in range(self.reps):
+            random.shuffle(order)
+            for (i, problem) in enumerate(order):
+                self.run_problem(problem, (rep + i) % 2 == 0)
+
+    # Statistics.  Everything is done on log(time_A / time_B), so that
+    # a speedup of B over A is exp(mean) and ratios combine as
+    # geometric means.
+
+    def log_ratios(self, key):
+        (ta, tb) = self.times[key]
+        # Clamp at 1ms; very short runs are dominated by timer resolution.
+        return [math.log(max(a, 0.001) / max(b, 0.001))
+                for (a, b) in zip(ta, tb)]
+
+    def problem_speedups(self):
+        "Return a list of (problem, program, speedup, low, high, n)."
+        result = []
+        for key in sorted(self.times.keys()):
+            (problem, program) = key
+            (mean, half) = mean_ci(self.log_ratios(key))
+            n = len(self.times[key][0])
+            result.append((problem, program, math.exp(mean),
+                           math.exp(mean - half), math.exp(mean + half), n))
+        return result
+
+    def program_speedups(self):
+        "Return a list of (program, geometric mean, low, high, problems)."
+        result = []
+        for program in Programs:
+            means = [mean_ci(self.log_ratios(key))[0]
+                     for key in self.times.keys() if key[1] == program]
+            if means:
+                (mean, half) = mean_ci(means)
+                result.append((program, math.exp(mean),
+                               math.exp(mean - half), math.exp(mean + half),
+                               len(means)))
+        return result
+
+    def report(self, f):
+        (a, b) = self.sides
+        f.write('A = %s\nB = %s\n' % (a.dir, b.dir))
+        f.write('%s time, %d repetitions; speedup is time(A) / time(B), '
+                'with 95%% confidence interval.\n\n' %
+                ('Wall' if self.use_wall else 'CPU', self.reps))
+        f.write('%-40s %-12s %8s %20s\n' %
+                ('Problem', 'Program', 'Speedup', '95% CI'))
+        for (problem, program, s, low, high, n) in self.problem_speedups():
+            note = ''
+            if self.mismatches[(problem, program)]:
+                note = '  (exit codes differ)'
+            f.write('%-40s %-12s %8.3f   [%7.3f, %7.3f]%s\n' %
+                    (os.path.basename(problem), program, s, low, high, note))
+        f.write('\nGeometric means over problems:\n\n')
+        f.write('%-12s %8s %20s %9s\n' %
+                ('Program', 'Speedup', '95% CI', 'Problems'))
+        for (program, s, low, high, n) in self.program_speedups():
+            f.write('%-12s %8.3f   [%7.3f, %7.3f] %9d\n' %
+                    (program, s, low, high, n))
+
+# end class Benchmark
+
+def mean_ci(xs):
+    "Return (mean, half-width of the 95% confidence interval)."
+    n = len(xs)
+    mean = sum(xs) / n
+    if n < 2:
+        return (mean, float('inf'))
+    var = sum([(x - mean) ** 2 for x in xs]) / (n - 1)
+    return (mean, t_95(n - 1) * math.sqrt(var / n))
+
+def main(argv):
+    parser = argparse.ArgumentParser(
+        description='Compare two directories of LADR binaries.')
+    parser.add_argument('dir_a', help='baseline binaries (e.g., bin)')
+    parser.add_argument('dir_b', help='candidate binaries')
+    parser.add_argument('problems', nargs='+',
+                        help='input files or directories of *.in files')
+    parser.add_argument('-n', '--reps', type=int, default=5,
+                        help='repetitions per problem (default 5)')
+    parser.add_argument('-t', '--max-seconds', type=int, default=None,
+                        help='time limit given to prover9/mace4')
+    parser.add_argument('-p', '--program', choices=['prover9', 'mace4'],
+                        help='give every problem to this program')
+    parser.add_argument('-w', '--wall', action='store_true',
+                        help='compare wall-clock instead of CPU time')
+    parser.add_argument('-s', '--seed', type=int, default=None,
+                        help='seed for the problem order')
+    parser.add_argument('-v', '--verbose', action='store_true')
+    args = parser.parse_args(argv)
+
+    side_a = Side('A', args.dir_a)
+    side_b = Side('B', args.dir_b)
+    for side in [side_a, side_b]:
+        missing = side.missing(Programs)
+        if missing:
+            sys.stderr.write('%s: missing binaries in %s: %s\n' %
+                             (side.name, side.dir, ' '.join(missing)))
+            return 1
+
+    problems = problem_files(args.problems)
+    if not problems:
+        sys.stderr.write('no problems found\n')
+        return 1
+
+    random.seed(args.seed)
+    bench = Benchmark(side_a, side_b, problems, reps=args.reps,
+                      forced_program=args.program,
+                      max_seconds=args.max_seconds,
+                      use_wall=args.wall, verbose=args.verbose)
+    bench.run()
+    bench.report(sys.stdout)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
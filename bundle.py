@@ -0,0 +1,258 @@
+#     Copyright (C) 2007 William McCune
+#
+#     This file is part of the LADR Deduction Library.
+#
+#     The LADR Deduction Library is free software; you can redistribute it
+#     and/or modify it under the terms of the GNU General Public License
+#     as published by the Free Software Foundation; either version 2 of the
+#     License, or (at your option) any later version.
+#
+#     The LADR Deduction Library is distributed in the hope that it will be
+#     useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+#     MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#     GNU General Public License for more details.
+#
+#     You should have received a copy of the GNU General Public License
+#     along with the LADR Deduction Library; if not, write to the Free Software
+#     Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+
+# system imports
+
+import os
+import json
+import time
+import zlib
+import struct
+import zipfile
+
+# local imports
+
+from utilities import State
+from archive import Archive, Frame_size, reopen
+from streams import Given_ring
+
+# A session bundle (*.p9m4) keeps a problem and its results: the text of
+# the setup boxes, the option state, and for each program the input,
+# statistics, output, solution and reformatted variants of its last
+# search.  It is a zip file whose table of contents is toc.json.  The
+# output is stored as archive frames (archive.py), uncompressed in the
+# zip, so that a reopened bundle reads and decompresses only the part of
+# the output that is shown; nothing else is read until it is asked for.
+
+Bundle_version = 1
+Extension = 'p9m4'
+
+def output_frames(output):
+    "(compressed frame, length) for a job's output, a string or an Archive."
+    if isinstance(output, Archive):
+        for frame in output.frames():
+            yield frame
+    else:
+        for i in range(0, len(output), Frame_size):
+            data = output[i:i + Frame_size]
+            yield (zlib.compress(data, 6), len(data))
+
+def write_bundle(path, sections, options, input, jobs, saved_by=''):
+    """
+    sections: the text of the setup boxes, by name; options: option
+    triples, by program name; input: the assembled input; jobs: the
+    finished jobs (programs.Job or Restored_job), by program name.
+    The bundle is written to a temporary file and renamed at the end.
+    """
+    tmp = path + '.tmp'
+    z = zipfile.ZipFile(tmp, 'w', zipfile.ZIP_DEFLATED, allowZip64=True)
+    toc = {'version': Bundle_version,
+           'saved_by': saved_by,
+           'time': time.time(),
+           'sections': sorted(sections.keys()),
+           'options': options,
+           'results': {}}
+    z.writestr('input.in', input)
+    for (name, text) in sections.items():
+        z.writestr('sections/%s.txt' % name, text)
+
+    for (program, job) in jobs.items():
+        if not job or job.state != State.done:
+            continue
+        dir = program.lower()
+        result = {'exit_code': job.exit_code,
+                  'limit_message': job.limit_message,
+                  'stop_reason': job.stop_reason,
+                  'profile': job.profile.describe(),
+                  'stats': job.get_stderr_info() or [],
+                  'solutions': (job.program.count_solutions(job.solution)
+                                if job.solution else 0),
+                  'variants': sorted(job.variants.keys())}
+        z.writestr('%s/input.in' % dir, job.input)
+        if job.output is not None:
+            index = []
+            parts = []
+            offset = 0
+            for (packed, length) in output_frames(job.output):
+                index.append((offset, len(packed), length))
+                parts.append(packed)
+                offset += len(packed)
+            info = zipfile.ZipInfo('%s/output.frames' % dir,
+                                   time.localtime()[:6])
+            info.compress_type = zipfile.ZIP_STORED  # frames are compressed
+            info.external_attr = 0644 << 16
+            z.writestr(info, ''.join(parts))
+            result['output'] = {'frames': index,
+                                'size': sum([l for (o, p, l) in index]),
+                                'truncated': bool(getattr(job.output,
+                                                          'truncated', False))}
+        if job.solution:
+            z.writestr('%s/solution.txt' % dir, job.solution)
+        for (i, name) in enumerate(result['variants']):
+            z.writestr('%s/variants/%d.txt' % (dir, i), job.variants[name])
+        toc['results'][program] = result
+
+    z.writestr('toc.json', json.dumps(toc, indent=1))
+    z.close()
+    os.rename(tmp, path)
+
+def to_str(x):
+    "JSON gives unicode; the GUI and the programs want str."
+    if isinstance(x, unicode):
+        return x.encode('utf-8')
+    elif isinstance(x, list):
+        return [to_str(y) for y in x]
+    else:
+        return x
+
+class Bundle:
+    "An open bundle.  Members are read only when they are asked for."
+    def __init__(self, path):
+        self.path = path
+        self.zip = zipfile.ZipFile(path)
+        self.toc = json.loads(self.zip.read('toc.json'))
+        if self.toc['version'] > Bundle_version:
+            raise ValueError('%s: bundle version %d is newer than this '
+                             'program' % (path, self.toc['version']))
+
+    def read(self, member):
+        return self.zip.read(member)
+
+    def section(self, name):
+        if name in self.toc['sections']:
+            return self.read('sections/%s.txt' % name)
+        return ''
+
+    def input(self):
+        return self.read('input.in')
+
+    def options(self, program):
+        "The option triples (type, name, value) of a program."
+        return [tuple(to_str(t))
+                for t in self.toc['options'].get(program, [])]
+
+    def programs(self):
+        return [str(p) for p in self.toc['results'].keys()]
+
+    def data_offset(self, member):
+        # Where the data of a stored member starts: after its local header.
+        info = self.zip.getinfo(member)
+        f = open(self.path, 'rb')
+        f.seek(info.header_offset)
+        header = f.read(30)
+        f.close()
+        (name_len, extra_len) = struct.unpack('<HH', header[26:30])
+        return info.header_offset + 30 + name_len + extra_len
+
+    def output(self, program):
+        "The output as a read-only Archive over the bundle file, or None."
+        result = self.toc['results'][program]
+        if 'output' not in result:
+            return None
+        member = '%s/output.frames' % program.lower()
+        a = reopen(open(self.path, 'rb'), self.data_offset(member),
+                   result['output']['frames'])
+        a.truncated = result['output']['truncated']
+        return a
+
+    def job(self, program, descriptor):
+        return Restored_job(self, program, descriptor)
+
+    def close(self):
+        self.zip.close()
+
+# end class Bundle
+
+class Restored_profile:
+    def __init__(self, description):
+        self.description = description
+
+    def describe(self):
+        return self.description
+
+class Restored_job:
+    """
+    A finished job from a bundle, with what Program_panel uses of a
+    programs.Job.  The output is an Archive over the bundle; input,
+    solution and variants are read on first use (see __getattr__).
+    """
+    def __init__(self, bundle, program_name, program):
+        result = bundle.toc['results'][program_name]
+        self.bundle = bundle
+        self.dir = program_name.lower()
+        self.result = result
+        self.program = program
+        self.state = State.done
+        self.exit_code = result['exit_code']
+        self.limit_message = to_str(result['limit_message'])
+        self.stop_reason = to_str(result['stop_reason'])
+        self.profile = Restored_profile(to_str(result['profile']))
+        self.output = bundle.output(program_name)
+        self.full_output = None
+        self.ring = Given_ring(1)  # the given clauses are not kept
+        self.holds = set()
+        self.saved_input    = [True]
+        self.saved_output   = [True]
+        self.saved_solution = [True]
+
+    def __getattr__(self, name):
+        # Old-style class: called only for attributes not yet set.
+        if name == 'input':
+            self.input = self.bundle.read('%s/input.in' % self.dir)
+        elif name == 'solution':
+            if self.result['solutions'] or self.exists('solution.txt'):
+                self.solution = self.bundle.read('%s/solution.txt' % self.dir)
+            else:
+                self.solution = None
+        elif name == 'variants':
+            self.variants = {}
+            for (i, v) in enumerate(self.result['variants']):
+                self.variants[to_str(v)] = self.bundle.read(
+                    '%s/variants/%d.txt' % (self.dir, i))
+        else:
+            raise AttributeError(name)
+        return self.__dict__[name]
+
+    def exists(self, name):
+        try:
+            self.bundle.zip.getinfo('%s/%s' % (self.dir, name))
+            return True
+        except KeyError:
+            return False
+
+    def get_stderr_info(self):
+        return [tuple(to_str(p)) for p in self.result['stats']]
+
+    def pause(self):
+        pass
+
+    def resume(self):
+        pass
+
+    def stop(self, reason='user'):
+        pass
+
+    def kill(self):
+        pass
+
+    def done_with_job(self):
+        if self.output:
+            self.output.close()
+
+# end class Restored_job
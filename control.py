@@ -20,7 +20,7 @@
 # system imports
 
 import os, wx, re, copy
-import time, thread, tempfile, subprocess, signal
+import time, threading, subprocess, signal, socket
 
 # local imports
 
@@ -30,40 +30,26 @@ from platforms import *
 from wx_utilities import *
 from my_setup import *
 from options import *
-
-def run_and_wait(command, input = '', fin = None):
-
-    if not fin:
-        fin  = tempfile.TemporaryFile('w+b')  # stdin
-        fin.write(input)
-        fin.seek(0)
-
-    fout = tempfile.TemporaryFile('w+b')  # stdout
-    ferr = tempfile.TemporaryFile('w+b')  # stderr
-
-    if Win32():
-        # creationflag says not to pop a DOS box
-        process = subprocess.Popen(command,stdin=fin,stdout=fout,stderr=ferr,
-                                  creationflags=win32process.CREATE_NO_WINDOW)
-    else:
-        process = subprocess.Popen(command,stdin=fin,stdout=fout,stderr=ferr)
-
-    exit_code = process.wait()
-    fout.seek(0)
-    output = fout.read()
-    ferr.seek(0)
-    error = ferr.read()
-    fin.close()
-    fout.close()
-    ferr.close()
-    return (exit_code, output, error)
-
-def isofilter_command(program_name):
-    fullpath = os.path.join(bin_dir(), program_name)
-    if not binary_ok(fullpath):
-        return None
-    else:
-        return [fullpath]
+import programs
+from programs import run_and_wait, isofilter_command
+from profiling import profiled
+from tracing import span, traced
+from spool import Spool, Piped_process, job_quota
+from archive import Archive, as_text
+from streams import from_marker
+from limits import default_profile, preexec_for
+from job_server import Remote_job, Rpc_error, server_address
+import sweep
+import fanout
+from batch import Job_group
+from goals import Goal_group, goals_of
+from cubes import Cube_group, fixed_size
+from history import reuse_exhausted
+
+# Archived output larger than this is shown as head and tail only
+# (Save as... still writes all of it).
+
+View_limit = 4 * 1024 * 1024
 
 def ops_in_interp(s):
     i = s.find('interpretation(')
@@ -80,61 +66,10 @@ def ops_in_interp(s):
             m = r.search(interp, m.end())
     return ops
     
-class Prover9:
-
-    name = 'Prover9'
-    solution_name = 'Proof'
-    box_name = 'Proof Search'
-    solution_ext = 'proof'
-    some_message = 'Some, but not all, of the requested proofs were found.'
+class Prover9(programs.Prover9):
 
     logo_path = os.path.join(image_dir(), 'prover9-5a-128t.gif')
 
-    # Compile regular expression for extracting stats from stderr.
-
-    r_info = re.compile('Given=(\d+)\. Generated=(\d+)\. Kept=(\d+)\. '
-                        'proofs=(\d+)\.User_CPU=(\d*\.\d*),')
-
-    exits = {}
-    exits[0]   = 'Proof'
-    exits[1]   = 'Fatal Error'
-    exits[2]   = 'Exhausted'
-    exits[3]   = 'Memory Limit'
-    exits[4]   = 'Time Limit'
-    exits[5]   = 'Given Limit'
-    exits[6]   = 'Kept Limit'
-    exits[7]   = 'Action Exit'
-    exits[101] = 'Interrupted'
-    exits[102] = 'Crashed'
-    exits[-9]  = 'Killed' # Linux, Mac
-    exits[-1]  = 'Killed' # Win32
-
-    def search_command(self):
-        fullpath = os.path.join(bin_dir(), 'prover9')
-        if not binary_ok(fullpath):
-            return None
-        else:
-            return [fullpath]
-
-    def success_command(self):
-        fullpath = os.path.join(bin_dir(), 'prooftrans')
-        if not binary_ok(fullpath):
-            return None
-        else:
-            return [fullpath]
-
-    def exists_solution(self, exit_code, output):
-        return output.find('== PROOF ==') >= 0
-
-    def count_solutions(self, solutions):
-        return solutions.count('== PROOF ==')
-
-    def exit_message(self, code):
-        if code in self.exits.keys():
-            return self.exits[code]
-        else:
-            return 'unknown exit code: %d' % code
-
     def logo_bitmap(self):
         if not os.access(self.logo_path, os.R_OK):
             error_dialog('The logo file %s cannot be found.' % self.logo_path)
@@ -143,87 +78,19 @@ class Prover9:
             return wx.Image(self.logo_path,
                             wx.BITMAP_TYPE_GIF).ConvertToBitmap()
 
-    def get_info_from_stderr(self, lines):
-        stats = utilities.grep_last('Given', lines)
-        time  = utilities.grep_last('User_CPU', lines)
-        if stats and time:
-            line = stats.strip() + time.strip()
-            m = self.r_info.match(line)
-            if m:
-                return [('CPU Seconds', m.groups()[4]),
-                        ('Given',       m.groups()[0]),
-                        ('Generated',   m.groups()[1]),
-                        ('Kept',        m.groups()[2]),
-                        ('Proofs',      m.groups()[3])]
-            else:
-                error_dialog('get_stderr_info, failed to match')
-
-        return [('CPU Seconds', '?'),
-                ('Given',       '?'),
-                ('Generated',   '?'),
-                ('Kept',        '?'),
-                ('Proofs',      '?')]
+    def mismatch(self):
+        error_dialog('get_stderr_info, failed to match')
 
-    def reformatter(self, parent, proofs, saved_solution):
+    def reformatter(self, parent, proofs, saved_solution, variants=None):
         n = self.count_solutions(proofs)
-        return Reformat_proof(parent, proofs, n, saved_solution)
+        return Reformat_proof(parent, proofs, n, saved_solution, variants)
         
 # end class Prover9
 
-class Mace4:
-
-    name = 'Mace4'
-    solution_name = 'Model'
-    box_name = 'Model/Counterexample Search'
-    solution_ext = 'model'
-    some_message = ''
+class Mace4(programs.Mace4):
 
     logo_path = os.path.join(image_dir(), 'mace4-90t.gif')
     
-    # Compile regular expression for extracting stats from stderr.
-    # Domain_size=8. Models=0. User_CPU=8.00.
-    r_info = re.compile('Domain_size=(\d+)\. Models=(\d+)\. User_CPU=(\d*\.\d*)\.')
-
-    exits = {}
-    exits[0]   = 'Model(s)'
-    exits[1]   = 'Fatal Error'
-    exits[2]   = 'Exhausted (no)'
-    exits[3]   = 'Exhausted (yes)'
-    exits[4]   = 'Time Limit (yes)'
-    exits[5]   = 'Time Limit (no)'
-    exits[6]   = 'Mem Limit (yes)'
-    exits[7]   = 'Mem Limit (no)'
-    exits[101] = 'Interrupted'
-    exits[102] = 'Crashed'
-    exits[-9]  = 'Killed' # Linux, Mac
-    exits[-1]  = 'Killed' # Win32
-
-    def search_command(self):
-        fullpath = os.path.join(bin_dir(), 'mace4')
-        if not binary_ok(fullpath):
-            return None
-        else:
-            return [fullpath, '-c']
-
-    def success_command(self):
-        fullpath = os.path.join(bin_dir(), 'interpformat')
-        if not binary_ok(fullpath):
-            return None
-        else:
-            return [fullpath]
-
-    def exists_solution(self, exit_code, output):
-        return output.find('== MODEL ==') >= 0
-
-    def count_solutions(self, solutions):
-        return solutions.count('interpretation')
-
-    def exit_message(self, code):
-        if code in self.exits.keys():
-            return self.exits[code]
-        else:
-            return 'unknown exit code: %d' % code
-
     def logo_bitmap(self):
         if not os.access(self.logo_path, os.R_OK):
             error_dialog('The logo file %s cannot be found.' % self.logo_path)
@@ -232,33 +99,24 @@ class Mace4:
             return wx.Image(self.logo_path,
                             wx.BITMAP_TYPE_GIF).ConvertToBitmap()
 
-    def get_info_from_stderr(self, lines):
-        line = utilities.grep_last('Domain_size=', lines)
-        if line:
-            m = self.r_info.match(line)
-            if m:
-                return [('CPU Seconds', m.groups()[2]),
-                        ('Domain Size', m.groups()[0]),
-                        ('Models'     , m.groups()[1])]
-            else:
-                error_dialog('get_stderr_info, failed to match')
-        return [('CPU Seconds', '?'),
-                ('Domain Size', '?'),
-                ('Models'     , '?')]
+    def mismatch(self):
+        error_dialog('get_stderr_info, failed to match')
 
-    def reformatter(self, parent, models, saved_solution):
+    def reformatter(self, parent, models, saved_solution, variants=None):
         n = self.count_solutions(models)
-        return Reformat_model(parent, models, n, saved_solution)
+        return Reformat_model(parent, models, n, saved_solution, variants)
 
 # end class Mace4
 
 class Reformat_proof:
-    def __init__(self, parent, proofs, num_proofs, saved_flag):
+    def __init__(self, parent, proofs, num_proofs, saved_flag,
+                 variants=None):
 
         self.parent = parent
         self.proofs = proofs
         self.num_proofs = num_proofs
         self.saved_flag = saved_flag
+        self.variants = variants  # the job's, kept for session bundles
 
         self.choices = ['standard', 'parents_only', 'xml', 'ivy', 'hints']
         self.choice = self.choices[0]
@@ -352,6 +210,7 @@ class Reformat_proof:
         self.choice = self.choices[evt.GetInt()]
         self.grayout_options()
 
+    @profiled('reformat')
     def on_ok(self, evt):
         command = self.command()
         (exit_code, output, err) = run_and_wait(command, input=self.proofs)
@@ -360,21 +219,24 @@ class Reformat_proof:
             error_dialog("Error reformatting proofs")
         else:
             args = ' '.join(command[1:])
+            if self.variants is not None:
+                self.variants[args] = output
             n = self.num_proofs
             if self.num_proofs == 1:
                 title = 'Reformatted Proof (%s)' % (args)
             else:
                 title = 'Reformatted Proofs (%s, %d proofs)' % (args, n)
             
-            frame = Text_frame(self.parent, to_top(self.parent).box_font,
-                               title,
-                               output,
-                               extension = 'proof',
-                               saveas=True,
-                               saved_flag = self.saved_flag,
-                               off_center=20)
-            frame.Show(True)
-            frame.Raise()
+            with span('render', bytes=len(output), title=title):
+                frame = Text_frame(self.parent, to_top(self.parent).box_font,
+                                   title,
+                                   output,
+                                   extension = 'proof',
+                                   saveas=True,
+                                   saved_flag = self.saved_flag,
+                                   off_center=20)
+                frame.Show(True)
+                frame.Raise()
 
     def on_cancel(self, evt):
         self.dlg.Destroy()
@@ -382,10 +244,12 @@ class Reformat_proof:
 # class Reformat_proof
 
 class Reformat_model:
-    def __init__(self, parent, models, num_models, saved_flag):
+    def __init__(self, parent, models, num_models, saved_flag,
+                 variants=None):
         self.parent = parent
         self.models = models
         self.saved_flag = saved_flag
+        self.variants = variants  # the job's, kept for session bundles
         self.num_models = num_models
 
         self.choices = ['standard', 'standard2', 'portable', 'tabular',
@@ -400,6 +264,7 @@ class Reformat_model:
         self.parent.PopupMenu(menu)
         menu.Destroy()
 
+    @profiled('reformat')
     def on_select(self, evt):
         item = self.map[evt.GetId()]
         command = [os.path.join(bin_dir(), 'interpformat'), item]
@@ -408,130 +273,190 @@ class Reformat_model:
             error_dialog("Error reformatting models")
         else:
             args = ' '.join(command[1:])
+            if self.variants is not None:
+                self.variants[args] = output
             n = self.num_models
             if self.num_models == 1:
                 title = 'Reformatted Model (%s)' % (args)
             else:
                 title = 'Reformatted Models (%s, %d models)' % (args, n)
             
-            frame = Text_frame(self.parent, to_top(self.parent).box_font,
-                               title,
-                               output,
-                               extension = 'model',
-                               saveas=True,
-                               saved_flag = self.saved_flag,
-                               off_center=40)
-            frame.Show(True)
+            with span('render', bytes=len(output), title=title):
+                frame = Text_frame(self.parent, to_top(self.parent).box_font,
+                                   title,
+                                   output,
+                                   extension = 'model',
+                                   saveas=True,
+                                   saved_flag = self.saved_flag,
+                                   off_center=40)
+                frame.Show(True)
 
 # class Reformat_model
 
-class Run_program:
-    def __init__(self, parent, program, input):
+class Panel_job:
+    # Mixed in before a job class (programs.Job, Remote_job, Job_group):
+    # the job's results go to a Program_panel (in the GUI thread).
+    def panel_init(self, parent):
         self.parent = parent
-        self.program = program
-        self.input = input
-        self.output = None
-        self.solution = None
-        self.exit_code = None
-        self.state = State.ready  # ready, running, suspended, done, error
 
         # The following are lists so they can be altered as side effects.
         self.saved_input    = [False]
         self.saved_output   = [False]
         self.saved_solution = [False]
 
-        thread.start_new_thread(self.run, ())
+    def solution_found(self, solution):
+        self.parent.invoke_later(self.parent.solution_found, solution)
 
-    def run(self):
-        #
-        # DO NOT DO ANY GUI STUFF IN HERE, BECAUSE THIS
-        # RUNS IN A SEPARATE THREAD!!!
-        #
-        search_command  = self.program.search_command()
-        success_command = self.program.success_command()
+    def finished(self):
+        self.parent.invoke_later(self.parent.job_finished)
+
+# end class Panel_job
+
+class Run_program(Panel_job, programs.Job):
+    # A Job whose results go to a Program_panel.
+    def __init__(self, parent, program, input, **kwargs):
+        self.panel_init(parent)
+        programs.Job.__init__(self, program, input, **kwargs)
+        self.start()
+
+# end class Run_program()
 
-        if not search_command or not success_command:
-            self.state = State.error
-            self.fin  = self.fout = self.ferr = None
+class Remote_run_program(Panel_job, Remote_job):
+    # A Run_program on the job server at PROVER9_MACE4_SERVER.
+    def __init__(self, parent, program, input, *args, **kwargs):
+        self.panel_init(parent)
+        Remote_job.__init__(self, program, input, *args, **kwargs)
+        self.start()
+
+# end class Remote_run_program()
+
+class Goal_group_run(Panel_job, Goal_group):
+    # A Run_program with a job for each goal (goals.py).
+    def __init__(self, parent, program, input, *args, **kwargs):
+        self.panel_init(parent)
+        Goal_group.__init__(self, program, input, *args, **kwargs)
+        self.start()
+
+# end class Goal_group_run()
+
+class Cube_group_run(Panel_job, Cube_group):
+    # A Run_program with a Mace4 search of one size as cubes (cubes.py);
+    # the size and max_models are those of the options.
+    def __init__(self, parent, program, input, filter_output=False,
+                 options=None):
+        self.panel_init(parent)
+        values = dict([(name, value) for (type, name, value) in options])
+        Cube_group.__init__(self, program, input, fixed_size(options),
+                            values.get('max_models', 1) == 1,
+                            filter_output=filter_output, options=options)
+        self.start()
+
+# end class Cube_group_run()
+    
+class Model_viewer(wx.Frame):
+    """
+    Browse the Mace4 models found so far, while the search continues.
+    With 'Follow', the newest model is shown as it arrives.
+    """
+    def __init__(self, parent, font):
+        size = size_that_fits((700,550))
+        (x,y) = pos_for_center(size)
+        wx.Frame.__init__(self, parent, title='Mace4 Models (searching)',
+                          size=size, pos=(x+60, y+60))
+        self.models = []
+        self.current = -1
+        self.searching = True
+
+        self.first_btn = wx.Button(self, -1, 'First')
+        self.prev_btn = wx.Button(self, -1, 'Previous')
+        self.next_btn = wx.Button(self, -1, 'Next')
+        self.last_btn = wx.Button(self, -1, 'Last')
+        self.Bind(wx.EVT_BUTTON, self.on_first, self.first_btn)
+        self.Bind(wx.EVT_BUTTON, self.on_prev, self.prev_btn)
+        self.Bind(wx.EVT_BUTTON, self.on_next, self.next_btn)
+        self.Bind(wx.EVT_BUTTON, self.on_last, self.last_btn)
+        self.follow_cb = wx.CheckBox(self, -1, 'Follow')
+        self.follow_cb.SetValue(True)
+        self.follow_cb.SetToolTipString('Show each new model as it is found.')
+        self.count_text = wx.StaticText(self, -1, '', size=(200,-1))
+        close_btn = wx.Button(self, -1, 'Close')
+        self.Bind(wx.EVT_BUTTON, self.on_close, close_btn)
+
+        self.txt = wx.TextCtrl(self,
+                               style=wx.TE_MULTILINE|wx.TE_READONLY|wx.HSCROLL|
+                               wx.TE_RICH2)
+        self.txt.SetFont(font)
+
+        sub_sizer = wx.BoxSizer(wx.HORIZONTAL)
+        for btn in [self.first_btn, self.prev_btn,
+                    self.next_btn, self.last_btn]:
+            sub_sizer.Add(btn, 0, wx.ALL, 3)
+        sub_sizer.Add(self.follow_cb, 0, wx.ALL|wx.ALIGN_CENTER, 3)
+        sub_sizer.Add(self.count_text, 0, wx.ALL|wx.ALIGN_CENTER, 3)
+        sub_sizer.Add((0,0), 1)  # strechable space
+        sub_sizer.Add(close_btn, 0, wx.ALL, 3)
+
+        sizer = wx.BoxSizer(wx.VERTICAL)
+        sizer.Add(sub_sizer, 0, wx.ALL|wx.GROW, 3)
+        sizer.Add(self.txt, 1, wx.ALL|wx.GROW, 3)
+        self.SetSizer(sizer)
+        self.update()
+
+    def add(self, model):
+        self.models.append(model)
+        if self.follow_cb.GetValue() or self.current < 0:
+            self.show(len(self.models) - 1)
         else:
-            # use files to avoid buffering problems  (maybe improve later)
-            self.fin  = tempfile.TemporaryFile('w+b')  # stdin
-            self.fout = tempfile.TemporaryFile('w+b')  # stdout
-            self.ferr = tempfile.TemporaryFile('w+b')  # stderr
-
-            self.fin.write(self.input)
-            self.fin.seek(0)
-
-            if Win32():
-                # creationflag says not to pop a DOS box
-                self.process = subprocess.Popen(
-                    search_command, stdin=self.fin,
-                    stdout=self.fout, stderr=self.ferr,
-                    creationflags=win32process.CREATE_NO_WINDOW)
-            else:
-                self.process = subprocess.Popen(
-                    search_command, stdin=self.fin,
-                    stdout=self.fout, stderr=self.ferr)
-                
-            self.state = State.running
-            self.exit_code = self.process.wait()  # Wait for process to finish!
-            self.state = State.done
-            self.fout.seek(0)  # rewind stdout
-            self.output = self.fout.read()
-
-            if (self.exit_code == 0 or
-                self.program.exists_solution(self.exit_code, self.output)):
-
-                # Extract the solution from stdout
-                self.fout.seek(0)
-                (rc,output,err) = run_and_wait(success_command, fin=self.fout)
-
-                if rc == 0:  
-                    self.solution = output  # at least one solution
-                elif rc == 2:
-                    self.solution = None  # no solution (clear(print_proofs)?)
-                else:
-                    self.solution = ('There was an error extracting the %s.' %
-                                     self.program.solution_name)
+            self.update()
+
+    def clear(self):
+        self.models = []
+        self.current = -1
+        self.searching = True
+        self.txt.SetValue('')
+        self.update()
+
+    def done(self):
+        self.searching = False
+        self.update()
+
+    def show(self, i):
+        if 0 <= i < len(self.models):
+            self.current = i
+            self.txt.SetValue(self.models[i])
+            self.txt.ShowPosition(0)
+        self.update()
+
+    def update(self):
+        n = len(self.models)
+        state = 'searching' if self.searching else 'search ended'
+        self.SetTitle('Mace4 Models: %d (%s)' % (n, state))
+        if n == 0:
+            self.count_text.SetLabel('No models yet')
+        else:
+            self.count_text.SetLabel('Model %d of %d' % (self.current + 1, n))
+        self.first_btn.Enable(self.current > 0)
+        self.prev_btn.Enable(self.current > 0)
+        self.next_btn.Enable(self.current < n - 1)
+        self.last_btn.Enable(self.current < n - 1)
 
-            # Keep files open until self is deleted.
+    def on_first(self, evt):
+        self.show(0)
 
-        self.parent.invoke_later(self.parent.job_finished)
+    def on_prev(self, evt):
+        self.show(self.current - 1)
 
-    def pause(self):
-        if self.state == State.running:
-            os.kill(self.process.pid, signal.SIGSTOP)
-            self.state = State.suspended
-
-    def resume(self):
-        if self.state == State.suspended:
-            os.kill(self.process.pid, signal.SIGCONT)
-            self.state = State.running
-
-    def get_stderr_info(self):
-        if self.state in [State.running, State.suspended, State.done]:
-            self.ferr.seek(0)  # rewind
-            lines = self.ferr.readlines()
-            info = self.program.get_info_from_stderr(lines)
-            return info
-
-    def kill(self):
-        if self.state == State.running or self.state == State.suspended:
-            # Cleanup will occur when the 'run' thread terminates.
-            if Win32():
-                win32api.TerminateProcess(int(self.process._handle), -1)
-            else:
-                os.kill(self.process.pid, signal.SIGKILL)
+    def on_next(self, evt):
+        self.show(self.current + 1)
 
-    def done_with_job(self):
-        if self.fin:  # if one exists, all exist
-            self.fin.close()
-            self.fout.close()
-            self.ferr.close()
-        del self
+    def on_last(self, evt):
+        self.show(len(self.models) - 1)
+
+    def on_close(self, evt):
+        self.Close()
+
+# end class Model_viewer
 
-# end class Run_program()
-    
 class Program_panel(wx.Panel):
 
     def __init__(self, parent, program, options):
@@ -540,6 +465,11 @@ class Program_panel(wx.Panel):
         self.job = None
         self.info_panel = None
         self.timer = None        # for monitoring (Info button)
+        self.watch_frame = None
+        self.watch_timer = None  # for watching given clauses (Watch button)
+        self.watch_count = 0
+        self.live_solution = None  # frame of proofs found during search
+        self.model_viewer = None   # models found during search (Mace4)
 
         wx.Panel.__init__(self, parent)
         self.Connect(-1, -1, Invoke_event.my_EVT_INVOKE, self.on_invoke)
@@ -595,7 +525,9 @@ class Program_panel(wx.Panel):
         if Win32():
             self.pause_btn.Show(False)
         self.kill_btn = wx.Button(self, -1, 'Kill')
-        self.kill_btn.SetToolTipString('Kill %s process.' % program.name)
+        self.kill_btn.SetToolTipString(
+            'Stop %s, keeping its statistics and what it has found.  '
+            'A second click kills it at once.' % program.name)
         self.kill_btn.Enable(False)
         self.Bind(wx.EVT_BUTTON, self.on_kill, self.kill_btn)
 
@@ -626,6 +558,15 @@ class Program_panel(wx.Panel):
             'Show some statistics on the %s search.' % program.name)
         self.Bind(wx.EVT_BUTTON, self.on_info, self.info_btn)
         self.info_btn.Enable(False)
+
+        self.watch_btn = wx.Button(self, -1, 'Watch')
+        self.watch_btn.SetToolTipString(
+            'Show the most recent given clauses of the %s search.' %
+            program.name)
+        self.Bind(wx.EVT_BUTTON, self.on_watch, self.watch_btn)
+        self.watch_btn.Enable(False)
+        if program.name != 'Prover9':
+            self.watch_btn.Show(False)
         
         self.show_save_btn = wx.Button(self, -1, 'Show/Save')
         if not Mac():
@@ -636,6 +577,7 @@ class Program_panel(wx.Panel):
 
         show_sizer = wx.BoxSizer(wx.HORIZONTAL)
         show_sizer.Add(self.info_btn,   0, wx.ALL, 1)
+        show_sizer.Add(self.watch_btn,  0, wx.ALL, 1)
         show_sizer.Add(self.show_save_btn, 0, wx.ALL, 1)
 
         # Overall Layout
@@ -682,12 +624,59 @@ class Program_panel(wx.Panel):
         self.info_btn.Enable(True)
         self.info_panel = None
 
+    def on_watch(self, evt):
+        if self.watch_frame:
+            self.watch_frame.Raise()
+            return
+        self.watch_count = -1
+        self.watch_frame = Text_frame(self, to_top(self).box_font,
+                                      'Given Clauses of %s Search' %
+                                      self.program.name,
+                                      '', saveas=False, off_center=60)
+        self.watch_frame.Bind(wx.EVT_WINDOW_DESTROY, self.on_watch_closed)
+        self.watch_frame.Show(True)
+        self.update_watch(None)
+        self.watch_timer = wx.Timer(self, -1)
+        wx.EVT_TIMER(self, self.watch_timer.GetId(), self.update_watch)
+        self.watch_timer.Start(1000)  # milliseconds
+
+    def update_watch(self, evt):
+        if not self.job or not self.watch_frame:
+            self.watch_reset()
+            return
+        (count, lines) = self.job.ring.lines()
+        if count != self.watch_count:
+            self.watch_count = count
+            if count > len(lines):
+                header = ('%% Last %d of %d given clauses.\n\n' %
+                          (len(lines), count))
+            else:
+                header = '%% %d given clauses.\n\n' % count
+            if count == 0:
+                header += ('% (Use set(print_given) to see the given '
+                           'clauses.)\n')
+            self.watch_frame.replace(header + ''.join(lines))
+        if self.job.state in [State.done, State.error]:
+            self.watch_reset()
+
+    def on_watch_closed(self, evt):
+        if evt.GetEventObject() == self.watch_frame:
+            self.watch_frame = None
+            self.watch_reset()
+        evt.Skip()
+
+    def watch_reset(self):
+        if self.watch_timer:
+            self.watch_timer.Stop()
+            self.watch_timer = None
+
     def on_time_ctrl(self, evt): 
         if self.time_ctrl_opt:
             self.time_ctrl_opt[Value] = self.time_ctrl.GetValue()
             update_label(self.time_ctrl_opt)
             update_shared(self.time_ctrl_opt)
 
+    @profiled('start')
     def on_start(self, evt):
         if self.job:
             if self.job.solution and not self.job.saved_solution[0]:
@@ -703,6 +692,9 @@ class Program_panel(wx.Panel):
 
             self.job.done_with_job()
             self.job = None
+            self.live_solution = None  # a new search gets a new frame
+            if self.model_viewer:
+                self.model_viewer.clear()
 
             self.info_btn.Enable(False)
             if self.info_panel:
@@ -713,12 +705,42 @@ class Program_panel(wx.Panel):
         self.pause_btn.Enable(True)
         self.kill_btn.Enable(True)
         self.info_btn.Enable(True)
+        self.watch_btn.Enable(True)
         self.show_save_btn.Enable(False)
         self.bar.start()
         self.state_text.SetLabel('Running')
-        input = to_top(self).setup.assemble_input()
-        input = 'assign(report_stderr, 2).\n' + input
-        self.job = Run_program(self, self.program, input)
+        setup = to_top(self).setup
+        if self.program.name == 'Prover9':
+            triples = setup.p9_options.panels.nondefaults()
+        else:
+            triples = setup.m4_options.nondefaults()
+        with span('assemble_input') as s:
+            input = setup.assemble_input()
+            input = 'assign(report_stderr, 2).\n' + input
+            s.args['bytes'] = len(input)
+        if self.program.name == 'Mace4' and to_top(self).reuse_sizes():
+            (input, reused) = reuse_exhausted(input)
+            if reused:
+                self.state_text.SetLabel('Running (sizes %s: no model)' %
+                                         ', '.join([str(n) for n in
+                                                    sorted(reused)]))
+        if (self.program.name == 'Prover9' and to_top(self).split_goals() and
+            len(goals_of(input)) > 1):
+            run = Goal_group_run  # a job for each goal, on the pool
+        elif (self.program.name == 'Mace4' and to_top(self).split_cubes() and
+              fixed_size(triples)):
+            run = Cube_group_run  # the cubes run at once, on the pool
+        elif server_address():
+            run = Remote_run_program  # searches run on the job server
+        else:
+            run = Run_program
+        self.job = run(self, self.program, input,
+                       to_top(self).filter_output(), options=triples)
+        if self.watch_frame and not self.watch_timer:
+            self.watch_count = -1
+            self.watch_timer = wx.Timer(self, -1)
+            wx.EVT_TIMER(self, self.watch_timer.GetId(), self.update_watch)
+            self.watch_timer.Start(1000)  # milliseconds
 
     def on_pause_resume(self, evt):
         # assume job is running or suspended
@@ -737,7 +759,15 @@ class Program_panel(wx.Panel):
 
     def on_kill(self, evt):
         # assume job is running or suspended
-        self.job.kill()  # calls job_finished indirectly
+        if self.job.stop_reason:
+            self.job.kill()  # second click: do not wait any longer
+        else:
+            if self.job.state == State.suspended:
+                self.bar.resume()
+            self.job.stop()  # calls job_finished indirectly
+            self.kill_btn.SetLabel('Kill Now')
+            self.pause_btn.Enable(False)
+            self.state_text.SetLabel('Stopping')
 
     def job_state(self):
         if self.job:
@@ -745,19 +775,42 @@ class Program_panel(wx.Panel):
         else:
             return None
 
+    @profiled('finish')
+    @traced('job_finished')
     def job_finished(self):
         self.bar.stop()
+        if self.model_viewer:
+            self.model_viewer.done()
         self.pause_btn.Enable(False)
         self.pause_btn.SetLabel('Pause')
         self.kill_btn.Enable(False)
+        self.kill_btn.SetLabel('Kill')
         self.show_save_btn.Enable(True)
         self.start_btn.Enable(True)
         self.time_ctrl.Enable(True)
 
         if self.job.state == State.error:
             self.state_text.SetLabel('Program_Not_Found')
-            error_dialog('%s binaries not found, looking in\n%s' %
-                         (self.program.name, bin_dir()))
+            if isinstance(self.job, Job_group):
+                error_dialog(self.job.output)
+            elif isinstance(self.job, Remote_job):
+                error_dialog('%s could not be run on the job server %s' %
+                             (self.program.name, self.job.client_address()))
+            elif self.job.start_error:
+                error_dialog('%s could not be started:\n%s' %
+                             (self.program.name, self.job.start_error))
+            else:
+                error_dialog('%s binaries not found, looking in\n%s' %
+                             (self.program.name, bin_dir()))
+        elif self.job.limit_message:
+            message = self.job.limit_message
+            self.state_text.SetLabel(message)
+            if self.job.solution:
+                self.ss_solution(None)
+            info_dialog('%s was stopped by an operating-system limit '
+                        '(%s).\nThe job profile is: %s.' %
+                        (self.program.name, message,
+                         self.job.profile.describe()))
         else:
             message = self.program.exit_message(self.job.exit_code)
             self.state_text.SetLabel(message)
@@ -766,7 +819,7 @@ class Program_panel(wx.Panel):
                 frame = Text_frame(
                     self, to_top(self).box_font,
                     self.program.name + ' Fatal Error',
-                    self.job.output,
+                    as_text(self.job.output),
                     saveas=False)
                 frame.hilite_error()
                 frame.Show(True)
@@ -774,13 +827,20 @@ class Program_panel(wx.Panel):
                              'is shown.' % self.program.name)
                 
             elif self.job.solution:
-                self.ss_solution(None)
+                if self.live_solution:
+                    # Replace what was extracted during the search.
+                    frame = self.live_solution
+                    frame.replace(self.job.solution)
+                    frame.txt.ShowPosition(0)
+                    frame.SetTitle(self.solution_title(self.job.solution))
+                else:
+                    self.ss_solution(None)
 
                 if self.job.exit_code != 0:
                     info_dialog('%s Exit: %s. \n%s'
                                 % (self.program.name, message,
                                    self.program.some_message))
-            elif self.program.exits[self.job.exit_code] != 'Killed':
+            elif message != 'Killed' and self.job.stop_reason != 'user':
                 info_dialog('%s Exit: %s' % (self.program.name, message))
 
     def on_show_save(self, evt):
@@ -802,52 +862,158 @@ class Program_panel(wx.Panel):
         if self.job.exit_code != 0 and not self.job.solution:
             menu.Enable(id, False)
 
+        for args in sorted(self.job.variants.keys()):
+            id = wx.NewId()
+            menu.Append(id, '%s Reformatted %s (%s)' %
+                        (self.program.name, self.program.solution_name, args))
+            self.Bind(wx.EVT_MENU,
+                      lambda evt, args=args: self.ss_variant(args), id=id)
+
         self.PopupMenu(menu)
         menu.Destroy()
 
     def ss_input(self, evt):
-        frame = Text_frame(self, to_top(self).box_font,
-                           self.program.name + ' Input',
-                           self.job.input,
-                           extension='in', saveas=True,
-                           saved_flag=self.job.saved_input)
-        frame.Show(True)
+        with span('render', bytes=len(self.job.input), title='input'):
+            frame = Text_frame(self, to_top(self).box_font,
+                               self.program.name + ' Input',
+                               self.job.input,
+                               extension='in', saveas=True,
+                               saved_flag=self.job.saved_input)
+            frame.Show(True)
         
     def ss_output(self, evt):
-        frame = Text_frame(self, to_top(self).box_font,
-                           self.program.name + ' Output',
-                           self.job.output,
-                           extension='out', saveas=True,
-                           saved_flag=self.job.saved_output)
-        frame.Show(True)
+        output = self.job.output
+        title = self.program.name + ' Output'
+        if not isinstance(output, Archive):
+            text = output
+            source = None
+        else:
+            # Decompress only the frames that are shown.
+            title += ' (compressed %.1fx)' % output.ratio()
+            if len(output) <= View_limit:
+                text = output.getvalue()
+            else:
+                half = View_limit / 2
+                text = (output.head(half) +
+                        '\n\n%% ... %d bytes not shown; "Save as..." '
+                        'writes the full output ...\n\n' %
+                        (len(output) - 2 * half) +
+                        output.tail(half))
+            if output.truncated:
+                text += ('\n%% Output truncated: the spool disk '
+                         'quota was exceeded.\n')
+            source = output
+        if self.job.full_output:
+            # Filtered output: "Save as..." writes the whole archive.
+            text += ('%% "Save as..." writes the full (unfiltered) '
+                     'output, %d bytes.\n' % len(self.job.full_output))
+            source = self.job.full_output
+        with span('render', bytes=len(text), title='output'):
+            frame = Text_frame(self, to_top(self).box_font,
+                               title,
+                               text,
+                               extension='out', saveas=True,
+                               saved_flag=self.job.saved_output,
+                               save_source=source)
+            frame.Show(True)
         
-    def ss_solution(self, evt):
+    def ss_variant(self, args):
+        text = self.job.variants[args]
+        title = 'Reformatted %s (%s)' % (self.program.solution_name, args)
+        frame = Text_frame(self, to_top(self).box_font, title, text,
+                           extension=self.program.solution_ext,
+                           saveas=True,
+                           saved_flag=self.job.saved_solution)
+        frame.Show(True)
+
+    def restore(self, job):
+        # A finished job from a session bundle, shown as if it had just
+        # run; nothing is rendered until it is asked for.
+        if self.job:
+            self.job.done_with_job()
+        self.job = job
+        self.live_solution = None
+        if self.model_viewer:
+            self.model_viewer.clear()
+            self.model_viewer.done()
+        self.start_btn.Enable(True)
+        self.time_ctrl.Enable(True)
+        self.pause_btn.Enable(False)
+        self.kill_btn.Enable(False)
+        self.info_btn.Enable(True)
+        self.watch_btn.Enable(False)
+        self.show_save_btn.Enable(True)
+        self.state_text.SetLabel(job.limit_message or
+                                 self.program.exit_message(job.exit_code))
+
+    def solution_title(self, solution):
+        solutions = self.program.count_solutions(solution)
+        if solutions == 1:
+            return '%s %s' % (self.program.name,self.program.solution_name)
+        else:
+            return '%s %s (%d %ss)' % (self.program.name,
+                                       self.program.solution_name,
+                                       solutions,
+                                       self.program.solution_name)
+
+    def ss_solution(self, evt, solution=None):
+        if solution is None:
+            solution = self.job.solution
         extra_ops=[('Reformat ...', self.on_reformat)]
-        solutions = self.program.count_solutions(self.job.solution)
+        solutions = self.program.count_solutions(solution)
         if (self.program.name == 'Mace4' and solutions > 1):
             extra_ops.append(('Isofilter...', self.on_isofilter))
-        if solutions == 1:
-            title = '%s %s' % (self.program.name,self.program.solution_name)
+        title = self.solution_title(solution)
+        with span('render', bytes=len(solution), title=title):
+            frame = Text_frame(
+                self, to_top(self).box_font,
+                title,
+                solution,
+                extension=self.program.solution_ext,
+                saveas=True,
+                saved_flag=self.job.saved_solution,
+                extra_operations=extra_ops)
+            frame.Show(True)
+        return frame
+
+    def solution_found(self, solution):
+        # A solution extracted while the search is still running.
+        if self.program.name == 'Mace4':
+            self.model_found(solution)
+            return
+        self.job.saved_solution[0] = False
+        frame = self.live_solution
+        if frame:
+            (start, end) = self.program.block_markers
+            frame.append(from_marker(solution, start))  # without the head
+            frame.SetTitle(self.solution_title(frame.text) + ' - searching')
         else:
-            title = '%s %s (%d %ss)' % (self.program.name,
-                                        self.program.solution_name,
-                                        solutions,
-                                        self.program.solution_name)
-        frame = Text_frame(
-            self, to_top(self).box_font,
-            title,
-            self.job.solution,
-            extension=self.program.solution_ext,
-            saveas=True,
-            saved_flag=self.job.saved_solution,
-            extra_operations=extra_ops)
-        frame.Show(True)
+            frame = self.ss_solution(None, solution)
+            frame.SetTitle(frame.GetTitle() + ' - searching')
+            frame.Bind(wx.EVT_WINDOW_DESTROY, self.on_live_closed)
+            self.live_solution = frame
+
+    def on_live_closed(self, evt):
+        if evt.GetEventObject() == self.live_solution:
+            self.live_solution = None
+        elif evt.GetEventObject() == self.model_viewer:
+            self.model_viewer = None
+        evt.Skip()
+
+    def model_found(self, model):
+        if not self.model_viewer:
+            self.model_viewer = Model_viewer(self, to_top(self).box_font)
+            self.model_viewer.Bind(wx.EVT_WINDOW_DESTROY, self.on_live_closed)
+            self.model_viewer.Show(True)
+        self.model_viewer.add(model)
 
     def on_reformat(self, evt):
         parent = evt.GetEventObject().GetParent()
         solution = parent.text
-        self.program.reformatter(parent, solution, self.job.saved_solution)
+        self.program.reformatter(parent, solution, self.job.saved_solution,
+                                 self.job.variants)
 
+    @profiled('isofilter')
     def on_isofilter(self, evt):
         parent = evt.GetEventObject().GetParent()
         solution = parent.text
@@ -1011,44 +1177,54 @@ class Isofilter_frame(wx.Frame):
             self.command = command
             self.start_btn.Disable()
             self.bar.start()
-            thread.start_new_thread(self.run, ())
+            self.run()
 
     def run(self):
+        # Start isofilter; the supervisor calls process_exited when it
+        # is done.
+        quota = job_quota()
+        self.fin  = Spool(self.models)    # stdin
+        self.fout = Spool(quota=quota)    # stdout
+        self.ferr = Spool(quota=quota)    # stderr
+
+        self.span = span(os.path.basename(self.command[0]), 'process',
+                         command=' '.join(self.command[1:]),
+                         bytes_in=len(self.models))
+        self.profile = default_profile()
+        self.started = threading.Event()
+        self.state = State.running
+        self.process = Piped_process(self.command, self.fin,
+                                     self.fout, self.ferr,
+                                     preexec_fn=preexec_for(self.profile),
+                                     on_exit=self.process_exited)
+        self.started.set()
+
+    def process_exited(self, exit_code):
         #
         # DO NOT DO ANY GUI STUFF IN HERE, BECAUSE THIS
-        # RUNS IN A SEPARATE THREAD!!!
+        # RUNS IN A COMPLETION THREAD!!!
         #
-
-        self.fin  = tempfile.TemporaryFile('w+b')  # stdin
-        self.fout = tempfile.TemporaryFile('w+b')  # stdout
-        self.ferr = tempfile.TemporaryFile('w+b')  # stderr
-
-        self.fin.write(self.models)
-        self.fin.seek(0)
-
-        if Win32():
-            # creationflag says not to pop a DOS box
-            self.process = subprocess.Popen(
-                self.command, stdin=self.fin,
-                stdout=self.fout, stderr=self.ferr,
-                creationflags=win32process.CREATE_NO_WINDOW)
-        else:
-            self.process = subprocess.Popen(
-                self.command, stdin=self.fin,
-                stdout=self.fout, stderr=self.ferr)
-
-        self.state = State.running
-        self.exit_code = self.process.wait()  # Wait for process to finish!
-        self.fout.seek(0)  # rewind stdout
-        self.filtered_models = self.fout.read()
+        self.started.wait()
+        self.exit_code = exit_code
+        self.limit_message = self.profile.exit_message(
+            self.exit_code, self.ferr.getvalue(), self.process.cpu)
+        self.span.finish(child_pid=self.process.pid, exit_code=self.exit_code)
+        with span('read_stdout', 'io') as s:
+            self.filtered_models = self.fout.getvalue()
+            s.args['bytes'] = len(self.filtered_models)
 
         self.invoke_later(self.job_finished)
 
+    @profiled('isofilter')
+    @traced('isofilter_finished')
     def job_finished(self):
         self.bar.stop()
-        if self.exit_code == 1:
-            self.ferr.seek(0)  # rewind stderr
-            err = self.ferr.read()
+        if self.limit_message:
+            error_dialog('Isofilter was stopped by an operating-system '
+                         'limit (%s).\nThe job profile is: %s.' %
+                         (self.limit_message, self.profile.describe()))
+        elif self.exit_code == 1:
+            err = self.ferr.getvalue()
             error_dialog('Isofilter error:\n\n' + err)
         elif self.exit_code == 0:
             n = self.filtered_models.rfind(': input=')
@@ -1063,9 +1239,32 @@ class Isofilter_frame(wx.Frame):
 
                 args = ' '.join(self.command[1:])
 
+                with span('render', bytes=len(self.filtered_models),
+                          title='isofilter'):
+                    frame = Text_frame(
+                        self.parent, to_top(self).box_font,
+                        'Isofilter Result (%s, %d models)' % (args, kept),
+                        self.filtered_models,
+                        extension='model',
+                        saveas=True,
+                        off_center=20,
+                        saved_flag=self.parent.job.saved_solution,
+                        extra_operations=extra_ops)
+                    frame.Show(True)
+
+                info_dialog(('Isofilter received %d models, eliminated %d, '
+                             'giving %d nonisomorphic model(s).') %
+                            (input, input-kept, kept))
+        elif self.filtered_models.count('interpretation(') > 0:
+            # Stopped: show the nonisomorphic models found so far.
+            kept = self.filtered_models.count('interpretation(')
+            extra_ops=[('Reformat ...', self.parent.on_reformat)]
+            args = ' '.join(self.command[1:])
+            with span('render', bytes=len(self.filtered_models),
+                      title='isofilter'):
                 frame = Text_frame(
                     self.parent, to_top(self).box_font,
-                    'Isofilter Result (%s, %d models)' % (args, kept),
+                    'Isofilter Result (%s, stopped, %d models)' % (args, kept),
                     self.filtered_models,
                     extension='model',
                     saveas=True,
@@ -1074,10 +1273,6 @@ class Isofilter_frame(wx.Frame):
                     extra_operations=extra_ops)
                 frame.Show(True)
 
-                info_dialog(('Isofilter received %d models, eliminated %d, '
-                             'giving %d nonisomorphic model(s).') %
-                            (input, input-kept, kept))
-
         self.fin.close()
         self.fout.close()
         self.ferr.close()
@@ -1085,11 +1280,11 @@ class Isofilter_frame(wx.Frame):
         
     def on_cancel(self, evt):
         if self.state == State.running:
-            # Cleanup will occur when the 'run' thread terminates.
-            if Win32():
-                win32api.TerminateProcess(int(self.process._handle), -1)
+            # Cleanup will occur in process_exited.
+            if self.process.stopping:
+                self.process.kill()  # second click: do not wait any longer
             else:
-                os.kill(self.process.pid, signal.SIGKILL)
+                self.process.stop()  # keep the models it has already kept
         else:
             self.Close()
     
@@ -1132,3 +1327,409 @@ def syntax_check(input):
 
 # END def syntax_check
 
+
+class Sweep_frame(wx.Frame):
+    # A parameter sweep (sweep.py): up to Sweep_rows options with lists or
+    # ranges of values, run as a batch, with the results in a sortable
+    # matrix.  "Use These Options" puts a point into the option panels.
+
+    Sweep_rows = 5
+
+    def __init__(self, parent, setup):
+
+        self.parent = parent
+        self.setup = setup
+        self.sweep = None
+        self.results = []       # sweep.Result, in the order shown
+        self.sort_column = None
+
+        wx.Frame.__init__(self, parent, title='Parameter Sweep',
+                          size=(800,500), pos=pos_for_center((0,0)))
+
+        self.Connect(-1, -1, Invoke_event.my_EVT_INVOKE, self.on_invoke)
+
+        panel = wx.Panel(self)
+
+        prog_lab = wx.StaticText(panel, -1, 'Program:')
+        self.prog_ch = wx.Choice(panel, -1, choices=['Prover9', 'Mace4'])
+        self.prog_ch.SetSelection(0)
+        self.Bind(wx.EVT_CHOICE, self.on_program, self.prog_ch)
+
+        gsizer = wx.GridBagSizer(5,5)
+        gsizer.Add(prog_lab,     (0,0), (1,1), wx.ALIGN_CENTER_VERTICAL)
+        gsizer.Add(self.prog_ch, (0,1))
+        self.name_chs = []
+        self.value_ctrls = []
+        self.range_labs = []
+        for i in range(self.Sweep_rows):
+            ch = wx.Choice(panel, -1, choices=[])
+            self.Bind(wx.EVT_CHOICE, self.on_name, ch)
+            ctrl = wx.TextCtrl(panel, -1, size=(150,-1))
+            ctrl.SetToolTipString('a,b,c or lo:hi or lo:hi:step; names for '
+                                  'a stringparm (* for all); a flag takes '
+                                  'both values')
+            lab = wx.StaticText(panel, -1, '', size=(250,-1))
+            gsizer.Add(ch,   (i+1,0))
+            gsizer.Add(ctrl, (i+1,1))
+            gsizer.Add(lab,  (i+1,2), (1,1), wx.ALIGN_CENTER_VERTICAL)
+            self.name_chs.append(ch)
+            self.value_ctrls.append(ctrl)
+            self.range_labs.append(lab)
+
+        self.design_ch = wx.Choice(panel, -1, choices=['All Combinations',
+                                                      'Latin Hypercube'])
+        self.design_ch.SetSelection(0)
+        samples_lab = wx.StaticText(panel, -1, 'Samples:')
+        self.samples_ctrl = wx.SpinCtrl(panel, -1, min=1,
+                                        max=sweep.Max_points, initial=20,
+                                        size=(75,-1))
+        deadline_lab = wx.StaticText(panel, -1, 'Seconds per run:')
+        self.deadline_ctrl = wx.SpinCtrl(panel, -1, min=1, max=100000,
+                                         initial=60, size=(75,-1))
+
+        self.start_btn = wx.Button(panel, -1, 'Start')
+        self.Bind(wx.EVT_BUTTON, self.on_start, self.start_btn)
+        self.cancel_btn = wx.Button(panel, -1, 'Cancel')
+        self.Bind(wx.EVT_BUTTON, self.on_cancel, self.cancel_btn)
+        self.cancel_btn.Enable(False)
+        self.use_btn = wx.Button(panel, -1, 'Use These Options')
+        self.use_btn.SetToolTipString('Set the options of the selected run '
+                                      'in the option panels.')
+        self.Bind(wx.EVT_BUTTON, self.on_use, self.use_btn)
+        self.state_text = wx.StaticText(panel, -1, '')
+
+        self.list = wx.ListCtrl(panel, -1, style=wx.LC_REPORT|wx.LC_SINGLE_SEL)
+        self.Bind(wx.EVT_LIST_COL_CLICK, self.on_column, self.list)
+
+        dsizer = wx.BoxSizer(wx.HORIZONTAL)
+        for (x, border) in [(self.design_ch, 10), (samples_lab, 3),
+                            (self.samples_ctrl, 10), (deadline_lab, 3),
+                            (self.deadline_ctrl, 0)]:
+            dsizer.Add(x, 0, wx.RIGHT|wx.ALIGN_CENTER_VERTICAL, border)
+
+        bsizer = wx.BoxSizer(wx.HORIZONTAL)
+        bsizer.Add(self.start_btn)
+        bsizer.Add(self.cancel_btn)
+        bsizer.Add(self.use_btn)
+        bsizer.Add(self.state_text, 0, wx.LEFT|wx.ALIGN_CENTER_VERTICAL, 10)
+
+        sizer = wx.BoxSizer(wx.VERTICAL)
+        sizer.Add(gsizer, 0, wx.ALL, 5)
+        sizer.Add(dsizer, 0, wx.ALL, 5)
+        sizer.Add(bsizer, 0, wx.ALL, 5)
+        sizer.Add(self.list, 1, wx.ALL|wx.GROW, 5)
+        panel.SetSizer(sizer)
+
+        self.Bind(wx.EVT_CLOSE, self.on_close)
+        self.on_program(None)
+        self.Show(True)
+
+    def on_invoke(self, evt):
+        evt.invoke()
+
+    def invoke_later(self, func, *args, **kwargs):
+        self.GetEventHandler().AddPendingEvent(Invoke_event(func,args,kwargs))
+
+    def program_name(self):
+        return self.prog_ch.GetStringSelection()
+
+    def option_records(self):
+        "The records of the program's options, by name (one per name)."
+        if self.program_name() == 'Prover9':
+            sets = [opts for (_,opts)
+                    in self.setup.p9_options.panels.option_sets]
+        else:
+            sets = [self.setup.m4_options.options]
+        records = {}
+        for opts in sets:
+            for opt in opts:
+                if opt[Type] in [Flag, Parm, Stringparm]:
+                    records.setdefault(opt[Name], opt)
+        return records
+
+    def dependencies(self):
+        if self.program_name() == 'Prover9':
+            return self.setup.p9_options.panels.dependencies
+        else:
+            return self.setup.m4_options.dependencies
+
+    def on_program(self, evt):
+        names = [''] + sorted(self.option_records().keys())
+        for i in range(self.Sweep_rows):
+            self.name_chs[i].SetItems(names)
+            self.name_chs[i].SetSelection(0)
+            self.value_ctrls[i].SetValue('')
+            self.range_labs[i].SetLabel('')
+
+    def on_name(self, evt):
+        records = self.option_records()
+        for i in range(self.Sweep_rows):
+            opt = records.get(self.name_chs[i].GetStringSelection())
+            if not opt:
+                label = ''
+            elif opt[Type] == Flag:
+                label = 'flag: both values'
+            elif opt[Type] == Parm:
+                label = 'range [%d ... %d], default %d' % (
+                    opt[Range][0], opt[Range][1], opt[Default])
+            else:
+                label = ', '.join(opt[Range])
+            self.range_labs[i].SetLabel(label)
+
+    def parameters(self):
+        records = self.option_records()
+        params = []
+        for i in range(self.Sweep_rows):
+            name = self.name_chs[i].GetStringSelection()
+            if name:
+                if name in [p.name for p in params]:
+                    raise ValueError('%s is selected twice' % name)
+                params.append(sweep.Parameter(records[name],
+                                              self.value_ctrls[i].GetValue()))
+        if not params:
+            raise ValueError('Select at least one option.')
+        return params
+
+    def on_start(self, evt):
+        try:
+            self.params = self.parameters()
+            if self.design_ch.GetSelection() == 0:
+                points = sweep.design(self.params, 'cartesian')
+            else:
+                points = sweep.design(self.params, 'lhs',
+                                      self.samples_ctrl.GetValue())
+        except ValueError as e:
+            error_dialog(str(e))
+            return
+        if self.sweep:
+            self.sweep.close()
+        self.names = [p.name for p in self.params]
+        self.count_name = ('Given' if self.program_name() == 'Prover9'
+                           else 'Domain Size')
+        self.list.ClearAll()
+        for (i, title) in enumerate(['#'] + self.names +
+                                    ['Outcome', 'CPU', self.count_name,
+                                     'Wall']):
+            self.list.InsertColumn(i, title)
+        self.results = []
+        self.sort_column = None
+        self.sweep = sweep.Sweep(self.program_name(),
+                                 self.setup.assemble_input(), points,
+                                 self.dependencies(),
+                                 deadline=self.deadline_ctrl.GetValue(),
+                                 on_result=self.result_found)
+        self.total = len(points)
+        self.start_btn.Enable(False)
+        self.cancel_btn.Enable(True)
+        self.state_text.SetLabel('0 of %d done' % self.total)
+        try:
+            self.sweep.start()
+        except (socket.error, Rpc_error) as e:
+            self.sweep.cancel()
+            error_dialog('Error submitting the sweep: %s' % e)
+
+    def result_found(self, result):
+        # in the batch thread
+        self.invoke_later(self.show_result, result)
+
+    def show_result(self, result):
+        self.results.append(result)
+        if self.sort_column is not None:
+            self.sort_results()
+        self.fill_list()
+        n = len(self.results)
+        solved = len([r for r in self.results if r.solved])
+        self.state_text.SetLabel('%d of %d done, %d solved' %
+                                 (n, self.total, solved))
+        if n == self.total:
+            self.start_btn.Enable(True)
+            self.cancel_btn.Enable(False)
+
+    def row(self, r):
+        return ([r.index + 1] + [r.point[n] for n in self.names] +
+                [r.message, r.cpu, r.count,
+                 round(r.wall, 2) if r.wall is not None else None])
+
+    def fill_list(self):
+        self.list.DeleteAllItems()
+        for r in self.results:
+            cells = ['' if x is None else str(x) for x in self.row(r)]
+            i = self.list.InsertStringItem(self.list.GetItemCount(), cells[0])
+            for (j, cell) in enumerate(cells[1:]):
+                self.list.SetStringItem(i, j + 1, cell)
+        for j in range(self.list.GetColumnCount()):
+            self.list.SetColumnWidth(j, wx.LIST_AUTOSIZE_USEHEADER)
+
+    def sort_results(self):
+        def key(r):
+            x = self.row(r)[self.sort_column]
+            try:
+                return (0, float(x))
+            except (TypeError, ValueError):
+                return (1, x)
+        self.results.sort(key=key)
+
+    def on_column(self, evt):
+        self.sort_column = evt.GetColumn()
+        self.sort_results()
+        self.fill_list()
+
+    def on_use(self, evt):
+        i = self.list.GetFirstSelected()
+        if i < 0:
+            error_dialog('Select a run first.')
+            return
+        point = self.results[i].point
+        values = sweep.dependent_values(point, self.dependencies())
+        records = self.option_records()
+        triples = [(records[n][Type], n, v) for (n, v) in values.items()
+                   if n in records]
+        if self.program_name() == 'Prover9':
+            set_option_triples(triples, self.setup.p9_options.panels)
+        else:
+            set_option_triples(triples, self.setup.m4_options)
+
+    def on_cancel(self, evt):
+        if self.sweep:
+            self.sweep.cancel()
+
+    def on_close(self, evt):
+        if self.sweep and len(self.results) < self.total:
+            self.sweep.cancel()
+        self.sweep = None
+        self.Destroy()
+
+# END class Sweep_frame(wx.Frame)
+
+class Fanout_frame(wx.Frame):
+    # Seed fan-out (fanout.py): K copies of the Prover9 problem with
+    # distinct random seeds; the first proof stops the others.
+
+    def __init__(self, parent, setup):
+
+        self.parent = parent
+        self.setup = setup
+        self.fanout = None
+
+        wx.Frame.__init__(self, parent, title='Prover9 Seed Fan-out',
+                          size=(500,450), pos=pos_for_center((0,0)))
+
+        self.Connect(-1, -1, Invoke_event.my_EVT_INVOKE, self.on_invoke)
+
+        panel = wx.Panel(self)
+
+        k_lab = wx.StaticText(panel, -1, 'Seeds:')
+        self.k_ctrl = wx.SpinCtrl(panel, -1, min=1, max=1000,
+                                  initial=fanout.K, size=(75,-1))
+        first_lab = wx.StaticText(panel, -1, 'First seed:')
+        self.first_ctrl = wx.SpinCtrl(panel, -1, min=0, max=100000,
+                                      initial=1, size=(75,-1))
+        deadline_lab = wx.StaticText(panel, -1, 'Seconds per seed:')
+        self.deadline_ctrl = wx.SpinCtrl(panel, -1, min=1, max=100000,
+                                         initial=60, size=(75,-1))
+        self.all_cb = wx.CheckBox(panel, -1, 'Run all seeds to the end')
+        self.all_cb.SetToolTipString('Do not stop at the first proof, to '
+                                     'see the whole distribution.')
+
+        self.start_btn = wx.Button(panel, -1, 'Start')
+        self.Bind(wx.EVT_BUTTON, self.on_start, self.start_btn)
+        self.stop_btn = wx.Button(panel, -1, 'Stop')
+        self.Bind(wx.EVT_BUTTON, self.on_stop, self.stop_btn)
+        self.stop_btn.Enable(False)
+        self.proof_btn = wx.Button(panel, -1, 'Show Proof')
+        self.Bind(wx.EVT_BUTTON, self.on_proof, self.proof_btn)
+        self.proof_btn.Enable(False)
+
+        self.list = wx.ListCtrl(panel, -1, style=wx.LC_REPORT)
+        for (i, title) in enumerate(['Seed', 'Outcome', 'CPU', 'Wall']):
+            self.list.InsertColumn(i, title)
+        self.summary_text = wx.StaticText(panel, -1, '', size=(450,70))
+
+        gsizer = wx.GridBagSizer(5,5)
+        for (i, (lab, ctrl)) in enumerate([(k_lab, self.k_ctrl),
+                                           (first_lab, self.first_ctrl),
+                                           (deadline_lab,
+                                            self.deadline_ctrl)]):
+            gsizer.Add(lab,  (i,0), (1,1),
+                       wx.ALIGN_RIGHT|wx.ALIGN_CENTER_VERTICAL)
+            gsizer.Add(ctrl, (i,1))
+
+        bsizer = wx.BoxSizer(wx.HORIZONTAL)
+        bsizer.Add(self.start_btn)
+        bsizer.Add(self.stop_btn)
+        bsizer.Add(self.proof_btn)
+
+        sizer = wx.BoxSizer(wx.VERTICAL)
+        sizer.Add(gsizer, 0, wx.ALL, 5)
+        sizer.Add(self.all_cb, 0, wx.ALL, 5)
+        sizer.Add(bsizer, 0, wx.ALL, 5)
+        sizer.Add(self.list, 1, wx.ALL|wx.GROW, 5)
+        sizer.Add(self.summary_text, 0, wx.ALL|wx.GROW, 5)
+        panel.SetSizer(sizer)
+
+        self.Bind(wx.EVT_CLOSE, self.on_close)
+        self.Show(True)
+
+    def on_invoke(self, evt):
+        evt.invoke()
+
+    def invoke_later(self, func, *args, **kwargs):
+        self.GetEventHandler().AddPendingEvent(Invoke_event(func,args,kwargs))
+
+    def on_start(self, evt):
+        if self.fanout:
+            self.fanout.close()
+        self.list.DeleteAllItems()
+        self.summary_text.SetLabel('')
+        self.proof_btn.Enable(False)
+        self.fanout = fanout.Fan_out(self.setup.assemble_input(),
+                                     self.k_ctrl.GetValue(),
+                                     self.first_ctrl.GetValue(),
+                                     self.deadline_ctrl.GetValue(),
+                                     not self.all_cb.IsChecked(),
+                                     self.result_found)
+        self.start_btn.Enable(False)
+        self.stop_btn.Enable(True)
+        try:
+            self.fanout.start()
+        except (socket.error, Rpc_error) as e:
+            self.fanout.cancel()
+            error_dialog('Error submitting the seeds: %s' % e)
+
+    def result_found(self, run):
+        # in the batch thread
+        self.invoke_later(self.show_result, run)
+
+    def show_result(self, run):
+        cells = [str(run.seed), run.message,
+                 '%.2f' % run.cpu if run.cpu is not None else '',
+                 '%.2f' % run.wall if run.wall is not None else '']
+        i = self.list.InsertStringItem(self.list.GetItemCount(), cells[0])
+        for (j, cell) in enumerate(cells[1:]):
+            self.list.SetStringItem(i, j + 1, cell)
+        summary = self.fanout.summary()
+        self.summary_text.SetLabel(fanout.format_summary(summary))
+        self.proof_btn.Enable(summary['winner'] is not None)
+        if summary['done'] == summary['seeds']:
+            self.start_btn.Enable(True)
+            self.stop_btn.Enable(False)
+
+    def on_stop(self, evt):
+        if self.fanout:
+            self.fanout.cancel()
+
+    def on_proof(self, evt):
+        proof = self.fanout.solution()
+        if proof:
+            frame = Text_frame(self, to_top(self.parent).box_font,
+                               'Prover9 Proof (seed %d)' % self.fanout.winner,
+                               proof, extension='proof', saveas=True)
+            frame.Show(True)
+
+    def on_close(self, evt):
+        if self.fanout:
+            self.fanout.cancel()
+        self.fanout = None
+        self.Destroy()
+
+# END class Fanout_frame(wx.Frame)
@@ -0,0 +1,342 @@
+#     Copyright (C) 2007 William McCune
+#
+#     This file is part of the LADR Deduction Library.
+#
+#     The LADR Deduction Library is free software; you can redistribute it
+#     and/or modify it under the terms of the GNU General Public License
+#     as published by the Free Software Foundation; either version 2 of the
+#     License, or (at your option) any later version.
+#
+#     The LADR Deduction Library is distributed in the hope that it will be
+#     useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+#     MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#     GNU General Public License for more details.
+#
+#     You should have received a copy of the GNU General Public License
+#     along with the LADR Deduction Library; if not, write to the Free Software
+#     Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+
+# system imports
+
+import re
+import time
+import itertools
+import threading
+
+# local imports
+
+import partition_input
+from partition_input import formulas
+from utilities import State
+from batch import Job_group, Part, with_options
+from job_server import pool_client
+from supervisor import Thread_timer
+
+# A Mace4 search of one domain size, split into cubes: each cube is the
+# input with unit constraints that fix the values of some cells (for
+# example f(0,0) = 2, or -P(1)), and the cubes of a split give a cell
+# all of its values, so together they partition the search space.  The
+# cubes run at once on the pool; when a cube is exhausted and a worker
+# is idle, the cube that has run longest is split again (stopped, and
+# replaced by its children).  With max_models 1 the first model stops
+# the others; otherwise the models of all cubes are collected.
+
+Max_symbols = 3         # the symbols whose cells are used, most frequent first
+Max_cells = 64
+Min_split_seconds = 2   # a cube that has run less is not split again
+
+Variable = re.compile('[u-z][A-Za-z0-9_]*$')  # (not prolog_style_variables)
+Element = re.compile('[0-9]+$')
+Name = '[A-Za-z_$][A-Za-z0-9_$]*'
+
+# LADR's built-in infix and postfix operators, then declared ones
+Builtin_infix = ['*', '+', '/', '\\', '@', '^', 'v']
+Builtin_postfix = ["'"]
+
+class Symbol:
+    def __init__(self, name, arity, kind, syntax='prefix'):
+        self.name = name
+        self.arity = arity
+        self.kind = kind       # 'function' or 'relation'
+        self.syntax = syntax   # 'prefix', 'infix' or 'postfix'
+        self.count = 0
+
+    def term(self, args):
+        args = [str(a) for a in args]
+        if self.arity == 0:
+            return self.name
+        elif self.syntax == 'infix':
+            return '(%s %s %s)' % (args[0], self.name, args[1])
+        elif self.syntax == 'postfix':
+            return '%s%s' % (args[0], self.name)
+        else:
+            return '%s(%s)' % (self.name, ','.join(args))
+
+    def __repr__(self):
+        return '<Symbol %s/%d %s>' % (self.name, self.arity, self.kind)
+
+# end class Symbol
+
+def declared_ops(lang):
+    "{symbol: syntax} of the op declarations."
+    ops = {}
+    for m in re.finditer('op\s*\(\s*[^,]+,\s*([a-z_]+)\s*,\s*'
+                         '(\[[^]]*\]|[^)]+)\)', lang):
+        syntax = m.group(1).split('_')[0]  # infix_left -> infix
+        if syntax in ['infix', 'prefix', 'postfix']:
+            for name in re.findall('"([^"]+)"|([^\s,\[\]"]+)', m.group(2)):
+                ops[name[0] or name[1]] = syntax
+    return ops
+
+def literals(formula):
+    "The atoms of a formula, without signs, quantifiers or connectives."
+    parts = re.split('<->|->|<-|\||&', formula)
+    atoms = []
+    for part in parts:
+        part = re.sub('\\b(all|exists)\s+%s' % Name, ' ', part)
+        part = part.strip().lstrip('-( ').strip()
+        # parentheses left over from the connectives
+        while part.count(')') > part.count('(') and part.endswith(')'):
+            part = part[:-1].strip()
+        if part:
+            atoms.append(part)
+    return atoms
+
+def symbols(input):
+    """The function and relation symbols of the assumptions and goals,
+    most frequent first.  A symbol in an equation is a function; the
+    head of any other atom is a relation.  Symbols used both ways, and
+    prefix operators (ambiguous with negation), are left out."""
+    (p9, m4, assumps, goals, opt, lang, other) = partition_input.partition(input)
+    ops = declared_ops(lang)
+    infix = Builtin_infix + [o for o in ops if ops[o] == 'infix']
+    postfix = Builtin_postfix + [o for o in ops if ops[o] == 'postfix']
+    found = {}
+    bad = set()
+
+    def note(name, arity, kind, syntax='prefix'):
+        s = found.get(name)
+        if s and (s.kind != kind or s.arity != arity):
+            bad.add(name)
+        elif not s:
+            s = found[name] = Symbol(name, arity, kind, syntax)
+        if s:
+            s.count += 1
+
+    for formula in formulas(assumps) + formulas(goals):
+        for atom in literals(formula):
+            if '=' in atom:
+                for m in re.finditer('(%s)(\(?)' % Name, atom):
+                    name = m.group(1)
+                    if name in ops and ops[name] == 'prefix':
+                        bad.add(name)
+                    elif m.group(2):
+                        note(name, arity_at(atom, m.end()), 'function')
+                    elif name in infix:
+                        note(name, 2, 'function', 'infix')
+                    elif not Variable.match(name):
+                        note(name, 0, 'function')
+                for op in infix + postfix:
+                    if not re.match(Name, op) and op in atom:
+                        note(op, 2 if op in infix else 1, 'function',
+                             'infix' if op in infix else 'postfix')
+            else:
+                m = re.match('(%s)\s*(\(?)' % Name, atom)
+                if m and m.group(2):
+                    note(m.group(1), arity_at(atom, m.end()), 'relation')
+                elif m and m.end() == len(atom):
+                    note(m.group(1), 0, 'relation')
+                else:
+                    for op in infix:
+                        if op in atom:
+                            note(op, 2, 'relation', 'infix')
+                            break
+    result = [s for s in found.values() if s.name not in bad and
+              not Element.match(s.name) and s.name not in ['all', 'exists']]
+    result.sort(key=lambda s: (-s.count, -s.arity, s.name))
+    return result
+
+def arity_at(text, i):
+    "The number of arguments of the application whose '(' ends at i."
+    (level, n) = (1, 1)
+    while i < len(text) and level > 0:
+        c = text[i]
+        if c == '(':
+            level += 1
+        elif c == ')':
+            level -= 1
+        elif c == ',' and level == 1:
+            n += 1
+        i += 1
+    return n
+
+class Cell:
+    def __init__(self, symbol, args):
+        self.symbol = symbol
+        self.args = args
+
+    def values(self, size):
+        if self.symbol.kind == 'function':
+            return range(size)
+        return [True, False]
+
+    def constraint(self, value):
+        term = self.symbol.term(self.args)
+        if self.symbol.kind == 'function':
+            return '%s = %d' % (term, value)
+        elif value:
+            return term
+        else:
+            return '-(%s)' % term
+
+# end class Cell
+
+def cells(symbols, size):
+    "The cells to split on, in order: those of the first symbols."
+    result = []
+    for s in symbols[:Max_symbols]:
+        for args in itertools.product(range(size), repeat=s.arity):
+            result.append(Cell(s, args))
+            if len(result) == Max_cells:
+                return result
+    return result
+
+class Cube:
+    "Values of the first len(values) cells."
+    def __init__(self, values):
+        self.values = values
+
+    def constraints(self, cells):
+        return [c.constraint(v) for (c, v) in zip(cells, self.values)]
+
+    def children(self, cells, size):
+        if len(self.values) >= len(cells):
+            return []
+        cell = cells[len(self.values)]
+        return [Cube(self.values + [v]) for v in cell.values(size)]
+
+# end class Cube
+
+def initial_cubes(cells, size, k):
+    "At least k cubes (if there are cells enough), splitting breadth first."
+    cubes = [Cube([])]
+    while len(cubes) < k:
+        children = cubes[0].children(cells, size)
+        if not children:
+            break
+        cubes = cubes[1:] + children
+    return cubes
+
+def fixed_size(triples):
+    """The domain size of a search of one size (domain_size, or start_size
+    equal to end_size), from options triples; else None."""
+    values = dict([(name, value) for (type, name, value) in triples])
+    if values.get('domain_size', 0) > 0:
+        return values['domain_size']
+    if values.get('start_size', 2) == values.get('end_size', -1):
+        return values['start_size']
+    return None
+
+class Cube_group(Job_group):
+    """
+    A Mace4 search of one domain size as cubes (see above).  first: stop
+    at the first model (else collect the models of all cubes).  k: the
+    number of cubes to start with (default: twice the workers).
+    """
+    def __init__(self, program, input, size, first=True, k=None,
+                 client=None, **kwargs):
+        client = client or pool_client()
+        self.workers = max(1, client.call('info')['workers'])
+        self.size = size
+        self.first = first
+        self.found = False
+        self.lock = threading.Lock()  # rebalance, from two threads
+        self.timer = None
+        self.indexes = itertools.count()
+        self.cells = cells(symbols(input), size)
+        self.base = with_options(input, {'start_size': size,
+                                         'end_size': size}, 'Mace4')
+        parts = [self.part(c) for c in
+                 initial_cubes(self.cells, size, k or 2 * self.workers)]
+        Job_group.__init__(self, program, input, parts, client=client,
+                           **kwargs)
+
+    def part(self, cube):
+        constraints = cube.constraints(self.cells)
+        index = self.indexes.next()
+        label = 'Cube %d: %s' % (index + 1, ', '.join(constraints) or 'all')
+        input = self.base
+        if constraints:
+            input += ('\nformulas(assumptions).  %% the cube\n%s.\n'
+                      'end_of_list.\n' % '.\n'.join(constraints))
+        part = Part(index, label, input)
+        part.cube = cube
+        part.split = False
+        return part
+
+    def part_finished(self, part):
+        if part.split:
+            part.message = 'Split'
+        elif part.solution and self.first:
+            if not self.found:
+                self.found = True
+                self.batch.cancel()
+        else:
+            self.rebalance()  # a worker is free
+
+    def rebalance(self):
+        """If a worker is idle, split the cube that has run longest; if it
+        has not run long enough, try again when it has."""
+        with self.lock:
+            self.timer = None
+            if not (self.found or self.stop_reason or
+                    self.state == State.done):
+                self.split_longest()
+
+    def split_longest(self):
+        split = set([p.index for p in self.parts if p.split])
+        running = []
+        for index in self.batch.running():
+            if index in split:
+                continue  # cancelled, and not yet over
+            status = self.batch.call('status', index)
+            if status['state'] == 'queued':
+                return  # the idle worker will take it
+            running.append((status['times'].get('started'), index))
+        if not running or len(running) >= self.workers:
+            return
+        (started, index) = min(running)
+        if not started or time.time() - started < Min_split_seconds:
+            if not self.timer:
+                wait = Min_split_seconds - (time.time() - (started or 0))
+                self.timer = Thread_timer(max(0.1, min(wait,
+                                                       Min_split_seconds)),
+                                          self.rebalance, ())
+            return
+        victim = [p for p in self.parts if p.index == index][0]
+        children = victim.cube.children(self.cells, self.size)
+        if children:
+            victim.split = True
+            self.batch.call('cancel', index, hard=True)
+            for cube in children:
+                self.submit(self.part(cube))
+
+    def solution_of(self):
+        models = [p.solution for p in self.parts
+                  if p.solution and not p.split]
+        return self.program.join_solutions(models) if models else None
+
+    def exit_code_of(self):
+        """As for one Mace4 search: 0 if the first model stopped it, else
+        Exhausted (yes or no) if every cube was, else the first other."""
+        found = [p for p in self.parts if p.solution and not p.split]
+        if self.found:
+            return 0
+        codes = [p.status['exit_code'] for p in self.parts if not p.split]
+        for code in codes:
+            if code not in [2, 3]:
+                return code if code is not None else -2
+        return 3 if found else 2
+
+# end class Cube_group
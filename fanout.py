@@ -0,0 +1,206 @@
+#     Copyright (C) 2007 William McCune
+#
+#     This file is part of the LADR Deduction Library.
+#
+#     The LADR Deduction Library is free software; you can redistribute it
+#     and/or modify it under the terms of the GNU General Public License
+#     as published by the Free Software Foundation; either version 2 of the
+#     License, or (at your option) any later version.
+#
+#     The LADR Deduction Library is distributed in the hope that it will be
+#     useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+#     MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#     GNU General Public License for more details.
+#
+#     You should have received a copy of the GNU General Public License
+#     along with the LADR Deduction Library; if not, write to the Free Software
+#     Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+
+"""
+Seed fan-out: K copies of a Prover9 problem, each with its own
+random_seed, run at once on the pool (batch.py); the first proof stops
+the others.  The run times across seeds (those stopped count as at
+least as long as they ran) are reported, and each run is in the history.
+
+Usage:
+    python fanout.py [-k 8] [--first-seed 1] [--deadline SECONDS]
+                     [--all] FILE.in
+"""
+
+# system imports
+
+import sys
+import time
+import argparse
+import threading
+
+# local imports
+
+from batch import Batch, with_options, cpu_seconds
+from history import options_from_input
+
+K = 8
+
+# If the input does not make the search random, this does, with as
+# little change as possible: one given clause in ten is picked at random.
+
+Randomize = {'random_part': 1}
+
+def is_stochastic(input):
+    "Does the search depend on random_seed?"
+    for (type, name, value) in options_from_input(input, 'Prover9'):
+        if name == 'random_given' and value == 'True':
+            return True
+        if name == 'random_part' and value not in ['0']:
+            return True
+    return False
+
+class Seed_run:
+    "The outcome of a seed."
+    def __init__(self, seed, status):
+        self.seed = seed
+        self.status = status
+        self.message = status['message']
+        self.solved = status['exit_code'] == 0
+        self.cpu = cpu_seconds(status)
+        times = status['times']
+        self.wall = (times['finished'] - times['started']
+                     if 'started' in times else None)
+
+# end class Seed_run
+
+def percentile(values, p):
+    "values sorted; p in 0..100."
+    if not values:
+        return None
+    i = int(round((len(values) - 1) * p / 100.0))
+    return values[i]
+
+class Fan_out:
+    """
+    The seeds of a problem, run as a batch.  With stop_at_first, the
+    first proof stops the others (softly, so that they report their
+    statistics).  on_result(seed_run) is called in the batch's thread.
+    """
+    def __init__(self, input, k=K, first_seed=1, deadline=None,
+                 stop_at_first=True, on_result=None, client=None):
+        self.input = input
+        self.seeds = range(first_seed, first_seed + k)
+        self.deadline = deadline
+        self.stop_at_first = stop_at_first
+        self.on_result = on_result
+        self.randomized = not is_stochastic(input)
+        self.runs = {}       # seed -> Seed_run
+        self.winner = None   # the first seed with a proof
+        self.lock = threading.Lock()
+        self.batch = Batch(client, self.job_done)
+
+    def start(self):
+        self.started = time.time()
+        self.first_time = None
+        options = dict(Randomize) if self.randomized else {}
+        for seed in self.seeds:
+            options['random_seed'] = seed
+            self.batch.submit(seed, 'Prover9',
+                              with_options(self.input, options, 'Prover9'),
+                              deadline=self.deadline)
+
+    def job_done(self, seed, status):
+        run = Seed_run(seed, status)
+        stop = False
+        with self.lock:
+            self.runs[seed] = run
+            if run.solved and self.winner is None:
+                self.winner = seed
+                self.first_time = time.time() - self.started
+                stop = self.stop_at_first
+        if stop:
+            self.batch.cancel()
+        if self.on_result:
+            self.on_result(run)
+
+    def solution(self):
+        "The proof of the first seed that found one, or None."
+        if self.winner is None:
+            return None
+        return self.batch.call('solution', self.winner)
+
+    def summary(self):
+        """The distribution of CPU seconds over the seeds: of the solved
+        ones, and a lower bound for the others (stopped or at a limit)."""
+        runs = self.runs.values()
+        solved = sorted([r.cpu for r in runs if r.solved and r.cpu is not None])
+        censored = sorted([r.cpu for r in runs
+                           if not r.solved and r.cpu is not None])
+        return {'seeds': len(self.seeds),
+                'done': len(runs),
+                'solved': len(solved),
+                'winner': self.winner,
+                'first_wall': self.first_time,
+                'randomized': self.randomized,
+                'cpu_solved': solved,
+                'cpu_unsolved': censored,
+                'min': percentile(solved, 0),
+                'median': percentile(solved, 50),
+                'max': percentile(solved, 100)}
+
+    def cancel(self):
+        self.batch.cancel()
+
+    def wait(self, timeout=None):
+        return self.batch.wait(timeout)
+
+    def close(self):
+        self.batch.close()
+
+# end class Fan_out
+
+def format_summary(s):
+    lines = ['%d of %d seeds solved' % (s['solved'], s['done'])]
+    if s['randomized']:
+        lines.append('(random_part 1 was added: the input is not random)')
+    if s['winner'] is not None:
+        lines.append('first proof: seed %d, after %.2f wall seconds' %
+                     (s['winner'], s['first_wall']))
+    if s['solved']:
+        lines.append('CPU seconds of the solved seeds: min %.2f, '
+                     'median %.2f, max %.2f' % (s['min'], s['median'],
+                                                s['max']))
+    if s['cpu_unsolved']:
+        lines.append('the others ran %s CPU seconds without a proof' %
+                     ', '.join(['%.2f' % x for x in s['cpu_unsolved']]))
+    return '\n'.join(lines)
+
+def main(argv):
+    parser = argparse.ArgumentParser(
+        description='Run a Prover9 problem with several random seeds.')
+    parser.add_argument('file', help='the input file')
+    parser.add_argument('-k', type=int, default=K, help='the number of seeds')
+    parser.add_argument('--first-seed', type=int, default=1)
+    parser.add_argument('--deadline', type=float,
+                        help='wall seconds for each seed')
+    parser.add_argument('--all', action='store_true',
+                        help='run all seeds to the end (the distribution)')
+    args = parser.parse_args(argv)
+
+    def show(run):
+        print 'seed %4d  %-16s %8s CPU s' % (
+            run.seed, run.message,
+            '%.2f' % run.cpu if run.cpu is not None else '?')
+
+    f = Fan_out(open(args.file).read(), args.k, args.first_seed,
+                args.deadline, not args.all, show)
+    f.start()
+    try:
+        while not f.wait(1):
+            pass
+    except KeyboardInterrupt:
+        f.cancel()
+        f.wait()
+    print format_summary(f.summary())
+    f.close()
+    return 0 if f.winner is not None else 1
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,584 @@
+#     Copyright (C) 2007 William McCune
+#
+#     This file is part of the LADR Deduction Library.
+#
+#     The LADR Deduction Library is free software; you can redistribute it
+#     and/or modify it under the terms of the GNU General Public License
+#     as published by the Free Software Foundation; either version 2 of the
+#     License, or (at your option) any later version.
+#
+#     The LADR Deduction Library is distributed in the hope that it will be
+#     useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+#     MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#     GNU General Public License for more details.
+#
+#     You should have received a copy of the GNU General Public License
+#     along with the LADR Deduction Library; if not, write to the Free Software
+#     Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+
+"""
+Worker agents for the job server, so that the searches of one server
+can run on several machines.
+
+Usage:
+    python job_server.py --agents [--workers N] [--token T] ADDRESS
+    python federation.py [--cores N] [--prefetch N] [--token T]
+                         SERVER AGENT_ADDRESS
+
+    PROVER9_MACE4_AGENT_TOKEN   the shared secret (instead of --token)
+
+The server (a Coordinator) runs jobs on its own workers, if any, and
+hands the others to agents.  An agent runs its own job server (a
+Job_server on AGENT_ADDRESS, with the binaries in its own bin/), with
+as many workers as it has cores.  Every second it sends a heartbeat
+with its load, and pulls jobs as it has room for them (a few more, the
+prefetch, wait in its backlog).  It must begin() each job with the
+server before starting it, so a job is run by only one agent:
+
+  - an idle agent that finds no waiting jobs steals half of the backlog
+    of the agent with the most unstarted jobs;
+  - if an agent misses heartbeats for Agent_timeout seconds, its jobs
+    are queued again, and it must register again if it comes back.
+
+Solutions and status go to the server as they come; the output stays
+on the agent, which keeps the job until the server removes it, and the
+server forwards stats, given and output requests there (the status of
+a job gives its agent's address).  Several agents on one machine, each
+with its own address, stand in for a cluster in tests.
+
+The agent methods (register, heartbeat, pull, begin, report) take a
+token, a secret shared by the server and its agents, so that a host
+that can reach the server cannot take its jobs or report false results.
+"""
+
+# system imports
+
+import os
+import sys
+import time
+import hmac
+import socket
+import argparse
+import threading
+import itertools
+import traceback
+
+# local imports
+
+from utilities import State
+from job_server import Job_server, Served_job, Client, Rpc_error, Job_error
+from job_server import make_server, State_names, Output_chunk
+from scheduler import Priorities, cpu_count
+
+Heartbeat = 1.0        # seconds between heartbeats of an agent
+Agent_timeout = 10.0   # seconds without a heartbeat before requeueing
+Prefetch = 2           # jobs an agent pulls beyond its free cores
+
+Auth_error = 2         # JSON-RPC error code: a wrong token
+
+def agent_token():
+    "The shared secret from the environment, or None."
+    return os.environ.get('PROVER9_MACE4_AGENT_TOKEN') or None
+
+class Placed_job(Served_job):
+    "A Served_job that the Coordinator may place on an agent."
+    def __init__(self, *args, **kwargs):
+        Served_job.__init__(self, *args, **kwargs)
+        self.agent = None      # the id of its agent, if placed
+        self.remote_id = None  # its id on the agent's job server
+        self.begun = False     # the agent has begun it
+        self.remote_bytes = 0  # of output, on the agent
+
+    def spec(self):
+        "What an agent needs to run it."
+        return {'id': self.id,
+                'program': self.program.name.lower(),
+                'input': self.input,
+                'deadline': self.deadline,
+                'priority': self.priority,
+                'filter_output': self.filter_output}
+
+    def requeue(self):
+        with self.changed:
+            self.agent = None
+            self.remote_id = None
+            self.begun = False
+            self.extracted = []  # it runs again from the start
+            self.state = State.ready
+            self.times.pop('started', None)
+            self.changed.notify_all()
+
+    def status(self):
+        status = Served_job.status(self)
+        if self.agent is not None:
+            agent = self.server.agents.get(self.agent)
+            status['agent'] = agent.address if agent else None
+            status['agent_job'] = self.remote_id
+            if self.over():
+                status['output_bytes'] = self.remote_bytes
+        return status
+
+# end class Placed_job
+
+class Agent_record:
+    "The Coordinator's record of one agent."
+    def __init__(self, id, name, cores, address):
+        self.id = id
+        self.name = name
+        self.cores = cores
+        self.address = address   # of the agent's job server
+        self.load = 0.0
+        self.running = 0
+        self.last_seen = time.time()
+        self.commands = []       # for the next heartbeat
+        self.client = None
+        self.lock = threading.Lock()
+
+    def call(self, method, **params):
+        with self.lock:
+            if not self.client:
+                try:
+                    self.client = Client(self.address)
+                except socket.error:
+                    raise Rpc_error(Job_error, 'agent %s is unreachable' %
+                                    self.name)
+            client = self.client
+        try:
+            return client.call(method, **params)
+        except socket.error:
+            with self.lock:
+                self.client = None
+            raise Rpc_error(Job_error, 'agent %s is unreachable' % self.name)
+
+    def info(self):
+        return {'id': self.id, 'name': self.name, 'cores': self.cores,
+                'address': self.address, 'load': self.load,
+                'running': self.running,
+                'seen': round(time.time() - self.last_seen, 1)}
+
+# end class Agent_record
+
+class Coordinator(Job_server):
+    """
+    A Job_server that also gives jobs to agents: register, heartbeat,
+    pull, begin and report are called by the agents.  The other
+    methods forward to the agent when a job has been placed there.
+    """
+    Job_class = Placed_job
+
+    def __init__(self, workers=0, token=None):
+        Job_server.__init__(self, workers)
+        if not token:
+            raise ValueError('worker agents need a token')
+        self.token = token
+        self.agents = {}  # id -> Agent_record
+        self.agent_ids = itertools.count(1)
+        self.reaper = None
+
+    def placed(self, job):
+        "The agent of a job, if it has begun there."
+        if job.agent is not None and job.begun:
+            return self.agents.get(job.agent)
+        return None
+
+    def forward(self, job, method, **params):
+        agent = self.placed(job)
+        if job.remote_id is None:
+            raise Rpc_error(Job_error, 'job %s has not started' % job.id)
+        return agent.call(method, id=job.remote_id, **params)
+
+    # The agents
+
+    def check(self, token):
+        if not hmac.compare_digest(str(token), self.token):
+            raise Rpc_error(Auth_error, 'wrong agent token')
+
+    def rpc_register(self, token, name, cores, address):
+        self.check(token)
+        with self.lock:
+            id = self.agent_ids.next()
+            self.agents[id] = Agent_record(id, name, cores, address)
+            if not self.reaper:
+                self.reaper = threading.Thread(target=self.reap_loop,
+                                               name='agent reaper')
+                self.reaper.setDaemon(True)
+                self.reaper.start()
+        return id
+
+    def rpc_heartbeat(self, token, agent, load=0.0, running=0):
+        self.check(token)
+        with self.lock:
+            a = self.agents.get(agent)
+            if not a:
+                return {'unknown': True}  # timed out: register again
+            a.last_seen = time.time()
+            a.load = load
+            a.running = running
+            (commands, a.commands) = (a.commands, [])
+        return {'commands': commands}
+
+    def rpc_pull(self, token, agent, n=1, running=0):
+        self.check(token)
+        with self.lock:
+            a = self.agents.get(agent)
+            if not a:
+                return []
+            a.running = running
+            self.waiting.sort(key=lambda j: (Priorities.index(j.priority),
+                                             j.id))
+            jobs = self.waiting[:n]
+            del self.waiting[:n]
+            if not jobs and a.running == 0:
+                jobs = self.steal(a, n)
+            for job in jobs:
+                job.agent = agent
+                job.begun = False
+        return [job.spec() for job in jobs]
+
+    def steal(self, thief, n):
+        # with self.lock: half the unstarted jobs of the busiest agent
+        backlogs = {}
+        for job in self.jobs.values():
+            if (job.agent not in [None, thief.id] and not job.begun and
+                not job.over()):
+                backlogs.setdefault(job.agent, []).append(job)
+        if not backlogs:
+            return []
+        (victim, jobs) = max(backlogs.items(), key=lambda item: len(item[1]))
+        jobs.sort(key=lambda j: (Priorities.index(j.priority), j.id))
+        stolen = jobs[-min(n, max(1, len(jobs) // 2)):]  # the least urgent
+        for job in stolen:
+            self.agents[victim].commands.append(['revoke', job.id, {}])
+        return stolen
+
+    def rpc_begin(self, token, agent, id):
+        "May the agent start the job?  (No if it was stolen or cancelled.)"
+        self.check(token)
+        with self.lock:
+            job = self.jobs.get(id)
+            if (not job or job.agent != agent or job.begun or job.over() or
+                agent not in self.agents):
+                return False
+            job.begun = True
+            job.state = State.running
+            job.times['started'] = time.time()
+            return True
+
+    def rpc_report(self, token, agent, id, local_id, state, solutions=None,
+                   final=None):
+        "Progress of a job on an agent; final (a dict) when it is done."
+        self.check(token)
+        with self.lock:
+            job = self.jobs.get(id)
+            if not job or job.agent != agent or not job.begun or job.over():
+                return False  # stale: requeued, cancelled, or done
+        with job.changed:
+            job.remote_id = local_id
+            job.extracted.extend(solutions or [])
+            if state in State_names and not final:
+                job.state = State_names.index(state)
+            job.changed.notify_all()
+        if final:
+            job.exit_code = final['exit_code']
+            job.message = final['message']
+            job.limit_message = final['limit_message']
+            job.stop_reason = final['stop_reason']
+            job.solution = final['solution']
+            job.remote_bytes = final['output_bytes']
+            job.state = State.error if state == 'error' else State.done
+            job.finished()
+        return True
+
+    def reap_loop(self):
+        while True:
+            time.sleep(Heartbeat)
+            self.reap_agents()
+
+    def reap_agents(self):
+        now = time.time()
+        lost = []
+        with self.lock:
+            for a in self.agents.values():
+                if now - a.last_seen > Agent_timeout:
+                    del self.agents[a.id]
+                    requeued = []
+                    for job in self.jobs.values():
+                        if job.agent == a.id and not job.over():
+                            job.requeue()
+                            self.waiting.append(job)
+                            requeued.append(job.id)
+                    lost.append((a.name, requeued))
+        for (name, requeued) in lost:
+            sys.stderr.write('agent %s lost; requeued jobs %s\n' %
+                             (name, requeued))
+        if lost:
+            self.schedule()
+
+    # Client methods that go to the agent of the job
+
+    def rpc_info(self):
+        info = Job_server.rpc_info(self)
+        with self.lock:
+            info['agents'] = [a.info() for a in self.agents.values()]
+        return info
+
+    def rpc_stats(self, id):
+        job = self.job(id)
+        if self.placed(job):
+            return self.forward(job, 'stats')
+        return Job_server.rpc_stats(self, id)
+
+    def rpc_given(self, id):
+        job = self.job(id)
+        if self.placed(job):
+            return self.forward(job, 'given')
+        return Job_server.rpc_given(self, id)
+
+    def rpc_output(self, id, offset=0, length=Output_chunk):
+        job = self.job(id)
+        if self.placed(job) and job.over():
+            return self.forward(job, 'output', offset=offset, length=length)
+        return Job_server.rpc_output(self, id, offset, length)
+
+    def command(self, job, method, **params):
+        with self.lock:
+            a = self.agents.get(job.agent)
+            if a:
+                a.commands.append([method, job.id, params])
+
+    def rpc_pause(self, id):
+        job = self.job(id)
+        if self.placed(job):
+            if job.state == State.running:
+                self.command(job, 'pause')
+                job.state = State.suspended
+            return True
+        return Job_server.rpc_pause(self, id)
+
+    def rpc_resume(self, id):
+        job = self.job(id)
+        if self.placed(job):
+            if job.state == State.suspended:
+                self.command(job, 'resume')
+                job.state = State.running
+            return True
+        return Job_server.rpc_resume(self, id)
+
+    def rpc_cancel(self, id, hard=False):
+        job = self.job(id)
+        with self.lock:
+            unbegun = job.agent is not None and not job.begun
+        if unbegun:  # in an agent's backlog
+            self.command(job, 'revoke')
+            job.cancelled = True
+            job.state = State.done
+            job.finished()
+            return True
+        if self.placed(job):
+            self.command(job, 'cancel', hard=hard)
+            if job.state == State.suspended:
+                job.state = State.running
+            return True
+        return Job_server.rpc_cancel(self, id, hard)
+
+    def rpc_remove(self, id):
+        job = self.job(id)
+        if self.placed(job) and job.over():
+            self.command(job, 'remove')
+        return Job_server.rpc_remove(self, id)
+
+# end class Coordinator
+
+class Agent:
+    """
+    Runs the jobs of a Coordinator on this machine, in a Job_server of
+    its own (self.local), which also serves their output.
+    """
+    def __init__(self, coordinator, address, token, cores=None,
+                 prefetch=Prefetch, name=None):
+        self.coordinator = coordinator
+        self.token = token
+        self.address = address
+        self.cores = cores or cpu_count()
+        self.prefetch = prefetch
+        self.name = name or '%s.%d' % (socket.gethostname(), os.getpid())
+        self.local = Job_server(self.cores)
+        self.server = make_server(address, self.local)
+        self.client = None
+        self.id = None
+        self.backlog = []   # specs pulled, not begun
+        self.jobs = {}      # server id -> [local id, solutions reported]
+        self.stopped = False
+
+    def serve(self):
+        t = threading.Thread(target=self.server.serve_forever,
+                             name='agent server')
+        t.setDaemon(True)
+        t.start()
+
+    def run(self):
+        self.serve()
+        self.client = Client(self.coordinator)
+        self.register()
+        while not self.stopped:
+            try:
+                self.step()
+            except (Rpc_error, socket.error, ValueError) as e:
+                sys.stderr.write('agent %s: %s\n' % (self.name, e))
+                self.reconnect()
+            time.sleep(Heartbeat)
+
+    def reconnect(self):
+        try:
+            self.client.close()
+        except socket.error:
+            pass
+        try:
+            self.client = Client(self.coordinator)
+        except socket.error:
+            pass  # try again at the next heartbeat
+
+    def register(self):
+        self.id = self.client.call('register', token=self.token,
+                                   name=self.name,
+                                   cores=self.cores, address=self.address)
+
+    def running(self):
+        return len([1 for (local_id, n) in self.jobs.values()
+                    if not self.local.job(local_id).over()])
+
+    def step(self):
+        try:
+            load = os.getloadavg()[0]
+        except (AttributeError, OSError):
+            load = 0.0
+        r = self.client.call('heartbeat', token=self.token, agent=self.id,
+                             load=load,
+                             running=self.running())
+        if r.get('unknown'):
+            self.reset()
+            self.register()
+            return
+        for (method, id, params) in r['commands']:
+            self.command(method, id, params)
+        self.report()
+        self.begin()
+        self.pull(load)
+
+    def reset(self):
+        # The server has given up on us: its jobs run elsewhere now.
+        for (local_id, n) in self.jobs.values():
+            job = self.local.job(local_id)
+            if not job.over():
+                job.kill()
+        self.jobs = {}
+        self.backlog = []
+
+    def command(self, method, id, params):
+        if method == 'revoke':
+            self.backlog = [s for s in self.backlog if s['id'] != id]
+            return
+        if id not in self.jobs:
+            return
+        local_id = self.jobs[id][0]
+        params = dict([(str(k), v) for (k, v) in params.items()])
+        try:
+            getattr(self.local, 'rpc_' + method)(local_id, **params)
+        except Rpc_error:
+            pass
+        if method == 'remove':
+            del self.jobs[id]
+
+    def report(self):
+        for (id, entry) in self.jobs.items():
+            (local_id, reported) = entry
+            if reported is None:
+                continue  # final report sent
+            job = self.local.job(local_id)
+            status = job.status()
+            solutions = job.extracted[reported:]
+            final = None
+            if job.over():
+                final = {'exit_code': job.exit_code,
+                         'message': job.message,
+                         'limit_message': job.limit_message,
+                         'stop_reason': job.stop_reason,
+                         'solution': job.solution,
+                         'output_bytes': status['output_bytes']}
+            self.client.call('report', token=self.token, agent=self.id, id=id,
+                             local_id=local_id, state=status['state'],
+                             solutions=solutions, final=final)
+            entry[1] = None if final else reported + len(solutions)
+
+    def begin(self):
+        while self.backlog and self.running() < self.cores:
+            spec = self.backlog.pop(0)
+            if self.client.call('begin', token=self.token, agent=self.id,
+                                id=spec['id']):
+                try:
+                    local_id = self.local.rpc_submit(
+                        spec['program'], spec['input'],
+                        deadline=spec['deadline'], priority=spec['priority'],
+                        filter_output=spec['filter_output'])
+                except Exception as e:  # Rpc_error, a bug
+                    # The server has it as running here: say it is over.
+                    traceback.print_exc()
+                    self.fail(spec['id'], '%s: %s' % (e.__class__.__name__,
+                                                      e))
+                    continue
+                self.jobs[spec['id']] = [local_id, 0]
+
+    def fail(self, id, message):
+        "Report a job that could not be run here as an error."
+        final = {'exit_code': None, 'message': message,
+                 'limit_message': None, 'stop_reason': None,
+                 'solution': None, 'output_bytes': 0}
+        self.client.call('report', token=self.token, agent=self.id, id=id,
+                         local_id=None, state='error', solutions=[],
+                         final=final)
+
+    def pull(self, load):
+        # Other users of the machine take cores too.
+        others = max(0, int(load + 0.5) - self.running())
+        free = self.cores - self.running() - others
+        n = free + self.prefetch - len(self.backlog)
+        if n > 0:
+            self.backlog.extend(self.client.call('pull', token=self.token,
+                                                 agent=self.id, n=n,
+                                                 running=self.running()))
+
+# end class Agent
+
+def main(argv):
+    parser = argparse.ArgumentParser(
+        description='Run the jobs of a Prover9/Mace4 job server here.')
+    parser.add_argument('server', help='address of the job server')
+    parser.add_argument('address',
+                        help='address of this agent (unix:/path or '
+                        'host:port), where the server fetches output')
+    parser.add_argument('--cores', type=int, default=cpu_count(),
+                        help='searches at once (default %(default)s)')
+    parser.add_argument('--prefetch', type=int, default=Prefetch,
+                        help='extra jobs to keep waiting (default '
+                        '%(default)s)')
+    parser.add_argument('--token', default=agent_token(),
+                        help='the secret shared with the server (default: '
+                        '$PROVER9_MACE4_AGENT_TOKEN)')
+    args = parser.parse_args(argv)
+    if not args.token:
+        parser.error('a token is needed (--token or '
+                     'PROVER9_MACE4_AGENT_TOKEN)')
+
+    agent = Agent(args.server, args.address, args.token, args.cores,
+                  args.prefetch)
+    sys.stderr.write('agent %s on %s, %d cores, for %s\n' %
+                     (agent.name, args.address, agent.cores, args.server))
+    try:
+        agent.run()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,85 @@
+#     Copyright (C) 2007 William McCune
+#
+#     This file is part of the LADR Deduction Library.
+#
+#     The LADR Deduction Library is free software; you can redistribute it
+#     and/or modify it under the terms of the GNU General Public License
+#     as published by the Free Software Foundation; either version 2 of the
+#     License, or (at your option) any later version.
+#
+#     The LADR Deduction Library is distributed in the hope that it will be
+#     useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+#     MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#     GNU General Public License for more details.
+#
+#     You should have received a copy of the GNU General Public License
+#     along with the LADR Deduction Library; if not, write to the Free Software
+#     Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+
+# system imports
+
+import re
+
+# local imports
+
+import utilities
+from partition_input import formulas
+from batch import Job_group, Part
+
+# Prover9 problems with several goals, split into one job per goal (the
+# same assumptions and options), run at once on the pool (batch.py), so
+# that an easy goal does not wait behind a hard one.
+
+Goals_list = re.compile('formulas\s*\(\s*goals\s*\)\s*\.(.*?)end_of_list\s*\.',
+                        re.DOTALL)
+
+def goals_lists(input):
+    "The match objects of the formulas(goals) lists (not in comments)."
+    comments = utilities.comment_spans(input)
+    return [m for m in Goals_list.finditer(input)
+            if not [1 for (start, end) in comments
+                    if start <= m.start() < end]]
+
+def goals_of(input):
+    "The goals of an input, in order."
+    goals = []
+    for m in goals_lists(input):
+        goals.extend(formulas(m.group(1)))
+    return goals
+
+def goal_inputs(input):
+    """[(goal, input)]: for each goal, the input with only that goal (in
+    the place of the first goals list; the others are removed)."""
+    lists = goals_lists(input)
+    result = []
+    for goal in goals_of(input):
+        parts = []
+        last = 0
+        for (i, m) in enumerate(lists):
+            parts.append(input[last:m.start()])
+            if i == 0:
+                parts.append('formulas(goals).\n%s.\nend_of_list.' % goal)
+            last = m.end()
+        parts.append(input[last:])
+        result.append((goal, ''.join(parts)))
+    return result
+
+def goal_parts(input):
+    return [Part(i, 'Goal %d: %s' % (i + 1, goal), text)
+            for (i, (goal, text)) in enumerate(goal_inputs(input))]
+
+class Goal_group(Job_group):
+    """
+    A Prover9 search split by goal.  Its solution has the proofs of all
+    goals, each under a comment with the goal's outcome; exit_code is 0
+    if every goal was proved, else that of the first goal that was not.
+    """
+    def __init__(self, program, input, *args, **kwargs):
+        Job_group.__init__(self, program, input, goal_parts(input),
+                           *args, **kwargs)
+
+    def part_solution(self, part):
+        return part.header() + '\n' + part.solution
+
+# end class Goal_group
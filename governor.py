@@ -0,0 +1,193 @@
+#     Copyright (C) 2007 William McCune
+#
+#     This file is part of the LADR Deduction Library.
+#
+#     The LADR Deduction Library is free software; you can redistribute it
+#     and/or modify it under the terms of the GNU General Public License
+#     as published by the Free Software Foundation; either version 2 of the
+#     License, or (at your option) any later version.
+#
+#     The LADR Deduction Library is distributed in the hope that it will be
+#     useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+#     MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#     GNU General Public License for more details.
+#
+#     You should have received a copy of the GNU General Public License
+#     along with the LADR Deduction Library; if not, write to the Free Software
+#     Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+
+# system imports
+
+import os
+import sys
+import time
+import threading
+import collections
+
+# local imports
+
+from platforms import *
+from spool import env_int
+from scheduler import Priorities
+
+# The memory governor watches the free memory of the machine
+# (MemAvailable in /proc/meminfo, and memory pressure from
+# /proc/pressure/memory where the kernel has it) and the RSS of each
+# job.  Under pressure, it holds (SIGSTOP) one job at a time, the
+# lowest-priority one with the largest RSS, so that the others can
+# finish instead of the machine swapping; when the pressure is gone, it
+# releases them one at a time.  It is off unless the low mark is set:
+#
+#   PROVER9_MACE4_MEMORY_LOW     hold jobs below this % of memory available
+#   PROVER9_MACE4_MEMORY_HIGH    release them above this % (default 2*low)
+#   PROVER9_MACE4_MEMORY_PSI     also hold when the pressure "some avg10"
+#                                is above this (default 20)
+#   PROVER9_MACE4_GOVERNOR_LOG   file for the log of decisions (else stderr)
+
+Low_percent = env_int('PROVER9_MACE4_MEMORY_LOW', 0)
+High_percent = env_int('PROVER9_MACE4_MEMORY_HIGH', 2 * Low_percent)
+Psi_limit = env_int('PROVER9_MACE4_MEMORY_PSI', 20)
+
+Interval = 2  # seconds between checks
+
+def read_meminfo():
+    "(MemTotal, MemAvailable) in kB, or None."
+    try:
+        f = open('/proc/meminfo')
+        lines = f.readlines()
+        f.close()
+    except (IOError, OSError):
+        return None
+    info = {}
+    for line in lines:
+        parts = line.split()
+        if len(parts) >= 2:
+            info[parts[0].rstrip(':')] = int(parts[1])
+    if 'MemTotal' not in info:
+        return None
+    available = info.get('MemAvailable')
+    if available is None:  # kernels before 3.14
+        available = (info.get('MemFree', 0) + info.get('Buffers', 0) +
+                     info.get('Cached', 0))
+    return (info['MemTotal'], available)
+
+def read_pressure():
+    "The 'some avg10' memory pressure (percent), or None."
+    try:
+        f = open('/proc/pressure/memory')
+        line = f.readline()
+        f.close()
+    except (IOError, OSError):
+        return None
+    for field in line.split():
+        if field.startswith('avg10='):
+            return float(field[6:])
+    return None
+
+def rss_kb(pid):
+    "Resident set size of a process in kB, or 0."
+    try:
+        f = open('/proc/%d/status' % pid)
+        lines = f.readlines()
+        f.close()
+    except (IOError, OSError):
+        return 0
+    for line in lines:
+        if line.startswith('VmRSS:'):
+            return int(line.split()[1])
+    return 0
+
+class Memory_governor:
+    """
+    Holds and releases the registered jobs according to memory
+    pressure.  A job needs pid, priority, holds (a set of reasons),
+    paused_by_user(), hold(reason) and release(reason).
+    """
+    def __init__(self, low=Low_percent, high=High_percent, psi=Psi_limit):
+        self.low = low
+        self.high = max(high, low)
+        self.psi = psi
+        self.jobs = []
+        self.lock = threading.Lock()
+        self.thread = None
+        self.log = collections.deque(maxlen=1000)
+        self.log_path = os.environ.get('PROVER9_MACE4_GOVERNOR_LOG')
+
+    def enabled(self):
+        return self.low > 0 and not Win32()
+
+    def add(self, job):
+        if not self.enabled():
+            return
+        with self.lock:
+            self.jobs.append(job)
+            if not self.thread:
+                self.thread = threading.Thread(target=self.loop,
+                                               name='memory governor')
+                self.thread.setDaemon(True)
+                self.thread.start()
+
+    def remove(self, job):
+        with self.lock:
+            if job in self.jobs:
+                self.jobs.remove(job)
+        job.release('memory')
+
+    def note(self, message):
+        line = '%s governor: %s\n' % (time.strftime('%H:%M:%S'), message)
+        self.log.append(line)
+        try:
+            if self.log_path:
+                f = open(self.log_path, 'a')
+                f.write(line)
+                f.close()
+            else:
+                sys.stderr.write(line)
+        except (IOError, OSError):
+            pass
+
+    def check(self):
+        meminfo = read_meminfo()
+        if not meminfo:
+            return
+        (total, available) = meminfo
+        percent = 100.0 * available / total
+        pressure = read_pressure()
+        state = 'available %.1f%%' % percent
+        if pressure is not None:
+            state += ', pressure %.1f' % pressure
+
+        with self.lock:
+            jobs = [j for j in self.jobs if not j.paused_by_user()]
+        running = [j for j in jobs if not j.holds]
+        held = [j for j in jobs if 'memory' in j.holds]
+
+        if (percent < self.low or
+            (pressure is not None and pressure > self.psi)):
+            if len(running) > 1:  # always let one job make progress
+                def key(job):
+                    return (-Priorities.index(job.priority), -rss_kb(job.pid))
+                running.sort(key=key)
+                job = running[0]
+                self.note('%s; holding pid %d (%s, RSS %d kB)' %
+                          (state, job.pid, job.priority, rss_kb(job.pid)))
+                job.hold('memory')
+        elif (held and percent > self.high and
+              (pressure is None or pressure < self.psi / 2.0)):
+            def key(job):
+                return (Priorities.index(job.priority), rss_kb(job.pid))
+            held.sort(key=key)
+            job = held[0]
+            self.note('%s; releasing pid %d (%s)' %
+                      (state, job.pid, job.priority))
+            job.release('memory')
+
+    def loop(self):
+        while True:
+            time.sleep(Interval)
+            self.check()
+
+# end class Memory_governor
+
+governor = Memory_governor()
@@ -0,0 +1,599 @@
+#     Copyright (C) 2007 William McCune
+#
+#     This file is part of the LADR Deduction Library.
+#
+#     The LADR Deduction Library is free software; you can redistribute it
+#     and/or modify it under the terms of the GNU General Public License
+#     as published by the Free Software Foundation; either version 2 of the
+#     License, or (at your option) any later version.
+#
+#     The LADR Deduction Library is distributed in the hope that it will be
+#     useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+#     MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#     GNU General Public License for more details.
+#
+#     You should have received a copy of the GNU General Public License
+#     along with the LADR Deduction Library; if not, write to the Free Software
+#     Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+
+"""
+The run history: every search (GUI, API, job server) is recorded in a
+SQLite database, with its input, options, exit, statistics, timings and
+the identity of the binary.  Input, output and solution are stored as
+zlib-compressed blobs named by the SHA-1 of their content, so identical
+runs share them; small blobs are kept in the database, large ones in
+files next to it, and of those beyond a maximum only the hash and size
+are kept.
+
+The domain sizes that Mace4 searched to the end without a model are kept
+too.  With more assumptions (and the same goals, language and options
+that say what a model is) there is no model of those sizes either, so a
+new search can start past them (reuse_exhausted).
+
+Usage:
+    python history.py [--problem HASH] [--message MESSAGE] [--fastest]
+
+    PROVER9_MACE4_HISTORY   the database (default ~/.prover9-mace4/
+                            history.db); "off" turns the history off
+    PROVER9_MACE4_HISTORY_MAX_BLOB
+                            the largest blob kept, in bytes (default
+                            64 MB); 0 keeps all
+"""
+
+# system imports
+
+import os
+import re
+import sys
+import time
+import zlib
+import hashlib
+import argparse
+import tempfile
+import threading
+
+try:
+    import sqlite3
+except ImportError:
+    sqlite3 = None
+
+# local imports
+
+import partition_input
+from supervisor import Worker_pool
+
+Default_path = os.path.join('~', '.prover9-mace4', 'history.db')
+
+Inline_limit = 65536  # compressed blobs up to this size go in the database
+Max_blob = 64 << 20   # larger blobs (uncompressed) are not kept
+
+Option_types = ['flag', 'parm', 'stringparm']  # options.Flag, Parm, Stringparm
+
+Schema = """
+create table if not exists runs (
+    id            integer primary key,
+    program       text,
+    problem_hash  text,     -- language, assumptions and goals
+    input_hash    text,     -- the whole input (a blob)
+    output_hash   text,
+    solution_hash text,
+    origin        text,     -- the kind of job (GUI, API, server)
+    binary        text,     -- path of the program
+    binary_hash   text,
+    started       real,     -- seconds since the epoch
+    wall          real,     -- seconds
+    cpu           real,
+    exit_code     integer,
+    message       text,
+    stop_reason   text,
+    output_bytes  integer,
+    solutions     integer
+);
+create table if not exists options (
+    run   integer,
+    type  text,
+    name  text,
+    value text
+);
+create table if not exists stats (
+    run   integer,
+    name  text,
+    value text
+);
+create table if not exists blobs (
+    hash   text primary key,
+    size   integer,
+    data   blob             -- null if the blob is in a file
+);
+create table if not exists exhausted (
+    context_hash text,      -- language, goals, other lists, options
+    clauses_hash text,      -- the assumptions (a clause_sets row)
+    size         integer,   -- no model of this size
+    run          integer
+);
+create table if not exists clause_sets (
+    hash     text primary key,
+    formulas text           -- normal_formula()s, one per line, sorted
+);
+create index if not exists runs_problem on runs (problem_hash, program);
+create index if not exists runs_input on runs (input_hash);
+create index if not exists runs_message on runs (message, program);
+create index if not exists options_run on options (run);
+create index if not exists options_name on options (name, value);
+create index if not exists stats_run on stats (run);
+create index if not exists exhausted_context on exhausted (context_hash);
+"""
+
+def history_path():
+    "The database, or None if the history is off."
+    path = os.environ.get('PROVER9_MACE4_HISTORY', Default_path)
+    if not sqlite3 or path.lower() in ['', 'off', 'none', '0']:
+        return None
+    return os.path.abspath(os.path.expanduser(path))
+
+def max_blob():
+    "The largest blob kept, or None for no limit."
+    try:
+        limit = int(os.environ.get('PROVER9_MACE4_HISTORY_MAX_BLOB',
+                                   Max_blob))
+    except ValueError:
+        limit = Max_blob
+    return limit if limit > 0 else None
+
+def normalize(text):
+    "Without comments and with all whitespace as single spaces."
+    text = re.sub('%.*', '', text)
+    return ' '.join(text.split())
+
+def problem_hash(input):
+    "The same for inputs that differ only in options and layout."
+    (p9, m4, assumps, goals, opt, lang, other) = partition_input.partition(input)
+    problem = '%s\n%s\n%s' % (normalize(lang), normalize(assumps),
+                              normalize(goals))
+    return hashlib.sha1(problem).hexdigest()
+
+def options_from_input(input, program_name):
+    "Option triples (type name, name, value) set in the input."
+    (p9, m4, assumps, goals, opt, lang, other) = partition_input.partition(input)
+    text = opt + (p9 if program_name == 'Prover9' else m4)
+    triples = []
+    for m in re.finditer('(set|clear)\s*\(\s*([a-z0-9_]+)\s*\)\s*\.', text):
+        triples.append(('flag', m.group(2), str(m.group(1) == 'set')))
+    for m in re.finditer('assign\s*\(\s*([a-z0-9_]+)\s*,\s*([a-z0-9_-]+)\s*\)'
+                         '\s*\.', text):
+        value = m.group(2)
+        type = 'parm' if re.match('-?[0-9]+$', value) else 'stringparm'
+        triples.append((type, m.group(1), value))
+    return triples
+
+# Mace4 searches the sizes in order, and is done with a size (it has
+# no model, or the models found) before it starts the next one, unless
+# max_seconds_per gives up on a size.
+
+Size_start = re.compile('=== Mace4 starting on domain size (\d+)\. ===')
+
+# Mace4 options that say how, and how long, to search, but not what a
+# model is; the others are part of the context of exhausted sizes.
+
+Search_options = ['domain_size', 'start_size', 'end_size', 'iterate_up_to',
+                  'increment', 'iterate', 'iterate_primes',
+                  'iterate_nonprimes', 'max_models', 'max_seconds',
+                  'max_seconds_per', 'max_megs', 'print_models',
+                  'print_models_tabular', 'verbose', 'trace', 'report_stderr',
+                  'ignore_option_dependencies', 'skolems_last', 'lnh',
+                  'negprop', 'neg_assign', 'neg_assign_near', 'neg_elim',
+                  'neg_elim_near', 'selection_order', 'selection_measure']
+
+def option_values(input, program_name):
+    "{name: value} of the options set in the input (the last of each)."
+    return dict([(n, v) for (t, n, v) in options_from_input(input,
+                                                             program_name)])
+
+def exhausted_sizes(output, input, exit_code):
+    """The sizes that a Mace4 run searched to the end without a model
+    (none if its models are not printed: they cannot be seen)."""
+    values = option_values(input, 'Mace4')
+    if (values.get('max_seconds_per', '-1') != '-1' or
+        values.get('print_models') == 'False'):
+        return []
+    starts = [(m.start(), int(m.group(1)))
+              for m in Size_start.finditer(output)]
+    sizes = []
+    for (i, (start, size)) in enumerate(starts):
+        end = starts[i + 1][0] if i + 1 < len(starts) else len(output)
+        if output.find('== MODEL ==', start, end) >= 0:
+            continue
+        if i + 1 < len(starts) or exit_code in [2, 3]:  # Exhausted
+            sizes.append(size)
+    return sizes
+
+def compact(text):
+    """Without whitespace, except between two names or two symbols (which
+    it separates into tokens): "x * y" and "x*y" are the same."""
+    text = re.sub('\s*([(),\[\]])\s*', '\\1', normalize(text))
+    return re.sub('(?<=[\w$])\s+(?=[^\w$\s])|(?<=[^\w$\s])\s+(?=[\w$])',
+                  '', text)
+
+def normal_formula(formula, lang):
+    """A formula without layout, its variables renamed in the order they
+    appear: names u-z... that are not applied (u(x) is a function) and
+    not operators."""
+    from cubes import declared_ops  # cubes -> batch -> programs -> history
+    ops = set(declared_ops(lang).keys() + ['v'])  # v: lattice join
+    names = {}
+
+    def rename(m):
+        name = m.group(0)
+        if name in ops:
+            return name
+        return names.setdefault(name, '_%d' % len(names))
+
+    return re.sub('(?<![A-Za-z0-9_$])[u-z][A-Za-z0-9_$]*(?![A-Za-z0-9_$]|\()',
+                  rename, compact(formula))
+
+def mace4_key(input):
+    """(context hash, the set of assumptions): exhausted sizes of the
+    same context are reused if their assumptions are a subset."""
+    (p9, m4, assumps, goals, opt, lang, other) = partition_input.partition(input)
+    values = option_values(input, 'Mace4')
+    if values.get('prolog_style_variables') == 'True':
+        norm = compact  # upper case variables: no renaming
+    else:
+        norm = lambda f: normal_formula(f, lang)
+    options = ['%s=%s' % (n, values[n]) for n in sorted(values)
+               if n not in Search_options]
+    context = '\n'.join([normalize(lang),
+                         ' '.join(sorted([norm(f) for f in
+                                          partition_input.formulas(goals)])),
+                         normalize(other), ' '.join(options)])
+    return (hashlib.sha1(context).hexdigest(),
+            set([norm(f) for f in partition_input.formulas(assumps)]))
+
+_binary_hashes = {}  # (path, size, mtime) -> sha1
+
+def binary_identity(path):
+    "(path, SHA-1) of a program; the hash is computed once per version."
+    try:
+        st = os.stat(path)
+    except OSError:
+        return (path, None)
+    key = (path, st.st_size, st.st_mtime)
+    if key not in _binary_hashes:
+        h = hashlib.sha1()
+        f = open(path, 'rb')
+        for data in iter(lambda: f.read(1 << 20), ''):
+            h.update(data)
+        f.close()
+        _binary_hashes[key] = h.hexdigest()
+    return (path, _binary_hashes[key])
+
+class History:
+    "The database, used from one thread at a time (see record())."
+    def __init__(self, path):
+        self.path = path
+        self.blob_dir = os.path.join(os.path.dirname(path), 'blobs')
+        if not os.path.isdir(self.blob_dir):
+            os.makedirs(self.blob_dir)
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.executescript(Schema)
+        self.lock = threading.Lock()
+
+    # Blobs
+
+    def blob_file(self, hash):
+        return os.path.join(self.blob_dir, hash[:2], hash[2:] + '.z')
+
+    def put_blob(self, chunks):
+        """Store the data (an iterable of strings); return its hash.  Data
+        larger than max_blob() is only hashed: no file, and data null."""
+        limit = max_blob()
+        h = hashlib.sha1()
+        z = zlib.compressobj(6)
+        packed = []
+        packed_size = 0
+        size = 0
+        f = None
+        dropped = False
+        for data in chunks:
+            h.update(data)
+            size += len(data)
+            if dropped:
+                continue
+            if limit and size > limit:  # too big to keep
+                dropped = True
+                if f:
+                    f.close()
+                    os.remove(tmp)
+                    f = None
+                packed = None
+                continue
+            p = z.compress(data)
+            if f:
+                f.write(p)
+            else:
+                packed.append(p)
+                packed_size += len(p)
+                if packed_size > Inline_limit:  # too big: to a file
+                    (fd, tmp) = tempfile.mkstemp(dir=self.blob_dir)
+                    f = os.fdopen(fd, 'wb')
+                    f.write(''.join(packed))
+                    packed = None
+        hash = h.hexdigest()
+        if dropped:
+            self.db.execute('insert or ignore into blobs (hash, size, data) '
+                            'values (?, ?, null)', (hash, size))
+            return hash
+        p = z.flush()
+        if f:
+            f.write(p)
+            f.close()
+            name = self.blob_file(hash)
+            if os.path.exists(name):
+                os.remove(tmp)  # the same data is already there
+            else:
+                if not os.path.isdir(os.path.dirname(name)):
+                    os.makedirs(os.path.dirname(name))
+                os.rename(tmp, name)
+            data = None
+        else:
+            data = sqlite3.Binary(''.join(packed) + p)
+        self.db.execute('insert or ignore into blobs (hash, size, data) '
+                        'values (?, ?, ?)', (hash, size, data))
+        return hash
+
+    def get_blob(self, hash):
+        "The data of a blob, or None (also if it was too big to keep)."
+        with self.lock:
+            row = self.db.execute('select data from blobs where hash = ?',
+                                  (hash,)).fetchone()
+        if not row:
+            return None
+        if row[0] is not None:
+            return zlib.decompress(str(row[0]))
+        name = self.blob_file(hash)
+        if not os.path.exists(name):
+            return None  # only the hash was kept
+        f = open(name, 'rb')
+        data = zlib.decompress(f.read())
+        f.close()
+        return data
+
+    # Runs
+
+    def record(self, job):
+        "Record a finished programs.Job (while its spools are open)."
+        program = job.program.name
+        triples = job.options
+        if triples is None:
+            triples = options_from_input(job.input, program)
+        else:
+            triples = [(Option_types[t], n, str(v)) for (t, n, v) in triples]
+        command = job.program.search_command()
+        (binary, binary_hash) = (binary_identity(command[0]) if command
+                                 else (None, None))
+        stats = job.get_stderr_info() or []
+        output = job.output
+        if output is None:
+            output_chunks = []
+        elif isinstance(output, str):
+            output_chunks = [output]
+        else:
+            output_chunks = output.chunks()  # an Archive
+        with self.lock:
+            input_hash = self.put_blob([job.input])
+            output_hash = self.put_blob(output_chunks)
+            solution_hash = (self.put_blob([job.solution])
+                             if job.solution else None)
+            cursor = self.db.execute(
+                'insert into runs (program, problem_hash, input_hash, '
+                'output_hash, solution_hash, origin, binary, binary_hash, '
+                'started, wall, cpu, exit_code, message, stop_reason, '
+                'output_bytes, solutions) '
+                'values (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                (program, problem_hash(job.input), input_hash, output_hash,
+                 solution_hash, job.__class__.__name__, binary, binary_hash,
+                 job.start_time, job.end_time - job.start_time, job.cpu,
+                 job.exit_code,
+                 job.limit_message or job.program.exit_message(job.exit_code),
+                 job.stop_reason, len(output or ''),
+                 (job.program.count_solutions(job.solution)
+                  if job.solution else 0)))
+            run = cursor.lastrowid
+            self.db.executemany(
+                'insert into options (run, type, name, value) '
+                'values (?, ?, ?, ?)',
+                [(run, t, n, v) for (t, n, v) in triples])
+            self.db.executemany(
+                'insert into stats (run, name, value) values (?, ?, ?)',
+                [(run, n, v) for (n, v) in stats])
+            if program == 'Mace4' and isinstance(output, str):
+                self.record_exhausted(run, job.input, output, job.exit_code)
+            self.db.commit()
+        return run
+
+    def record_exhausted(self, run, input, output, exit_code):
+        sizes = exhausted_sizes(output, input, exit_code)
+        if sizes:
+            (context, assumptions) = mace4_key(input)
+            formulas = '\n'.join(sorted(assumptions))
+            clauses_hash = hashlib.sha1(formulas).hexdigest()
+            self.db.execute('insert or ignore into clause_sets '
+                            '(hash, formulas) values (?, ?)',
+                            (clauses_hash, formulas))
+            self.db.executemany(
+                'insert into exhausted (context_hash, clauses_hash, size, '
+                'run) values (?, ?, ?, ?)',
+                [(context, clauses_hash, size, run) for size in sizes])
+
+    # Queries
+
+    def runs(self, problem=None, message=None, program=None, limit=100):
+        "The latest runs, as dicts, optionally of a problem or with an exit."
+        where = []
+        args = []
+        for (column, value) in [('problem_hash', problem),
+                                ('message', message), ('program', program)]:
+            if value:
+                where.append('%s = ?' % column)
+                args.append(value)
+        sql = 'select * from runs'
+        if where:
+            sql += ' where ' + ' and '.join(where)
+        sql += ' order by id desc limit ?'
+        return self.dicts(sql, args + [limit])
+
+    def fastest(self, program='Prover9', problem=None):
+        """For each problem (or the one given), its fastest successful run
+        (exit code 0), with the options of that run."""
+        sql = ('select * from runs r where program = ? and exit_code = 0 '
+               'and wall = (select min(wall) from runs where program = ? and '
+               'exit_code = 0 and problem_hash = r.problem_hash)')
+        args = [program, program]
+        if problem:
+            sql += ' and problem_hash = ?'
+            args.append(problem)
+        runs = self.dicts(sql + ' group by problem_hash', args)
+        for run in runs:
+            run['options'] = self.options(run['id'])
+        return runs
+
+    def exhausted(self, input):
+        """{size: run} of the sizes with no model, by runs in the context
+        of a Mace4 input with a subset of its assumptions."""
+        (context, assumptions) = mace4_key(input)
+        with self.lock:
+            rows = self.db.execute(
+                'select e.size, e.run, c.formulas from exhausted e, '
+                'clause_sets c where e.context_hash = ? and '
+                'c.hash = e.clauses_hash order by e.run', (context,)).fetchall()
+        sizes = {}
+        for (size, run, formulas) in rows:
+            if set([f for f in formulas.split('\n') if f]) <= assumptions:
+                sizes.setdefault(size, run)
+        return sizes
+
+    def options(self, run):
+        with self.lock:
+            return [tuple(row) for row in self.db.execute(
+                'select type, name, value from options where run = ?',
+                (run,))]
+
+    def stats(self, run):
+        with self.lock:
+            return self.db.execute('select name, value from stats '
+                                   'where run = ?', (run,)).fetchall()
+
+    def dicts(self, sql, args):
+        with self.lock:
+            cursor = self.db.execute(sql, args)
+            names = [d[0] for d in cursor.description]
+            return [dict(zip(names, row)) for row in cursor.fetchall()]
+
+# end class History
+
+# Recording happens in one thread of its own, after the job has finished,
+# so that compressing a large output never delays the GUI.
+
+recorder = Worker_pool('history', 1)
+
+_history = None
+_history_lock = threading.Lock()
+
+def get_history():
+    "The History, or None if it is off or cannot be opened."
+    global _history
+    with _history_lock:
+        if _history is None:
+            path = history_path()
+            if not path:
+                return None
+            try:
+                _history = History(path)
+            except (OSError, sqlite3.Error) as e:
+                sys.stderr.write('history %s: %s\n' % (path, e))
+                os.environ['PROVER9_MACE4_HISTORY'] = 'off'
+                return None
+        return _history
+
+def record_later(job):
+    "Record the job in the history thread; job.recorded is set when done."
+    if not history_path():
+        return
+    job.recorded.clear()
+    recorder.submit(record_now, job)
+
+def record_now(job):
+    try:
+        history = get_history()
+        if history:
+            history.record(job)
+    except Exception as e:
+        sys.stderr.write('history: %s\n' % e)
+    job.recorded.set()
+
+def reuse_exhausted(input):
+    """(input, {size: run}): a Mace4 input with start_size past the sizes
+    that the history says have no model (see exhausted()), with a
+    comment that says so, and those sizes; or the input as it is."""
+    history = get_history()
+    values = option_values(input, 'Mace4')
+    if (not history or int(values.get('domain_size', '0')) > 0 or
+        values.get('max_seconds_per', '-1') != '-1'):
+        return (input, {})
+    try:
+        known = history.exhausted(input)
+    except sqlite3.Error as e:
+        sys.stderr.write('history: %s\n' % e)
+        return (input, {})
+    start = int(values.get('start_size', '2'))
+    end = int(values.get('end_size', '-1'))
+    step = int(values.get('increment', '1'))
+    size = start
+    reused = {}
+    # The last size is searched even if it is known (Mace4 needs a size).
+    while size in known and (end == -1 or size + step <= end):
+        reused[size] = known[size]
+        size += step
+    if not reused:
+        return (input, {})
+    from batch import with_options  # batch -> programs -> history
+    note = ''.join(['%% Domain size %d: no model (history run %d, a subset '
+                    'of the assumptions).\n' % (n, reused[n])
+                    for n in sorted(reused)])
+    return (note + with_options(input, {'start_size': size}, 'Mace4'),
+            reused)
+
+def main(argv):
+    parser = argparse.ArgumentParser(description='Query the run history.')
+    parser.add_argument('--problem', help='runs of this problem hash')
+    parser.add_argument('--message', help='runs with this exit, e.g., '
+                        '"Time Limit"')
+    parser.add_argument('--program', help='Prover9 or Mace4')
+    parser.add_argument('--fastest', action='store_true',
+                        help='the fastest successful run of each problem')
+    parser.add_argument('--limit', type=int, default=20)
+    args = parser.parse_args(argv)
+
+    history = get_history()
+    if not history:
+        sys.stderr.write('The history is off.\n')
+        return 1
+    if args.fastest:
+        for run in history.fastest(args.program or 'Prover9', args.problem):
+            options = ' '.join(['%s=%s' % (n, v)
+                                for (t, n, v) in run['options']])
+            print '%s  %8.2fs  %s' % (run['problem_hash'][:12], run['wall'],
+                                      options)
+    else:
+        for run in history.runs(args.problem, args.message, args.program,
+                                args.limit):
+            print '%5d %-7s %s  %8.2fs  %-20s %s' % (
+                run['id'], run['program'], run['problem_hash'][:12],
+                run['wall'] or 0, run['message'],
+                time.strftime('%Y-%m-%d %H:%M',
+                              time.localtime(run['started'])))
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
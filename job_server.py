@@ -0,0 +1,695 @@
+#     Copyright (C) 2007 William McCune
+#
+#     This file is part of the LADR Deduction Library.
+#
+#     The LADR Deduction Library is free software; you can redistribute it
+#     and/or modify it under the terms of the GNU General Public License
+#     as published by the Free Software Foundation; either version 2 of the
+#     License, or (at your option) any later version.
+#
+#     The LADR Deduction Library is distributed in the hope that it will be
+#     useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+#     MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#     GNU General Public License for more details.
+#
+#     You should have received a copy of the GNU General Public License
+#     along with the LADR Deduction Library; if not, write to the Free Software
+#     Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+
+"""
+A job server: runs Prover9 and Mace4 searches for clients (the GUI,
+scripts, tests) on a fixed number of workers, with the binaries in
+bin/ next to it, and serves their status, statistics, output and
+solutions.
+
+Usage:
+    python job_server.py [--workers N] [ADDRESS]
+
+ADDRESS is "unix:/path/to/socket" or "host:port" (default: the
+environment variable PROVER9_MACE4_SERVER, else localhost:8479).  A TCP
+server listens only on the host given, so the default is local only.
+
+The protocol is JSON-RPC 2.0, one request or response per line.  The
+methods are
+
+    submit(program, input, options, deadline, priority, filter_output)
+        -> job id; program is "prover9" or "mace4", input is LADR input
+        (the GUI's assembled input, or a file), options a dict (see
+        api.option_commands); the others are as for programs.Job
+    status(id), jobs(), stats(id), given(id)
+    events(id, start, timeout)   solutions from index start, waiting up
+                                 to timeout seconds for something new
+    wait(id, timeout), output(id, offset, length), solution(id)
+    pause(id), resume(id), cancel(id, hard), remove(id), info()
+
+The GUI uses a server when PROVER9_MACE4_SERVER is set (Remote_job).
+"""
+
+# system imports
+
+import os
+import sys
+import json
+import time
+import socket
+import inspect
+import argparse
+import traceback
+import threading
+import itertools
+import SocketServer
+
+# local imports
+
+from platforms import *
+from utilities import State
+from programs import Job, Prover9, Mace4
+from api import option_commands
+from archive import Archive
+from scheduler import Priorities, cpu_count
+from spool import env_int
+
+Version = 1
+
+Default_address = 'localhost:8479'
+
+Workers = env_int('PROVER9_MACE4_SERVER_WORKERS', cpu_count())
+
+Output_chunk = 1 << 20  # bytes of output per output() call
+
+Max_wait = 60  # seconds that events() and wait() may block
+
+State_names = ['ready', 'running', 'suspended', 'done', 'error']
+
+Programs = {'prover9': Prover9, 'mace4': Mace4}
+
+# JSON-RPC error codes
+
+Parse_error      = -32700
+Invalid_request  = -32600
+Method_not_found = -32601
+Invalid_params   = -32602
+Internal_error   = -32603
+Job_error        = 1
+
+class Rpc_error(Exception):
+    def __init__(self, code, message):
+        Exception.__init__(self, message)
+        self.code = code
+        self.message = message
+
+def server_address():
+    "The address from the environment, or None."
+    return os.environ.get('PROVER9_MACE4_SERVER') or None
+
+def parse_address(address):
+    "'unix:/path' -> (AF_UNIX, '/path'); 'host:port' -> (AF_INET, (h, p))."
+    if address.startswith('unix:'):
+        return (socket.AF_UNIX, address[5:])
+    (host, sep, port) = address.rpartition(':')
+    return (socket.AF_INET, (host or 'localhost', int(port)))
+
+class Served_job(Job):
+    "A Job of the server; clients wait on self.changed."
+    def __init__(self, server, id, program, input, **kwargs):
+        Job.__init__(self, program, input, **kwargs)
+        self.server = server
+        self.id = id
+        self.changed = threading.Condition()
+        self.message = None
+        self.cancelled = False
+        self.times = {'submitted': time.time()}
+
+    def start(self):
+        self.times['started'] = time.time()
+        Job.start(self)
+
+    def solution_found(self, solution):
+        with self.changed:
+            self.changed.notify_all()
+
+    def finished(self):
+        self.times['finished'] = time.time()
+        if self.message:
+            pass  # given by the agent that ran it (federation.py)
+        elif self.state == State.error:
+            self.message = self.start_error or 'Program_Not_Found'
+        elif self.cancelled and self.exit_code is None:
+            self.message = 'Cancelled'  # before it started
+        else:
+            self.message = (self.limit_message or
+                            self.program.exit_message(self.exit_code))
+        with self.changed:
+            self.changed.notify_all()
+        self.server.job_done(self)
+
+    def over(self):
+        return self.state in [State.done, State.error]
+
+    def status(self):
+        if self.state == State.ready:
+            state = 'queued'
+        else:
+            state = State_names[self.state]
+        return {'id': self.id,
+                'program': self.program.name,
+                'state': state,
+                'priority': self.priority,
+                'holds': sorted(self.holds),
+                'exit_code': self.exit_code,
+                'message': self.message,
+                'limit_message': self.limit_message,
+                'profile': self.profile.describe(),
+                'stop_reason': self.stop_reason,
+                'solutions': len(self.extracted),
+                'has_solution': self.solution is not None,
+                'output_bytes': len(self.output) if self.output else 0,
+                'times': self.times}
+
+# end class Served_job
+
+class Job_server:
+    """
+    The jobs and the worker pool, independent of the transport: handle()
+    takes a JSON-RPC request (a dict) and returns the response.  At most
+    self.workers jobs run at once; the others wait, interactive ones
+    first.
+    """
+    Job_class = Served_job
+
+    def __init__(self, workers=Workers):
+        self.workers = max(0, workers)  # 0: only agents run jobs
+        self.jobs = {}        # id -> Served_job
+        self.waiting = []     # submitted, not started
+        self.running = set()
+        self.scheduling = False  # a schedule() loop is running
+        self.ids = itertools.count(1)
+        self.lock = threading.Lock()
+
+    # The worker pool
+
+    def schedule(self):
+        # One loop at a time: a job that fails to start calls job_done
+        # from job.start(), and the loop already running takes the next
+        # one (no recursion, however many fail).
+        with self.lock:
+            if self.scheduling:
+                return
+            self.scheduling = True
+        while True:
+            with self.lock:
+                if len(self.running) >= self.workers or not self.waiting:
+                    self.scheduling = False
+                    return
+                self.waiting.sort(key=lambda j: (Priorities.index(j.priority),
+                                                 j.id))
+                job = self.waiting.pop(0)
+                self.running.add(job)
+            try:
+                job.start()  # if it cannot start, job_done is called
+            except Exception:
+                traceback.print_exc()
+                with self.lock:
+                    self.running.discard(job)  # its slot, at least
+
+    def job_done(self, job):
+        with self.lock:
+            self.running.discard(job)
+        self.schedule()
+
+    # JSON-RPC
+
+    def handle(self, request):
+        "The response to a request, or None for a notification."
+        id = None
+        notification = isinstance(request, dict) and 'id' not in request
+        try:
+            if not isinstance(request, dict) or 'method' not in request:
+                raise Rpc_error(Invalid_request, 'invalid request')
+            id = request.get('id')
+            params = request.get('params') or {}
+            method = getattr(self, 'rpc_' + str(request['method']), None)
+            if not method:
+                raise Rpc_error(Method_not_found,
+                                'no method %s' % request['method'])
+            if isinstance(params, list):
+                (args, kwargs) = (params, {})
+            else:
+                (args, kwargs) = ([], dict([(str(k), v) for (k, v)
+                                            in params.items()]))
+            try:
+                inspect.getcallargs(method, *args, **kwargs)
+            except TypeError as e:
+                raise Rpc_error(Invalid_params, str(e))
+            result = method(*args, **kwargs)
+            response = {'jsonrpc': '2.0', 'id': id, 'result': result}
+        except Rpc_error as e:
+            response = {'jsonrpc': '2.0', 'id': id,
+                        'error': {'code': e.code, 'message': e.message}}
+        except Exception as e:  # OSError (a reaped pid), a bug
+            traceback.print_exc()
+            response = {'jsonrpc': '2.0', 'id': id,
+                        'error': {'code': Internal_error,
+                                  'message': '%s: %s' % (e.__class__.__name__,
+                                                         e)}}
+        if notification:
+            return None
+        return response
+
+    def job(self, id):
+        with self.lock:
+            job = self.jobs.get(id)
+        if not job:
+            raise Rpc_error(Job_error, 'no job %s' % id)
+        return job
+
+    def rpc_info(self):
+        with self.lock:
+            return {'version': Version,
+                    'workers': self.workers,
+                    'running': len(self.running),
+                    'waiting': len(self.waiting),
+                    'jobs': len(self.jobs)}
+
+    def rpc_submit(self, program, input, options=None, deadline=None,
+                   priority='batch', filter_output=False):
+        if program.lower() not in Programs:
+            raise Rpc_error(Invalid_params, 'no program %s' % program)
+        if priority not in Priorities:
+            raise Rpc_error(Invalid_params, 'no priority %s' % priority)
+        input = input.encode('utf-8') if isinstance(input, unicode) else input
+        if options:
+            input = option_commands(options) + input
+        if 'report_stderr' not in input:
+            input = 'assign(report_stderr, 2).\n' + input  # for stats()
+        with self.lock:
+            id = self.ids.next()
+            job = self.Job_class(self, id, Programs[program.lower()](),
+                                 input, filter_output=filter_output,
+                                 deadline=deadline, priority=priority)
+            self.jobs[id] = job
+            self.waiting.append(job)
+        self.schedule()
+        return id
+
+    def rpc_status(self, id):
+        return self.job(id).status()
+
+    def rpc_jobs(self):
+        with self.lock:
+            jobs = sorted(self.jobs.values(), key=lambda j: j.id)
+        return [j.status() for j in jobs]
+
+    def rpc_stats(self, id):
+        return self.job(id).get_stderr_info() or []
+
+    def rpc_given(self, id):
+        (count, lines) = self.job(id).ring.lines()
+        return {'count': count, 'lines': lines}
+
+    def rpc_events(self, id, start=0, timeout=10):
+        job = self.job(id)
+        deadline = time.time() + min(timeout or Max_wait, Max_wait)
+        with job.changed:
+            while (len(job.extracted) <= start and not job.over() and
+                   time.time() < deadline):
+                job.changed.wait(deadline - time.time())
+        return {'solutions': job.extracted[start:], 'status': job.status()}
+
+    def rpc_wait(self, id, timeout=10):
+        job = self.job(id)
+        deadline = time.time() + min(timeout or Max_wait, Max_wait)
+        with job.changed:
+            while not job.over() and time.time() < deadline:
+                job.changed.wait(deadline - time.time())
+        return job.status()
+
+    def rpc_output(self, id, offset=0, length=Output_chunk):
+        job = self.job(id)
+        if not job.over():
+            raise Rpc_error(Job_error, 'job %s is not done' % id)
+        output = job.output or ''
+        length = min(length, Output_chunk)
+        if isinstance(output, Archive):
+            text = output.read(offset, length)
+        else:
+            text = output[offset:offset + length]
+        return {'text': text.decode('latin-1'), 'size': len(output)}
+
+    def rpc_solution(self, id):
+        job = self.job(id)
+        if not job.over():
+            raise Rpc_error(Job_error, 'job %s is not done' % id)
+        return job.solution
+
+    def rpc_pause(self, id):
+        self.job(id).pause()
+        return True
+
+    def rpc_resume(self, id):
+        self.job(id).resume()
+        return True
+
+    def rpc_cancel(self, id, hard=False):
+        job = self.job(id)
+        with self.lock:
+            queued = job in self.waiting
+            if queued:
+                self.waiting.remove(job)
+        if queued:
+            job.cancelled = True
+            job.state = State.done
+            job.finished()
+        elif hard:
+            job.kill()
+        else:
+            job.stop()
+        return True
+
+    def rpc_remove(self, id):
+        "Forget a job that is over, and free its spools."
+        job = self.job(id)
+        if not job.over():
+            raise Rpc_error(Job_error, 'job %s is not done' % id)
+        with self.lock:
+            del self.jobs[id]
+        job.done_with_job()
+        return True
+
+# end class Job_server
+
+class Rpc_handler(SocketServer.StreamRequestHandler):
+    "One connection: a request per line, a response per line."
+    def handle(self):
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            try:
+                request = json.loads(line)
+            except ValueError:
+                response = {'jsonrpc': '2.0', 'id': None,
+                            'error': {'code': Parse_error,
+                                      'message': 'parse error'}}
+            else:
+                response = self.server.jobs.handle(request)
+            if response is not None:
+                self.wfile.write(json.dumps(response) + '\n')
+                self.wfile.flush()
+
+class Tcp_server(SocketServer.ThreadingMixIn, SocketServer.TCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+if hasattr(socket, 'AF_UNIX'):
+    class Unix_server(SocketServer.ThreadingMixIn,
+                      SocketServer.UnixStreamServer):
+        daemon_threads = True
+
+def make_server(address, jobs):
+    "A socket server for the Job_server jobs (not yet serving)."
+    (family, addr) = parse_address(address)
+    if family == socket.AF_INET:
+        server = Tcp_server(addr, Rpc_handler)
+    else:
+        if os.path.exists(addr):
+            os.remove(addr)  # left by a server that died
+        server = Unix_server(addr, Rpc_handler)
+        os.chmod(addr, 0600)  # only the user may submit jobs
+    server.jobs = jobs
+    return server
+
+class Client:
+    "A connection to a job server; call() is thread-safe."
+    def __init__(self, address=None):
+        self.address = address or server_address() or Default_address
+        (family, addr) = parse_address(self.address)
+        self.sock = socket.socket(family, socket.SOCK_STREAM)
+        self.sock.connect(addr)
+        self.rfile = self.sock.makefile('rb')
+        self.ids = itertools.count(1)
+        self.lock = threading.Lock()
+
+    def call(self, method, **params):
+        with self.lock:
+            request = {'jsonrpc': '2.0', 'id': self.ids.next(),
+                       'method': method, 'params': params}
+            self.sock.sendall(json.dumps(request) + '\n')
+            line = self.rfile.readline()
+        if not line:
+            raise Rpc_error(Job_error, 'the job server closed the connection')
+        response = json.loads(line)
+        if 'error' in response:
+            raise Rpc_error(response['error']['code'],
+                            response['error']['message'])
+        return response['result']
+
+    def close(self):
+        self.rfile.close()
+        self.sock.close()
+
+# end class Client
+
+class Local_client:
+    "A Client for a Job_server of this process, without a socket."
+    def __init__(self, jobs):
+        self.jobs = jobs
+        self.address = None
+        self.ids = itertools.count(1)
+
+    def call(self, method, **params):
+        response = self.jobs.handle({'jsonrpc': '2.0', 'id': self.ids.next(),
+                                     'method': method, 'params': params})
+        if 'error' in response:
+            raise Rpc_error(response['error']['code'],
+                            response['error']['message'])
+        return response['result']
+
+    def close(self):
+        pass
+
+# end class Local_client
+
+_local_jobs = None
+_local_lock = threading.Lock()
+
+def pool_client():
+    """A client for running many jobs (batch.py): the job server if
+    PROVER9_MACE4_SERVER is set, else a Job_server of this process with
+    PROVER9_MACE4_SERVER_WORKERS workers, shared by all its batches."""
+    global _local_jobs
+    if server_address():
+        return Client(server_address())
+    with _local_lock:
+        if _local_jobs is None:
+            _local_jobs = Job_server(Workers)
+    return Local_client(_local_jobs)
+
+def encode(text):
+    return text.encode('utf-8') if isinstance(text, unicode) else text
+
+class Remote_ring:
+    "Given_ring.lines() of a remote job."
+    def __init__(self, job):
+        self.job = job
+
+    def lines(self):
+        try:
+            r = self.job.client.call('given', id=self.job.id)
+            return (r['count'], [encode(l) for l in r['lines']])
+        except (Rpc_error, socket.error):
+            return (0, [])
+
+class Remote_profile:
+    def __init__(self, description):
+        self.description = description
+
+    def describe(self):
+        return self.description
+
+class Remote_job:
+    """
+    A job on a job server, with the attributes and methods of a
+    programs.Job that the GUI uses, and the same hooks
+    (solution_found, finished), called from a thread that follows the
+    job with events().
+    """
+    def __init__(self, program, input, filter_output=False,
+                 deadline=None, priority='interactive', profile=None,
+                 options=None, address=None):
+        self.program = program
+        self.input = input
+        self.filter_output = filter_output
+        self.deadline = deadline
+        self.priority = priority
+        self.address = address
+        self.client = None  # for the calls from the GUI
+        self.id = None
+        self.ring = Remote_ring(self)
+        self.full_output = None  # stays on the server
+        self.extracted = []
+        self.stop_reason = None
+        self.holds = set()
+        self.profile = Remote_profile('')
+        self.limit_message = None
+        self.output = None
+        self.solution = None
+        self.variants = {}
+        self.exit_code = None
+        self.state = State.ready
+
+    def start(self):
+        try:
+            self.client = Client(self.address)
+            self.id = self.client.call('submit',
+                                       program=self.program.name.lower(),
+                                       input=self.input,
+                                       deadline=self.deadline,
+                                       priority=self.priority,
+                                       filter_output=self.filter_output)
+        except (Rpc_error, socket.error, ValueError) as e:
+            sys.stderr.write('job server %s: %s\n' % (self.address, e))
+            self.state = State.error
+            self.finished()
+            return
+        self.state = State.running
+        t = threading.Thread(target=self.follow, name='remote job %d' % self.id)
+        t.setDaemon(True)
+        t.start()
+
+    def follow(self):
+        # A connection of its own, so that the GUI never waits for events.
+        client = None
+        try:
+            client = Client(self.address)
+            while True:
+                r = client.call('events', id=self.id,
+                                start=len(self.extracted))
+                for solution in r['solutions']:
+                    solution = encode(solution)
+                    self.extracted.append(solution)
+                    self.solution_found(solution)
+                status = r['status']
+                if status['state'] in ['done', 'error']:
+                    break
+            self.fetch_results(client, status)
+        except (Rpc_error, socket.error, ValueError) as e:
+            sys.stderr.write('job server %s: %s\n' % (self.address, e))
+            self.state = State.error
+        if client:
+            client.close()
+        self.finished()
+
+    def fetch_results(self, client, status):
+        self.exit_code = status['exit_code']
+        self.limit_message = status['limit_message']
+        self.stop_reason = status['stop_reason']
+        self.profile = Remote_profile(status['profile'])
+        if status['state'] == 'error':
+            self.state = State.error
+            return
+        parts = []
+        offset = 0
+        while True:
+            r = client.call('output', id=self.id, offset=offset)
+            text = r['text'].encode('latin-1')
+            parts.append(text)
+            offset += len(text)
+            if not text or offset >= r['size']:
+                break
+        self.output = ''.join(parts)
+        solution = client.call('solution', id=self.id)
+        self.solution = encode(solution) if solution is not None else None
+        if self.exit_code is None:  # cancelled before it started
+            self.exit_code = -2
+        self.state = State.done
+
+    # Hooks for subclasses, as for programs.Job.
+
+    def solution_found(self, solution):
+        pass
+
+    def finished(self):
+        pass
+
+    def client_address(self):
+        return self.address or server_address() or Default_address
+
+    def remote(self, method, **params):
+        if self.id is not None:
+            try:
+                return self.client.call(method, id=self.id, **params)
+            except (Rpc_error, socket.error):
+                pass
+        return None
+
+    def get_stderr_info(self):
+        if self.state in [State.running, State.suspended, State.done]:
+            info = self.remote('stats')
+            return [(encode(k), encode(v)) for (k, v) in info or []]
+
+    def pause(self):
+        if self.state == State.running:
+            self.remote('pause')
+            self.state = State.suspended
+
+    def resume(self):
+        if self.state == State.suspended:
+            self.remote('resume')
+            self.state = State.running
+
+    def stop(self, reason='user'):
+        if self.state in [State.running, State.suspended]:
+            self.stop_reason = reason
+            self.remote('cancel')
+            self.state = State.running
+
+    def kill(self):
+        if self.state in [State.running, State.suspended]:
+            self.remote('cancel', hard=True)
+
+    def done_with_job(self):
+        if self.client:
+            if self.state in [State.done, State.error]:
+                self.remote('remove')
+            self.client.close()
+            self.client = None
+
+# end class Remote_job
+
+def main(argv):
+    parser = argparse.ArgumentParser(
+        description='Run Prover9 and Mace4 searches for clients.')
+    parser.add_argument('address', nargs='?',
+                        default=server_address() or Default_address,
+                        help='unix:/path or host:port (default %(default)s)')
+    parser.add_argument('--workers', type=int, default=Workers,
+                        help='searches at once (default %(default)s)')
+    parser.add_argument('--agents', action='store_true',
+                        help='accept worker agents (see federation.py)')
+    parser.add_argument('--token', default=os.environ.get(
+                            'PROVER9_MACE4_AGENT_TOKEN'),
+                        help='with --agents, the secret shared with the '
+                        'agents (default: $PROVER9_MACE4_AGENT_TOKEN)')
+    args = parser.parse_args(argv)
+
+    if args.agents:
+        if not args.token:
+            parser.error('--agents needs a token (--token or '
+                         'PROVER9_MACE4_AGENT_TOKEN)')
+        from federation import Coordinator
+        jobs = Coordinator(args.workers, args.token)
+    else:
+        jobs = Job_server(args.workers)
+    server = make_server(args.address, jobs)
+    sys.stderr.write('job server on %s, %d workers\n' %
+                     (args.address, args.workers))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,223 @@
+#     Copyright (C) 2007 William McCune
+#
+#     This file is part of the LADR Deduction Library.
+#
+#     The LADR Deduction Library is free software; you can redistribute it
+#     and/or modify it under the terms of the GNU General Public License
+#     as published by the Free Software Foundation; either version 2 of the
+#     License, or (at your option) any later version.
+#
+#     The LADR Deduction Library is distributed in the hope that it will be
+#     useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+#     MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#     GNU General Public License for more details.
+#
+#     You should have received a copy of the GNU General Public License
+#     along with the LADR Deduction Library; if not, write to the Free Software
+#     Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+
+# system imports
+
+import os
+import signal
+import platform
+
+try:
+    import resource  # Unix only
+except ImportError:
+    resource = None
+
+try:
+    import ctypes
+    import ctypes.util
+except ImportError:
+    ctypes = None
+
+# local imports
+
+from platforms import *
+from spool import env_int
+
+# Operating-system limits for the LADR processes, so that a runaway
+# search cannot take a shared machine (max_seconds and max_megs are
+# enforced by the programs themselves, and only approximately).  The
+# limits of a job are given by a Profile, applied in the child between
+# fork and exec.  The default profile comes from the environment:
+#
+#   PROVER9_MACE4_LIMIT_MEMORY_MB   address space (RLIMIT_AS)
+#   PROVER9_MACE4_LIMIT_CPU         CPU seconds (RLIMIT_CPU)
+#   PROVER9_MACE4_CPUS              CPU affinity, e.g., "0-3,6"
+#   PROVER9_MACE4_NICE              nice increment
+#   PROVER9_MACE4_IOPRIO            I/O priority: "idle", or "be:N" or
+#                                   "rt:N" (N is 0..7, 0 is highest)
+
+Cpu_hard_margin = 5  # SIGXCPU at the limit, SIGKILL this much later
+
+def parse_cpus(s):
+    "'0-3,6' -> [0, 1, 2, 3, 6]"
+    cpus = []
+    for part in s.split(','):
+        part = part.strip()
+        if not part:
+            continue
+        if '-' in part:
+            (lo, hi) = part.split('-')
+            cpus.extend(range(int(lo), int(hi) + 1))
+        else:
+            cpus.append(int(part))
+    return cpus
+
+Ioprio_classes = {'rt': 1, 'be': 2, 'idle': 3}
+
+def parse_ioprio(s):
+    "'be:7' -> (2, 7); 'idle' -> (3, 0); None if it cannot be parsed."
+    parts = s.strip().lower().split(':')
+    if parts[0] not in Ioprio_classes:
+        return None
+    level = 0
+    if len(parts) > 1:
+        try:
+            level = max(0, min(7, int(parts[1])))
+        except ValueError:
+            return None
+    return (Ioprio_classes[parts[0]], level)
+
+# ioprio_set has no wrapper in libc, so it is called by syscall number.
+
+Ioprio_syscalls = {'x86_64': 251, 'i386': 289, 'i686': 289,
+                   'aarch64': 30, 'armv7l': 314, 'ppc64le': 273}
+
+Ioprio_syscall = Ioprio_syscalls.get(platform.machine())
+
+# libc is looked up in the parent (preexec_for): find_library runs other
+# programs, which must not happen between fork and exec in a process
+# with threads.  The child uses only _libc.
+
+_libc = None
+
+def libc():
+    "libc, looked up the first time (never in a child: see above)."
+    global _libc
+    if _libc is None and ctypes:
+        name = ctypes.util.find_library('c')
+        if name:
+            _libc = ctypes.CDLL(name, use_errno=True)
+    return _libc
+
+def set_affinity(cpus):
+    lib = _libc
+    if not lib or not hasattr(lib, 'sched_setaffinity'):
+        return False
+    mask = 0
+    for cpu in cpus:
+        mask |= 1 << cpu
+    nbytes = max(8, (max(cpus) // 64 + 1) * 8)
+    buf = ctypes.create_string_buffer(nbytes)
+    for i in range(nbytes):
+        buf[i] = chr((mask >> (8 * i)) & 0xff)
+    return lib.sched_setaffinity(0, nbytes, buf) == 0
+
+def set_ioprio(ioprio):
+    lib = _libc
+    number = Ioprio_syscall
+    if not lib or not number:
+        return False
+    (cls, level) = ioprio
+    IOPRIO_WHO_PROCESS = 1
+    return lib.syscall(number, IOPRIO_WHO_PROCESS, 0, (cls << 13) | level) == 0
+
+class Profile:
+    """
+    The OS limits for one job.  None means no limit (or no change).
+    preexec() is given to subprocess.Popen as preexec_fn.
+    """
+    def __init__(self, memory_mb=None, cpu_seconds=None, cpus=None,
+                 nice=None, ioprio=None):
+        self.memory_mb = memory_mb
+        self.cpu_seconds = cpu_seconds
+        self.cpus = cpus
+        self.nice = nice
+        self.ioprio = ioprio
+
+    def empty(self):
+        return (self.memory_mb is None and self.cpu_seconds is None and
+                not self.cpus and not self.nice and self.ioprio is None)
+
+    def preexec(self):
+        # In the child, after fork: no exceptions, no threads, no GUI.
+        try:
+            if resource and self.memory_mb:
+                n = self.memory_mb * 1024 * 1024
+                resource.setrlimit(resource.RLIMIT_AS, (n, n))
+            if resource and self.cpu_seconds:
+                n = self.cpu_seconds
+                resource.setrlimit(resource.RLIMIT_CPU,
+                                   (n, n + Cpu_hard_margin))
+            if self.cpus:
+                set_affinity(self.cpus)
+            if self.nice:
+                os.nice(self.nice)
+            if self.ioprio:
+                set_ioprio(self.ioprio)
+        except Exception:
+            pass  # run anyway, without the limit that failed
+
+    def exit_message(self, exit_code, stderr_text, cpu_used=None):
+        """
+        If the process was stopped by one of these limits rather than
+        by the program itself, say which; otherwise None.  (A SIGKILL
+        counts only if the CPU time shows that the hard limit was hit.)
+        """
+        if self.cpu_seconds:
+            if exit_code == -signal.SIGXCPU:
+                return 'OS CPU Limit'
+            if (exit_code == -signal.SIGKILL and cpu_used is not None and
+                cpu_used >= self.cpu_seconds):
+                return 'OS CPU Limit'
+        if self.memory_mb:
+            # LADR: "palloc, malloc returns NULL" is a fatal error.
+            if ((exit_code == 1 and 'malloc' in stderr_text) or
+                exit_code in [-signal.SIGSEGV, -signal.SIGABRT]):
+                return 'OS Memory Limit'
+        return None
+
+    def describe(self):
+        items = []
+        if self.memory_mb:
+            items.append('memory %d MB' % self.memory_mb)
+        if self.cpu_seconds:
+            items.append('CPU %d s' % self.cpu_seconds)
+        if self.cpus:
+            items.append('CPUs %s' % ','.join([str(c) for c in self.cpus]))
+        if self.nice:
+            items.append('nice %d' % self.nice)
+        if self.ioprio:
+            items.append('ioprio %d:%d' % self.ioprio)
+        return ', '.join(items)
+
+# end class Profile
+
+def default_profile():
+    "The profile given by the environment (possibly empty)."
+    cpus = os.environ.get('PROVER9_MACE4_CPUS')
+    ioprio = os.environ.get('PROVER9_MACE4_IOPRIO')
+    try:
+        cpus = parse_cpus(cpus) if cpus else None
+    except ValueError:
+        cpus = None
+    memory_mb = env_int('PROVER9_MACE4_LIMIT_MEMORY_MB', 0)
+    cpu_seconds = env_int('PROVER9_MACE4_LIMIT_CPU', 0)
+    return Profile(memory_mb=memory_mb or None,
+                   cpu_seconds=cpu_seconds or None,
+                   cpus=cpus,
+                   nice=env_int('PROVER9_MACE4_NICE', 0) or None,
+                   ioprio=parse_ioprio(ioprio) if ioprio else None)
+
+def preexec_for(profile):
+    "The preexec_fn for Popen: None if there is nothing to apply."
+    if Win32() or not profile or profile.empty():
+        return None
+    if profile.cpus or profile.ioprio:
+        libc()  # here, in the parent
+    return profile.preexec
@@ -0,0 +1,311 @@
+#!/usr/bin/python2
+
+#     Copyright (C) 2007 William McCune
+#
+#     This file is part of the LADR Deduction Library.
+#
+#     The LADR Deduction Library is free software; you can redistribute it
+#     and/or modify it under the terms of the GNU General Public License
+#     as published by the Free Software Foundation; either version 2 of the
+#     License, or (at your option) any later version.
+#
+#     The LADR Deduction Library is distributed in the hope that it will be
+#     useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+#     MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#     GNU General Public License for more details.
+#
+#     You should have received a copy of the GNU General Public License
+#     along with the LADR Deduction Library; if not, write to the Free Software
+#     Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+
+"""
+Micro-benchmarks for the Python code that runs when the GUI starts
+and when files are opened.  Each function is timed on synthetic inputs
+of increasing size, and a scaling exponent is fitted to the times
+(time ~ size^k).  A check fails if k is above the limit, so that
+quadratic behavior shows up.
+
+Usage:
+    python microbench.py [--headless] [--max-bytes N] [--limit K] [NAME ...]
+
+Benchmarks that need wx (and a display) are skipped with --headless or
+when wx cannot be used.  Allocation is measured with tracemalloc when
+it is available (it is not part of the standard Python 2.7).
+"""
+
+# system imports
+
+import os
+import sys
+import gc
+import math
+import time
+import argparse
+
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+
+# local imports
+
+import utilities
+import partition_input
+
+Byte_sizes    = [1000, 10000, 100000, 1000000, 10000000]
+Formula_counts = [10, 100, 1000, 10000]
+
+# Stop growing a benchmark when a single call takes longer than this.
+Time_budget = 10.0
+
+# Synthetic input
+
+Option_commands = ['set(para_units_only).', 'clear(para_units_only).',
+                   'assign(max_weight, 25).', 'assign(max_weight, 100).',
+                   'set(breadth_first).', 'clear(breadth_first).',
+                   'assign(pick_given_ratio, 4).', 'assign(order, kbo).',
+                   'assign(order, lpo).', 'assign(sos_limit, 5000).']
+
+def synthetic_formula(i):
+    formula = ('f%d(x,g(y,c%d)) * e = h(x,f%d(y,z)) # label(a%d).' %
+               (i % 7, i, i % 5, i))
+    if i % 4 == 0:
+        formula += '  % comment ' + str(i)
+    if i % 50 == 0:
+        formula = '%BEGIN block comment ' + str(i) + ' END%\n' + formula
+    return formula + '\n'
+
+def synthetic_options(n):
+    return ''.join([Option_commands[i % len(Option_commands)] + '\n'
+                    for i in range(n)])
+
+def synthetic_input(n):
+    "A complete input file with n formulas (split 9:1 assumptions:goals)."
+    goals = max(1, n / 10)
+    assumps = n - goals
+    return ('op(400, infix, "@").\n' +
+            'if(Prover9).\n' + synthetic_options(10) + 'end_if.\n' +
+            'if(Mace4).\nassign(max_models, 3).\nend_if.\n' +
+            synthetic_options(10) +
+            'formulas(assumptions).\n' +
+            ''.join([synthetic_formula(i) for i in range(assumps)]) +
+            'end_of_list.\n' +
+            'formulas(goals).\n' +
+            ''.join([synthetic_formula(i) for i in range(assumps, n)]) +
+            'end_of_list.\n')
+
+def input_of_size(nbytes):
+    "A complete input file of about nbytes bytes."
+    per_formula = len(synthetic_input(100)) / 100.0
+    return synthetic_input(max(1, int(nbytes / per_formula)))
+
+# Measurement
+
+def time_call(func, arg, min_total=0.2, max_reps=100):
+    """Return (seconds per call, peak bytes allocated per call or None).
+    The time is the best of several repetitions, as in timeit."""
+    best = None
+    total = 0.0
+    reps = 0
+    while reps < max_reps and (total < min_total or reps < 3):
+        gc.collect()
+        start = time.time()
+        func(arg)
+        elapsed = time.time() - start
+        total += elapsed
+        reps += 1
+        if best is None or elapsed < best:
+            best = elapsed
+        if elapsed > Time_budget / 3:
+            break
+    peak = None
+    if tracemalloc:
+        gc.collect()
+        tracemalloc.start()
+        func(arg)
+        (_, peak) = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    return (best, peak)
+
+def fit_exponent(points):
+    """Least-squares slope of log(time) against log(size).  Points that
+    are too fast to time reliably are left out."""
+    points = [(s, t) for (s, t) in points if t > 0.0005]
+    if len(points) < 2:
+        return None
+    xs = [math.log(s) for (s, _) in points]
+    ys = [math.log(t) for (_, t) in points]
+    n = len(points)
+    mx = sum(xs) / n
+    my = sum(ys) / n
+    sxx = sum([(x - mx) ** 2 for x in xs])
+    if sxx == 0:
+        return None
+    return sum([(x - mx) * (y - my) for (x, y) in zip(xs, ys)]) / sxx
+
+class Bench:
+    """A named function to be timed.  setup(size) returns the argument
+    that is given to func; unit is 'bytes' or 'formulas'."""
+
+    def __init__(self, name, func, setup, unit, scaled=True):
+        self.name = name
+        self.func = func
+        self.setup = setup
+        self.unit = unit
+        self.scaled = scaled
+        self.results = []  # (size, seconds, peak bytes)
+
+    def sizes(self, max_bytes):
+        if not self.scaled:
+            return [1]
+        elif self.unit == 'bytes':
+            return [s for s in Byte_sizes if s <= max_bytes]
+        else:
+            return Formula_counts
+
+    def run(self, max_bytes, out):
+        for size in self.sizes(max_bytes):
+            arg = self.setup(size)
+            (seconds, peak) = time_call(self.func, arg)
+            self.results.append((size, seconds, peak))
+            out.write('  %-28s %10d %-8s %12.6f s %14s\n' %
+                      (self.name, size, self.unit if self.scaled else '',
+                       seconds, '-' if peak is None else '%d B' % peak))
+            out.flush()
+            if seconds > Time_budget:
+                out.write('  %-28s stopped: over the time budget\n' %
+                          self.name)
+                break
+
+    def exponent(self):
+        if not self.scaled:
+            return None
+        return fit_exponent([(s, t) for (s, t, _) in self.results])
+
+# end class Bench
+
+def headless_benches():
+    return [
+        Bench('partition_input.partition', partition_input.partition,
+              input_of_size, 'bytes'),
+        Bench('utilities.comment_spans', utilities.comment_spans,
+              input_of_size, 'bytes'),
+        ]
+
+def gui_benches():
+    """These need a wx.App and a frame that looks enough like Main_frame
+    for to_top() lookups (box_font, auto_highlight, setup)."""
+    import wx
+    from my_setup import Setup_tabs
+    from options import P9_options, set_options
+
+    class Bench_frame(wx.Frame):
+        def __init__(self):
+            wx.Frame.__init__(self, None, -1, 'microbench')
+            self.box_font = wx.Font(12, wx.FONTFAMILY_MODERN,
+                                    wx.FONTSTYLE_NORMAL, wx.FONTWEIGHT_NORMAL)
+            self.current_path = None
+            self.setup = Setup_tabs(self)
+
+        def auto_highlight(self):
+            return False
+
+    app = wx.App(False)
+    frame = Bench_frame()
+    setup = frame.setup
+
+    def store(input):
+        setup.reset()
+        setup.store_input(input)
+
+    def assemble_setup(nbytes):
+        store(input_of_size(nbytes))
+        return None
+
+    def highlight_setup(nbytes):
+        setup.assumps.ed.SetValue(input_of_size(nbytes))
+        return setup.assumps
+
+    def options_setup(n):
+        setup.p9_options.panels.reset()
+        return synthetic_options(n)
+
+    def p9_options(parent):
+        panels = P9_options(parent)
+        for panel in panels.panels.values():
+            panel.Destroy()
+
+    return [
+        Bench('options.set_options',
+              lambda s: set_options(s, setup.p9_options.panels),
+              options_setup, 'formulas'),
+        Bench('Setup_tabs.assemble_input',
+              lambda _: setup.assemble_input(), assemble_setup, 'bytes'),
+        Bench('Setup_tabs.store_input', store, input_of_size, 'bytes'),
+        Bench('Input_panel.highlight',
+              lambda box: box.highlight(), highlight_setup, 'bytes'),
+        Bench('P9_options.__init__', p9_options,
+              lambda _: setup.p9_options.panel2, 'formulas', scaled=False),
+        ]
+
+def display_available():
+    if sys.platform in ['win32', 'darwin']:
+        return True
+    return bool(os.environ.get('DISPLAY') or os.environ.get('WAYLAND_DISPLAY'))
+
+def main(argv):
+    parser = argparse.ArgumentParser(
+        description='Micro-benchmarks for the GUI-side Python code.')
+    parser.add_argument('names', nargs='*',
+                        help='run only benchmarks whose names contain these')
+    parser.add_argument('--headless', action='store_true',
+                        help='skip benchmarks that need wx')
+    parser.add_argument('--max-bytes', type=int, default=Byte_sizes[-1],
+                        help='largest synthetic input (default 10 MB)')
+    parser.add_argument('--limit', type=float, default=1.3,
+                        help='largest acceptable scaling exponent')
+    args = parser.parse_args(argv)
+
+    benches = headless_benches()
+    if args.headless:
+        pass
+    elif not display_available():
+        sys.stdout.write('No display; skipping the wx benchmarks.\n')
+    else:
+        try:
+            benches += gui_benches()
+        except ImportError:
+            sys.stdout.write('wx not found; skipping the wx benchmarks.\n')
+
+    if args.names:
+        benches = [b for b in benches
+                   if [n for n in args.names if n in b.name]]
+
+    if not tracemalloc:
+        sys.stdout.write('tracemalloc not available; '
+                         'allocation is not measured.\n')
+
+    failed = []
+    for bench in benches:
+        sys.stdout.write('%s\n' % bench.name)
+        bench.run(args.max_bytes, sys.stdout)
+
+    sys.stdout.write('\n%-30s %9s  %s\n' % ('Function', 'Exponent', 'Check'))
+    for bench in benches:
+        k = bench.exponent()
+        if k is None:
+            status = 'n/a'
+        elif k > args.limit:
+            status = 'FAIL'
+            failed.append(bench.name)
+        else:
+            status = 'ok'
+        sys.stdout.write('%-30s %9s  %s\n' %
+                         (bench.name, '-' if k is None else '%.2f' % k,
+                          status))
+
+    return 1 if failed else 0
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -25,6 +25,7 @@ import wx
 # local imports
 
 import partition_input
+import recommend
 import utilities
 from files import *
 from control import *
@@ -568,6 +569,56 @@ class Setup_tabs(wx.Notebook):
     def append_input(self, input):
         self.store_input(input)
 
+    def session_boxes(self):
+        return {'language'   : self.language.input,
+                'assumptions': self.assumps,
+                'goals'      : self.goals,
+                'add_p9'     : self.add_p9,
+                'add_m4'     : self.add_m4}
+
+    def session_sections(self):
+        "The text of the boxes, for a session bundle."
+        return dict([(name, box.ed.GetValue())
+                     for (name, box) in self.session_boxes().items()])
+
+    def apply_overlay(self, program_name, triples):
+        # A recommended strategy (recommend.py): the option panel is reset
+        # to the defaults plus the overlay, keeping the limits and output
+        # options, which are not part of a strategy.
+        if program_name == 'Prover9':
+            (opts, page) = (self.p9_options.panels, 2)
+        else:
+            (opts, page) = (self.m4_options, 3)
+        keep = [t for t in opts.nondefaults()
+                if recommend.Not_strategy.match(t[1])]
+        opts.reset()
+        x = set_option_triples(keep + recommend.typed_triples(triples), opts)
+        if x:
+            info_dialog('The following recommended options were not '
+                        'recognized, and they have been ignored.\n\n' +
+                        option_triples_to_string(x))
+        self.SetSelection(page)
+
+    def store_session(self, sections, p9_triples, m4_triples):
+        # From a session bundle: the boxes and options exactly as they
+        # were saved, without partitioning the input again.  Highlighting
+        # is left to the automatic highlighter (or the Highlight buttons).
+        self.reset()
+
+        x = (set_option_triples(p9_triples, self.p9_options.panels) +
+             set_option_triples(m4_triples, self.m4_options))
+        if x:
+            info_dialog('The following options of the session were not '
+                        'recognized, and they have been ignored.\n\n' +
+                        option_triples_to_string(x))
+
+        for (name, box) in self.session_boxes().items():
+            box.ed.SetValue(sections.get(name, ''))
+            box.have_new_text = True
+            box.ed.ShowPosition(0)
+
+        self.SetSelection(1)  # Start with second page (Formulas) showing
+
     def on_changed(self, evt):
         sel = evt.GetSelection()
         if sel == 0:
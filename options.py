@@ -914,3 +914,18 @@ def set_options_either(opt_str, class1, class2, handle_dep = True):
     x2 = set_options(opt_str, class2, handle_dep)
     # (x1 intersect x2) was handled by neither
     return opt_intersect(x1,x2)
+
+def set_option_triples(triples, opt_class):
+    """Set options from (type, name, value) triples (e.g., nondefaults()
+    saved in a session bundle), without parsing and without dependencies,
+    because the triples are the whole saved state.  Return the triples
+    that were not recognized."""
+    not_handled = []
+    for (type,name,value) in triples:
+        opt = opt_class.name_to_opt(name)
+        if opt and opt[Type] == type:
+            update_option(opt, value)
+            update_shared(opt)
+        else:
+            not_handled.append((type,name,value))
+    return not_handled
@@ -125,6 +125,11 @@ def partition(input):
                                        
 # end def partition(input):
 
+def formulas(text):
+    "The formulas of a list (the text inside it), without comments."
+    text = re.sub('%.*', '', text)
+    return [f.strip() for f in re.split('\.(?=\s|$)', text) if f.strip()]
+
 def extract_options(input):
 
     work = input
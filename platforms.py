@@ -19,19 +19,33 @@
 
 # system imports
 
+import sys
 import subprocess
-import wx
+
+# The command-line tools (benchmark, etc.) do not need wx, so if it
+# is not installed, guess the wx platform name from sys.platform.
+
+try:
+    import wx
+    Platform = wx.Platform
+except ImportError:
+    if sys.platform == 'win32':
+        Platform = '__WXMSW__'
+    elif sys.platform == 'darwin':
+        Platform = '__WXMAC__'
+    else:
+        Platform = '__WXGTK__'
 
 # Platforms.  We'll assume GTK, and test for Win32 and Mac when necessary
 
 def Win32():
-    return wx.Platform == '__WXMSW__'
+    return Platform == '__WXMSW__'
 
 def Mac():
-    return wx.Platform == '__WXMAC__'
+    return Platform == '__WXMAC__'
 
 def GTK():
-    return wx.Platform == '__WXGTK__'
+    return Platform == '__WXGTK__'
 
 def Mac_ppc():
     if not Mac():
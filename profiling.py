@@ -0,0 +1,120 @@
+#     Copyright (C) 2007 William McCune
+#
+#     This file is part of the LADR Deduction Library.
+#
+#     The LADR Deduction Library is free software; you can redistribute it
+#     and/or modify it under the terms of the GNU General Public License
+#     as published by the Free Software Foundation; either version 2 of the
+#     License, or (at your option) any later version.
+#
+#     The LADR Deduction Library is distributed in the hope that it will be
+#     useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+#     MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#     GNU General Public License for more details.
+#
+#     You should have received a copy of the GNU General Public License
+#     along with the LADR Deduction Library; if not, write to the Free Software
+#     Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+
+# system imports
+
+import os
+import time
+import cProfile
+
+try:
+    import tracemalloc  # not in the standard Python 2.7
+except ImportError:
+    tracemalloc = None
+
+# If this environment variable names a directory, profiling is
+# turned on at startup, with the reports going to that directory.
+
+Profile_env = 'PROVER9_MACE4_PROFILE'
+
+class Profiler:
+    """
+    Captures a cProfile run (and a tracemalloc snapshot, if available)
+    around each user action (open, start, reformat, isofilter, ...)
+    while profiling is on.  For each capture, NNN-action.pstats and
+    NNN-action-alloc.txt are written to the chosen directory.
+    """
+    def __init__(self):
+        self.directory = None
+        self.count = 0
+        self.busy = False  # actions can be nested; capture the outermost
+
+    def active(self):
+        return self.directory != None
+
+    def start(self, directory):
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        self.directory = directory
+
+    def stop(self):
+        self.directory = None
+
+    def capture(self, action, func, *args, **kwargs):
+        if not self.active() or self.busy:
+            return func(*args, **kwargs)
+
+        self.busy = True
+        self.count += 1
+        base = os.path.join(self.directory, '%03d-%s' % (self.count, action))
+        if tracemalloc:
+            tracemalloc.start(10)
+        profile = cProfile.Profile()
+        start = time.time()
+        try:
+            return profile.runcall(func, *args, **kwargs)
+        finally:
+            elapsed = time.time() - start
+            snapshot = None
+            if tracemalloc:
+                snapshot = tracemalloc.take_snapshot()
+                tracemalloc.stop()
+            self.busy = False
+            try:
+                profile.dump_stats(base + '.pstats')
+                self.write_alloc_report(base + '-alloc.txt', action,
+                                        elapsed, snapshot)
+            except (IOError, OSError):
+                pass  # never let profiling break the action itself
+
+    def write_alloc_report(self, path, action, elapsed, snapshot, top=25):
+        f = open(path, 'w')
+        f.write('Action: %s\nWall seconds: %.3f\n\n' % (action, elapsed))
+        if not snapshot:
+            f.write('tracemalloc is not available; '
+                    'no allocation data.\n')
+        else:
+            stats = snapshot.statistics('lineno')
+            total = sum([stat.size for stat in stats])
+            f.write('Total allocated (still live at end of action): '
+                    '%d bytes\n\nTop %d allocation sites:\n\n' % (total, top))
+            for stat in stats[:top]:
+                f.write('%s\n' % stat)
+        f.close()
+
+# end class Profiler
+
+profiler = Profiler()
+
+def profiled(action):
+    """Decorator for event handlers: profile the handler as the named
+    action whenever profiling is on."""
+    def wrap(func):
+        def wrapper(*args, **kwargs):
+            return profiler.capture(action, func, *args, **kwargs)
+        wrapper.__name__ = func.__name__
+        wrapper.__doc__ = func.__doc__
+        return wrapper
+    return wrap
+
+def start_from_environment():
+    directory = os.environ.get(Profile_env)
+    if directory:
+        profiler.start(os.path.abspath(os.path.expanduser(directory)))
+    return profiler.active()
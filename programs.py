@@ -0,0 +1,576 @@
+#     Copyright (C) 2007 William McCune
+#
+#     This file is part of the LADR Deduction Library.
+#
+#     The LADR Deduction Library is free software; you can redistribute it
+#     and/or modify it under the terms of the GNU General Public License
+#     as published by the Free Software Foundation; either version 2 of the
+#     License, or (at your option) any later version.
+#
+#     The LADR Deduction Library is distributed in the hope that it will be
+#     useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+#     MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#     GNU General Public License for more details.
+#
+#     You should have received a copy of the GNU General Public License
+#     along with the LADR Deduction Library; if not, write to the Free Software
+#     Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+
+# system imports
+
+import os
+import sys
+import re
+import time
+import signal
+import threading
+
+# local imports
+
+import utilities
+from files import *
+from platforms import *
+from utilities import State
+from tracing import span
+from spool import Spool, Piped_process, job_quota
+from archive import Archive, wants_archive
+from streams import Tee, Given_ring, Output_filter, Block_detector
+from streams import from_marker
+from scheduler import slicer, cpu_seconds
+from governor import governor
+from supervisor import call_later, extractions
+from supervisor import Exit_unknown, Exit_output_error
+from limits import default_profile, preexec_for
+from history import record_later
+
+# The LADR programs and the jobs that run them, without any GUI: the
+# descriptors (Prover9, Mace4) know the commands, exit codes, and
+# output formats, and a Job runs a search and extracts its solutions.
+# control.py extends both for the GUI, and api.py for other programs.
+
+# Number of given clauses kept for watching a Prover9 search.
+
+Given_ring_size = 200
+
+def run_and_wait(command, input = '', fin = None, profile = None):
+    # fin, if given, is a Spool (for example, the stdout of a search),
+    # which is handed to the process without copying if it is on disk.
+    # profile (limits.py) gives the OS limits; default: the environment.
+
+    if not profile:
+        profile = default_profile()
+
+    s = span(os.path.basename(command[0]), 'process',
+             command=' '.join(command[1:]))
+
+    if not fin:
+        fin = input
+    s.args['bytes_in'] = len(fin)
+
+    fout = Spool()  # stdout
+    ferr = Spool()  # stderr
+
+    process = Piped_process(command, fin, fout, ferr,
+                            preexec_fn=preexec_for(profile))
+    exit_code = process.wait()
+    output = fout.getvalue()
+    error = ferr.getvalue()
+    fout.close()
+    ferr.close()
+    s.finish(child_pid=process.pid, exit_code=exit_code,
+             bytes_out=len(output))
+    return (exit_code, output, error)
+
+def isofilter_command(program_name):
+    fullpath = os.path.join(bin_dir(), program_name)
+    if not binary_ok(fullpath):
+        return None
+    else:
+        return [fullpath]
+
+class Prover9:
+
+    name = 'Prover9'
+    solution_name = 'Proof'
+    box_name = 'Proof Search'
+    solution_ext = 'proof'
+    some_message = 'Some, but not all, of the requested proofs were found.'
+
+    # Proofs are extracted as they appear; prooftrans needs the output
+    # up to the search along with each proof, so one at a time.
+    block_markers = ('PROOF', 'end of proof')
+    header_end = 'SEARCH'
+    split_solutions = None
+
+
+    # Compile regular expression for extracting stats from stderr.
+
+    r_info = re.compile('Given=(\d+)\. Generated=(\d+)\. Kept=(\d+)\. '
+                        'proofs=(\d+)\.User_CPU=(\d*\.\d*),')
+
+    exits = {}
+    exits[0]   = 'Proof'
+    exits[1]   = 'Fatal Error'
+    exits[2]   = 'Exhausted'
+    exits[3]   = 'Memory Limit'
+    exits[4]   = 'Time Limit'
+    exits[5]   = 'Given Limit'
+    exits[6]   = 'Kept Limit'
+    exits[7]   = 'Action Exit'
+    exits[101] = 'Interrupted'
+    exits[102] = 'Crashed'
+    exits[-2]  = 'Interrupted' # SIGINT, not caught
+    exits[-9]  = 'Killed' # Linux, Mac
+    exits[-1]  = 'Killed' # Win32
+    exits[Exit_unknown] = 'Exit Unknown'
+    exits[Exit_output_error] = 'Output Error'
+
+    def search_command(self):
+        fullpath = os.path.join(bin_dir(), 'prover9')
+        if not binary_ok(fullpath):
+            return None
+        else:
+            return [fullpath]
+
+    def success_command(self):
+        fullpath = os.path.join(bin_dir(), 'prooftrans')
+        if not binary_ok(fullpath):
+            return None
+        else:
+            return [fullpath]
+
+    def exists_solution(self, exit_code, output):
+        return output.find('== PROOF ==') >= 0
+
+    def count_solutions(self, solutions):
+        return solutions.count('== PROOF ==')
+
+    def join_solutions(self, parts):
+        # Each part is prooftrans output for one proof; keep one head.
+        return parts[0] + ''.join([from_marker(p, 'PROOF') for p in parts[1:]])
+
+    def exit_message(self, code):
+        if code in self.exits.keys():
+            return self.exits[code]
+        else:
+            return 'unknown exit code: %d' % code
+
+    def get_info_from_stderr(self, lines):
+        stats = utilities.grep_last('Given', lines)
+        time  = utilities.grep_last('User_CPU', lines)
+        if stats and time:
+            line = stats.strip() + time.strip()
+            m = self.r_info.match(line)
+            if m:
+                return [('CPU Seconds', m.groups()[4]),
+                        ('Given',       m.groups()[0]),
+                        ('Generated',   m.groups()[1]),
+                        ('Kept',        m.groups()[2]),
+                        ('Proofs',      m.groups()[3])]
+            else:
+                self.mismatch()
+
+        return [('CPU Seconds', '?'),
+                ('Given',       '?'),
+                ('Generated',   '?'),
+                ('Kept',        '?'),
+                ('Proofs',      '?')]
+
+    def mismatch(self):
+        pass  # the statistics on stderr could not be parsed
+
+# end class Prover9
+
+class Mace4:
+
+    name = 'Mace4'
+    solution_name = 'Model'
+    box_name = 'Model/Counterexample Search'
+    solution_ext = 'model'
+    some_message = ''
+
+    # Models are formatted (interpformat) as they appear: those that
+    # arrive while one interpformat runs go to the next one together.
+    block_markers = ('MODEL', 'end of model')
+    header_end = None
+
+    
+    # Compile regular expression for extracting stats from stderr.
+    # Domain_size=8. Models=0. User_CPU=8.00.
+    r_info = re.compile('Domain_size=(\d+)\. Models=(\d+)\. User_CPU=(\d*\.\d*)\.')
+
+    exits = {}
+    exits[0]   = 'Model(s)'
+    exits[1]   = 'Fatal Error'
+    exits[2]   = 'Exhausted (no)'
+    exits[3]   = 'Exhausted (yes)'
+    exits[4]   = 'Time Limit (yes)'
+    exits[5]   = 'Time Limit (no)'
+    exits[6]   = 'Mem Limit (yes)'
+    exits[7]   = 'Mem Limit (no)'
+    exits[101] = 'Interrupted'
+    exits[102] = 'Crashed'
+    exits[-2]  = 'Interrupted' # SIGINT, not caught
+    exits[-9]  = 'Killed' # Linux, Mac
+    exits[-1]  = 'Killed' # Win32
+    exits[Exit_unknown] = 'Exit Unknown'
+    exits[Exit_output_error] = 'Output Error'
+
+    def search_command(self):
+        fullpath = os.path.join(bin_dir(), 'mace4')
+        if not binary_ok(fullpath):
+            return None
+        else:
+            return [fullpath, '-c']
+
+    def success_command(self):
+        fullpath = os.path.join(bin_dir(), 'interpformat')
+        if not binary_ok(fullpath):
+            return None
+        else:
+            return [fullpath]
+
+    def exists_solution(self, exit_code, output):
+        return output.find('== MODEL ==') >= 0
+
+    def count_solutions(self, solutions):
+        return solutions.count('interpretation')
+
+    def join_solutions(self, parts):
+        return ''.join(parts)
+
+    def split_solutions(self, text):
+        "The models of the interpformat output for several blocks."
+        starts = [m.start() for m in re.finditer('^interpretation\(', text,
+                                                 re.MULTILINE)]
+        return [text[i:j] for (i, j) in zip(starts, starts[1:] + [len(text)])]
+
+    def exit_message(self, code):
+        if code in self.exits.keys():
+            return self.exits[code]
+        else:
+            return 'unknown exit code: %d' % code
+
+    def get_info_from_stderr(self, lines):
+        line = utilities.grep_last('Domain_size=', lines)
+        if line:
+            m = self.r_info.match(line)
+            if m:
+                return [('CPU Seconds', m.groups()[2]),
+                        ('Domain Size', m.groups()[0]),
+                        ('Models'     , m.groups()[1])]
+            else:
+                self.mismatch()
+        return [('CPU Seconds', '?'),
+                ('Domain Size', '?'),
+                ('Models'     , '?')]
+
+    def mismatch(self):
+        pass  # the statistics on stderr could not be parsed
+
+# end class Mace4
+
+class Job:
+    """
+    One run of Prover9 or Mace4 (a descriptor below), without any GUI.
+    Call start(); the job then runs on its own, and the hooks
+    solution_found() and finished() are called from worker threads.
+    """
+    def __init__(self, program, input, filter_output=False,
+                 deadline=None, priority='interactive', profile=None,
+                 options=None):
+        self.program = program
+        self.input = input
+        self.filter_output = filter_output and program.name == 'Prover9'
+        self.ring = Given_ring(Given_ring_size)  # for watching the search
+        self.fin = self.fout = self.ferr = None  # spools, when started
+        self.filter = None
+        self.full_output = None  # all of stdout, if filtered and archived
+        self.detector = None
+        self.pending_blocks = []  # for extraction during the search
+        self.block_lock = threading.Lock()
+        self.extracting = False
+        self.extraction_idle = threading.Event()
+        self.extraction_idle.set()
+        self.extracted = []  # solutions extracted during the search
+        self.extracted_blocks = 0  # the blocks they came from
+        self.started = threading.Event()
+        self.deadline = deadline  # wall seconds, then a soft stop
+        self.deadline_timer = None
+        self.stop_reason = None   # 'user' or 'deadline' after a soft stop
+        self.priority = priority  # for time slicing (scheduler.py)
+        self.holds = set()        # why it is stopped: 'slice', 'memory'
+        self.hold_lock = threading.Lock()
+        self.pid = None
+        self.cpu = None           # CPU seconds of the process (/proc)
+        self.profile = profile or default_profile()  # OS limits
+        self.limit_message = None  # if an OS limit ended the process
+        self.start_error = None    # if the process could not be started
+        self.options = options  # (type, name, value) triples, for history
+        self.start_time = self.end_time = None
+        self.recorded = threading.Event()  # in the history (history.py)
+        self.recorded.set()
+        self.output = None
+        self.solution = None
+        self.variants = {}  # reformatted solutions, by arguments
+        self.exit_code = None
+        self.state = State.ready  # ready, running, suspended, done, error
+
+
+    def start(self):
+        # Start the process; the supervisor calls process_exited when
+        # it is done.  Nothing here waits.
+        search_command  = self.program.search_command()
+        self.success_command = self.program.success_command()
+
+        if not search_command or not self.success_command:
+            self.state = State.error
+            self.fin  = self.fout = self.ferr = None
+            self.full_output = None
+            self.finished()
+        else:
+            # Spools keep small jobs in memory and spill big ones to disk.
+            quota = job_quota()
+            self.fin  = Spool(self.input)     # stdin
+            self.ferr = Spool(quota=quota)    # stderr
+            if self.filter_output:
+                # Keep the proofs and statistics; the given clauses go
+                # to the ring, and the rest of the search is dropped
+                # (or, with print_gen/print_kept, only archived).
+                self.fout = Spool(quota=quota)
+                self.filter = Output_filter(self.fout, self.ring)
+                sinks = [self.filter]
+                if wants_archive(self.input):
+                    self.full_output = Archive(quota=quota)
+                    sinks.append(self.full_output)
+            else:
+                if wants_archive(self.input):
+                    # print_gen/print_kept: compress stdout as it arrives
+                    self.fout = Archive(quota=quota)
+                else:
+                    self.fout = Spool(quota=quota)
+                sinks = [self.fout, self.ring]
+            if self.program.block_markers:
+                (start, end) = self.program.block_markers
+                self.detector = Block_detector(start, end, self.block_found,
+                                               self.program.header_end)
+                sinks.append(self.detector)
+            stdout = Tee(sinks)
+
+            self.span = span(self.program.name, 'process',
+                             bytes_in=len(self.input))
+            self.state = State.running
+            self.start_time = time.time()
+            try:
+                self.process = Piped_process(
+                    search_command, self.fin, stdout, self.ferr,
+                    preexec_fn=preexec_for(self.profile),
+                    on_exit=self.process_exited)
+            except OSError as e:  # not executable, EMFILE, ENOMEM
+                self.start_error = '%s: %s' % (search_command[0], e)
+                sys.stderr.write(self.start_error + '\n')
+                self.span.finish(error=self.start_error)
+                self.end_time = time.time()
+                self.state = State.error
+                self.started.set()
+                self.finished()
+                return
+            self.pid = self.process.pid
+            slicer.add(self)
+            governor.add(self)
+            if self.deadline:
+                self.deadline_timer = call_later(self.deadline,
+                                                 self.stop, 'deadline')
+            self.started.set()
+
+    def process_exited(self, exit_code):
+        # In a completion thread.
+        self.started.wait()
+        self.end_time = time.time()
+        self.exit_code = exit_code
+        slicer.remove(self)
+        governor.remove(self)
+        if self.deadline_timer:
+            self.deadline_timer.cancel()
+        if self.process.cpu is not None:
+            self.cpu = self.process.cpu
+        self.limit_message = self.profile.exit_message(
+            self.exit_code, self.ferr.getvalue(), self.cpu)
+        self.extraction_idle.wait()  # its results go before job_finished
+        self.state = State.done
+        self.span.finish(child_pid=self.process.pid,
+                         exit_code=self.exit_code,
+                         stop_reason=self.stop_reason,
+                         limit=self.limit_message)
+        if isinstance(self.fout, Archive):
+            self.output = self.fout  # stays compressed
+        else:
+            with span('read_stdout', 'io') as s:
+                self.output = self.fout.getvalue()
+                s.args['bytes'] = len(self.output)
+            if self.fout.truncated:
+                self.output += ('\n%% Output truncated: the spool disk '
+                                'quota was exceeded.\n')
+            if self.filter:
+                self.output += ('\n%% The output filter dropped %d bytes '
+                                'of search output (%d given clauses).\n' %
+                                (self.filter.dropped, self.ring.count))
+
+        if (self.detector and self.detector.count > 0 and
+            self.extracted_blocks == self.detector.count):
+
+            # Every solution was extracted during the search.
+            self.solution = self.program.join_solutions(self.extracted)
+
+        elif (self.exit_code == 0 or
+              self.program.exists_solution(self.exit_code, self.output)):
+
+            # Extract the solution from stdout
+            (rc,output,err) = run_and_wait(self.success_command,
+                                           fin=self.fout)
+
+            if rc == 0:  
+                self.solution = output  # at least one solution
+            elif rc == 2:
+                self.solution = None  # no solution (clear(print_proofs)?)
+            else:
+                self.solution = ('There was an error extracting the %s.' %
+                                 self.program.solution_name)
+
+        # Keep files open until self is deleted (and recorded).
+
+        record_later(self)
+        self.finished()
+
+    def block_found(self, header, block):
+        # In the supervisor thread, which must never wait: queue it.
+        with self.block_lock:
+            self.pending_blocks.append(header + block)
+            if self.extracting:
+                return
+            self.extracting = True
+            self.extraction_idle.clear()
+        extractions.submit(self.extract_blocks)
+
+    def extract_blocks(self):
+        # Extraction thread: solutions in the order they were found.  If
+        # the program can split its output (Mace4), all of the blocks
+        # pending go to one process.
+        while True:
+            with self.block_lock:
+                if not self.pending_blocks:
+                    self.extracting = False
+                    self.extraction_idle.set()
+                    return
+                if self.program.split_solutions:
+                    blocks = self.pending_blocks
+                    self.pending_blocks = []
+                else:
+                    blocks = [self.pending_blocks.pop(0)]
+            (rc, output, err) = run_and_wait(self.success_command,
+                                             input=''.join(blocks))
+            if rc == 0:
+                solutions = [output]
+                if len(blocks) > 1:
+                    parts = self.program.split_solutions(output)
+                    if len(parts) == len(blocks):
+                        solutions = parts
+                self.extracted_blocks += len(blocks)
+                for solution in solutions:
+                    self.extracted.append(solution)
+                    self.solution_found(solution)
+
+    # Hooks for subclasses (the GUI, the API).
+
+    def solution_found(self, solution):
+        pass  # a proof or model, extracted while the search runs
+
+    def finished(self):
+        pass  # the job is done; self.solution etc. are set
+
+    def pause(self):
+        with self.hold_lock:
+            if self.state == State.running:
+                if not self.holds:
+                    os.kill(self.process.pid, signal.SIGSTOP)
+                self.state = State.suspended
+
+    def resume(self):
+        with self.hold_lock:
+            if self.state == State.suspended:
+                if not self.holds:
+                    os.kill(self.process.pid, signal.SIGCONT)
+                self.state = State.running
+
+    # The time slicer ('slice') and the memory governor ('memory') use
+    # the following, independently of the user's pause and resume.  The
+    # process runs only when nobody holds it.
+
+    def paused_by_user(self):
+        return self.state == State.suspended
+
+    def hold(self, reason):
+        with self.hold_lock:
+            if (self.state == State.running and reason not in self.holds and
+                not self.stop_reason):  # let a stopping job finish
+                try:
+                    if not self.holds:
+                        os.kill(self.process.pid, signal.SIGSTOP)
+                    self.holds.add(reason)
+                except OSError:
+                    pass  # it just exited
+
+    def release(self, reason):
+        with self.hold_lock:
+            if reason in self.holds:
+                self.holds.remove(reason)
+                if not self.holds and self.state == State.running:
+                    try:
+                        os.kill(self.process.pid, signal.SIGCONT)
+                    except OSError:
+                        pass
+
+    def get_stderr_info(self):
+        # (a job cancelled before it started has no stderr)
+        if self.ferr and self.state in [State.running, State.suspended,
+                                        State.done]:
+            lines = self.ferr.readlines()
+            info = self.program.get_info_from_stderr(lines)
+            if self.state != State.done:
+                cpu = cpu_seconds(self.pid)
+                if cpu is not None:
+                    self.cpu = cpu  # keep the last value seen
+            info.append(('Process CPU', '%.2f' % self.cpu
+                         if self.cpu is not None else '?'))
+            if slicer.enabled() or governor.enabled():
+                info.append(('Waiting for',
+                             ', '.join(sorted(self.holds)) or '-'))
+            return info
+
+    def kill(self):
+        if self.state == State.running or self.state == State.suspended:
+            # Cleanup will occur in process_exited.
+            self.process.kill()
+
+    def stop(self, reason='user'):
+        # Soft stop: the program writes its statistics and the solutions
+        # it has, which are extracted as usual; it is killed only if it
+        # does not exit within the grace period.
+        if self.state == State.running or self.state == State.suspended:
+            self.stop_reason = reason
+            self.process.stop()
+            self.state = State.running  # stop() continues a paused process
+            self.holds = set()
+
+    def done_with_job(self):
+        self.recorded.wait()  # the history may still be reading the output
+        if self.fin:  # if one exists, all exist
+            self.fin.close()
+            self.fout.close()
+            self.ferr.close()
+        if self.full_output:
+            self.full_output.close()
+        del self
+
+# end class Job
@@ -23,6 +23,7 @@
 
 import os
 import re
+import zipfile
 import wx
 
 # local imports
@@ -32,6 +33,10 @@ from platforms import *
 from wx_utilities import *
 from my_setup import *
 from control import *
+from profiling import *
+from tracing import tracer, export_from_environment
+import bundle
+import recommend
 
 Program_name = 'Prover9-Mace4'
 Program_version = '0.5'
@@ -349,6 +354,13 @@ class Main_frame(wx.Frame):
         self.fmenu.Enable(wx.ID_SAVE, False)
         self.fmenu.Append(wx.ID_SAVEAS, 'Save Input As...')
         self.fmenu.AppendSeparator()
+        id = wx.NewId()
+        self.fmenu.Append(id, 'Open Session...')
+        self.Bind(wx.EVT_MENU, self.on_open_session, id=id)
+        id = wx.NewId()
+        self.fmenu.Append(id, 'Save Session As...')
+        self.Bind(wx.EVT_MENU, self.on_save_session, id=id)
+        self.fmenu.AppendSeparator()
         self.fmenu.Append(wx.ID_EXIT, '&Quit\tCtrl+Q')
 
         self.Bind(wx.EVT_MENU, self.on_open, id=wx.ID_OPEN)
@@ -380,6 +392,30 @@ class Main_frame(wx.Frame):
         self.pref_menu.Check(self.tooltip_id, True)
         self.Bind(wx.EVT_MENU, self.tooltip_toggle, id=self.tooltip_id)
 
+        self.filter_id = wx.NewId()
+        self.pref_menu.Append(self.filter_id,
+                              'Keep Only Proofs and Statistics from Search '
+                              '(Prover9)', '', wx.ITEM_CHECK)
+        self.pref_menu.Check(self.filter_id, False)
+
+        self.split_id = wx.NewId()
+        self.pref_menu.Append(self.split_id,
+                              'Search for Each Goal in a Job of Its Own '
+                              '(Prover9)', '', wx.ITEM_CHECK)
+        self.pref_menu.Check(self.split_id, False)
+
+        self.cubes_id = wx.NewId()
+        self.pref_menu.Append(self.cubes_id,
+                              'Split a Search of One Size into Cubes '
+                              '(Mace4)', '', wx.ITEM_CHECK)
+        self.pref_menu.Check(self.cubes_id, False)
+
+        self.reuse_id = wx.NewId()
+        self.pref_menu.Append(self.reuse_id,
+                              'Skip Sizes with No Model in Earlier Runs '
+                              '(Mace4)', '', wx.ITEM_CHECK)
+        self.pref_menu.Check(self.reuse_id, True)
+
         menu_bar.Append(self.pref_menu, '&Preferences')
 
         # View menu
@@ -392,14 +428,38 @@ class Main_frame(wx.Frame):
         self.Bind(wx.EVT_MENU, self.run_toggle, id=self.run_id)
         menu_bar.Append(self.view_menu, '&View')
 
+        # Tools menu
+        self.tools_menu = wx.Menu()
+        for name in ['Prover9', 'Mace4']:
+            id = wx.NewId()
+            self.tools_menu.Append(id, 'Recommend %s Options...' % name)
+            self.Bind(wx.EVT_MENU,
+                      lambda evt, name=name: self.on_recommend(name), id=id)
+        self.tools_menu.AppendSeparator()
+        id = wx.NewId()
+        self.tools_menu.Append(id, 'Parameter Sweep...')
+        self.Bind(wx.EVT_MENU, self.on_sweep, id=id)
+        id = wx.NewId()
+        self.tools_menu.Append(id, 'Prover9 Seed Fan-out...')
+        self.Bind(wx.EVT_MENU, self.on_fanout, id=id)
+        menu_bar.Append(self.tools_menu, '&Tools')
+
         # Help menu
         menu = wx.Menu()
         menu.Append(wx.ID_HELP_CONTENTS, 'Help \tF1')
         menu.AppendSeparator()
         menu.Append(wx.ID_ABOUT, 'About')
+        menu.AppendSeparator()
+        self.profile_id = wx.NewId()
+        menu.Append(self.profile_id, self.profile_label())
+        self.Bind(wx.EVT_MENU, self.profile_toggle, id=self.profile_id)
+        id = wx.NewId()
+        menu.Append(id, 'Export Trace...')
+        self.Bind(wx.EVT_MENU, self.export_trace, id=id)
         self.Bind(wx.EVT_MENU, self.get_help, id=wx.ID_HELP_CONTENTS)
         self.Bind(wx.EVT_MENU, self.get_about, id=wx.ID_ABOUT)
         menu_bar.Append(menu, '&Help')
+        self.help_menu = menu
 
         # set MenuBar and StatusBar
         self.SetMenuBar(menu_bar)
@@ -466,6 +526,7 @@ class Main_frame(wx.Frame):
     def clear_setup(self, evt):
         self.setup.reset()
 
+    @profiled('open')
     def on_open(self, evt):
         (dir,style) = open_dir_style(self.current_path)  # depends on platform
         dlg = wx.FileDialog(self, message='Select a file',
@@ -532,6 +593,95 @@ class Main_frame(wx.Frame):
             
         dlg.Destroy()
 
+    def program_panels(self):
+        return [self.control.prover9, self.control.mace4]
+
+    @profiled('open session')
+    def on_open_session(self, evt):
+        for panel in self.program_panels():
+            if panel.job_state() in [State.running,State.suspended]:
+                error_dialog('You must "Kill" the %s job before opening '
+                             'a session.' % panel.program.name)
+                return
+        (dir,style) = open_dir_style(self.current_path)  # depends on platform
+        dlg = wx.FileDialog(self, message='Select a session',
+                            defaultDir=dir, style=style,
+                            wildcard='Sessions (*.%s)|*.%s|All files|*' %
+                            (bundle.Extension, bundle.Extension))
+        if dlg.ShowModal() == wx.ID_OK:
+            path = dlg.GetPath()      # full path
+            try:
+                b = bundle.Bundle(path)
+                sections = dict([(name, b.section(name))
+                                 for name in self.setup.session_boxes()])
+                self.setup.store_session(sections,
+                                         b.options('Prover9'),
+                                         b.options('Mace4'))
+                for panel in self.program_panels():
+                    if panel.program.name in b.programs():
+                        panel.restore(b.job(panel.program.name,
+                                            panel.program))
+                self.current_path = None  # the session is not an input file
+                self.fmenu.Enable(wx.ID_SAVE, False)
+                self.SetTitle(os.path.basename(path) + ' - Prover9/Mace4')
+            except (IOError, KeyError, ValueError, zipfile.BadZipfile) as e:
+                error_dialog('Error opening session %s: %s' % (path, e))
+        dlg.Destroy()
+
+    @profiled('save session')
+    def on_save_session(self, evt):
+        (dir,style) = saveas_dir_style(self.current_path) # depends on platform
+        dlg = wx.FileDialog(self, message='Save session as ...',
+                            defaultDir=dir, style=style,
+                            wildcard='Sessions (*.%s)|*.%s' %
+                            (bundle.Extension, bundle.Extension))
+        if dlg.ShowModal() == wx.ID_OK:
+            path = dlg.GetPath()      # full path
+            if not path.endswith('.' + bundle.Extension):
+                path += '.' + bundle.Extension
+            jobs = {}
+            for panel in self.program_panels():
+                if panel.job_state() == State.done:
+                    jobs[panel.program.name] = panel.job
+            options = {'Prover9': self.setup.p9_options.panels.nondefaults(),
+                       'Mace4': self.setup.m4_options.nondefaults()}
+            try:
+                bundle.write_bundle(path, self.setup.session_sections(),
+                                    options, self.setup.assemble_input(),
+                                    jobs, Banner)
+                for job in jobs.values():
+                    job.saved_solution[0] = True
+                self.SetTitle(os.path.basename(path) + ' - Prover9/Mace4')
+            except (IOError, OSError) as e:
+                error_dialog('Error writing session %s: %s' % (path, e))
+        dlg.Destroy()
+
+    def on_recommend(self, program_name):
+        input = self.setup.assemble_input()
+        recs = recommend.recommend(input, program_name, limit=10)
+        if not recs:
+            info_dialog('The run history has no solved problems for %s '
+                        '(or the history is off).' % program_name)
+            return
+        choices = ['%.2f   solved %d of %d   %s' %
+                   (r.score, r.solved, r.neighbors,
+                    recommend.overlay_commands(r.overlay)) for r in recs]
+        dlg = wx.SingleChoiceDialog(
+            self, 'Option overlays that solved the most similar problems '
+            'fastest, best first.\nThe one selected replaces the %s '
+            'options (limits are kept).' % program_name,
+            'Recommended %s Options' % program_name, choices)
+        if dlg.ShowModal() == wx.ID_OK:
+            self.setup.apply_overlay(program_name,
+                                     recs[dlg.GetSelection()].overlay)
+        dlg.Destroy()
+
+    def on_sweep(self, evt):
+        Sweep_frame(self, self.setup)
+
+    def on_fanout(self, evt):
+        Fanout_frame(self, self.setup)
+
     def get_help(self, evt):
         text = '\n' + Banner + '\n' + Help
         frame = Text_frame(self, to_top(self).box_font,
@@ -542,6 +692,48 @@ class Main_frame(wx.Frame):
     def get_about(self, evt):
         info_dialog('\n' + Banner + '\n' + Feedback + Things_to_do)
 
+    def profile_label(self):
+        if profiler.active():
+            return 'Stop Profiling (%s)' % profiler.directory
+        else:
+            return 'Start Profiling...'
+
+    def profile_toggle(self, evt):
+        if profiler.active():
+            directory = profiler.directory
+            profiler.stop()
+            info_dialog('Profiling stopped.  %d report(s) are in %s.' %
+                        (profiler.count, directory))
+        else:
+            dlg = wx.DirDialog(self, 'Directory for profiling reports',
+                               defaultPath=os.getcwd())
+            if dlg.ShowModal() == wx.ID_OK:
+                try:
+                    profiler.start(dlg.GetPath())
+                    info_dialog('Profiling is on.  Each open, start, '
+                                'reformat, and isofilter action will write '
+                                'a .pstats file and an allocation report '
+                                'to %s.' % dlg.GetPath())
+                except OSError as e:
+                    error_dialog('Cannot use directory %s.' % dlg.GetPath())
+            dlg.Destroy()
+        self.help_menu.SetLabel(self.profile_id, self.profile_label())
+
+    def export_trace(self, evt):
+        (dir,style) = saveas_dir_style(self.current_path)
+        dlg = wx.FileDialog(self, message='Export trace as ...',
+                            defaultDir=dir, defaultFile='trace.json',
+                            style=style)
+        if dlg.ShowModal() == wx.ID_OK:
+            path = dlg.GetPath()      # full path
+            try:
+                n = tracer.export(path)
+                info_dialog('%d spans written to %s.  Open the file with '
+                            'chrome://tracing or Perfetto.' % (n, path))
+            except IOError as e:
+                error_dialog('Error opening file %s for writing.' % path)
+        dlg.Destroy()
+
     def tooltip_toggle(self, evt):
         enable = self.pref_menu.IsChecked(self.tooltip_id)
         wx.ToolTip.Enable(enable)
@@ -556,6 +748,18 @@ class Main_frame(wx.Frame):
     def auto_highlight(self):
         return self.pref_menu.IsChecked(self.highlight_id)
 
+    def filter_output(self):
+        return self.pref_menu.IsChecked(self.filter_id)
+
+    def split_goals(self):
+        return self.pref_menu.IsChecked(self.split_id)
+
+    def split_cubes(self):
+        return self.pref_menu.IsChecked(self.cubes_id)
+
+    def reuse_sizes(self):
+        return self.pref_menu.IsChecked(self.reuse_id)
+
     def select_font(self, evt):
         data = wx.FontData()
         data.EnableEffects(True)
@@ -649,9 +853,13 @@ class My_app(wx.App):
 
 # Initialization that does not need wx
 
+start_from_environment()  # before chdir, so relative paths work
+
 os.chdir(os.path.expanduser('~'))  # set current directory to user's home
 
 app = My_app(redirect=False)
 
 app.MainLoop()
 
+export_from_environment()
+
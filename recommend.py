@@ -0,0 +1,329 @@
+#     Copyright (C) 2007 William McCune
+#
+#     This file is part of the LADR Deduction Library.
+#
+#     The LADR Deduction Library is free software; you can redistribute it
+#     and/or modify it under the terms of the GNU General Public License
+#     as published by the Free Software Foundation; either version 2 of the
+#     License, or (at your option) any later version.
+#
+#     The LADR Deduction Library is distributed in the hope that it will be
+#     useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+#     MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#     GNU General Public License for more details.
+#
+#     You should have received a copy of the GNU General Public License
+#     along with the LADR Deduction Library; if not, write to the Free Software
+#     Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+
+"""
+Strategy recommendations from the run history: the option overlays
+(the nondefault options of a run, without limits and printing) that
+solved the most similar problems fastest.  Similarity is by cheap
+syntactic features of the partitioned input (see features()), over the
+k nearest solved problems in the history.
+
+Usage:
+    python recommend.py [--program Mace4] [-k 5] [--limit 5] FILE.in
+
+prints the overlays in portfolio order, as LADR commands.
+"""
+
+# system imports
+
+import re
+import sys
+import math
+import json
+import argparse
+
+# local imports
+
+import partition_input
+from partition_input import formulas
+from history import get_history, problem_hash, Option_types
+
+# Features, in the order of the vector; the counts are taken as log(1+n).
+
+Feature_names = ['assumptions', 'goals', 'equality', 'symbols',
+                 'max_arity', 'mean_arity', 'max_depth', 'horn']
+Log_features = ['assumptions', 'goals', 'symbols', 'max_depth']
+
+# Options that are not strategy: limits, output, and (Mace4) the sizes
+# that are part of the question.
+
+Not_strategy = re.compile('(max_(seconds|minutes|hours|days|megs|proofs|models)'
+                          '|print_.*|report.*|quiet|ignore_option_dependencies'
+                          '|domain_size|start_size|end_size|increment'
+                          '|iterate_up_to)$')
+
+K = 5          # neighbors
+Epsilon = 0.1  # so that the problem itself does not take all the weight
+
+# LADR's built-in operators, with their arities
+Builtin_ops = [('*', 2), ('+', 2), ('/', 2), ('\\', 2), ('@', 2), ('^', 2),
+               ('<=', 2), ('>=', 2), ('<', 2), ('>', 2), ("'", 1)]
+
+Op_arity = {'infix': 2, 'infix_left': 2, 'infix_right': 2,
+            'prefix': 1, 'prefix_paren': 1, 'postfix': 1, 'postfix_paren': 1,
+            'ordinary': None, 'clear': None}
+
+def term_depth(formula):
+    "Nesting of parentheses, as an approximation of the term depth."
+    depth = max_depth = 0
+    for c in formula:
+        if c == '(':
+            depth += 1
+            max_depth = max(max_depth, depth)
+        elif c == ')':
+            depth -= 1
+    return max_depth
+
+def is_horn(formula):
+    """A clause (no quantifiers or connectives other than | and -) with
+    at most one positive literal; None for other formulas."""
+    if re.search('\\b(all|exists)\\b|<->|->|<-|&', formula):
+        return None
+    positive = 0
+    for literal in formula.split('|'):
+        literal = literal.strip()
+        if not literal.startswith('-') and '!=' not in literal:
+            positive += 1
+    return positive <= 1
+
+def features(input):
+    "The syntactic features of a problem, as a dict (see Feature_names)."
+    (p9, m4, assumps, goals, opt, lang, other) = partition_input.partition(input)
+    a = formulas(assumps)
+    g = formulas(goals)
+    all = a + g
+
+    arities = {}
+    for formula in all:
+        for m in re.finditer('(?<![A-Za-z0-9_$])([A-Za-z0-9_$]+)\(', formula):
+            name = m.group(1)
+            # the arguments: commas at the first level inside the parentheses
+            (level, n, i) = (1, 1, m.end())
+            while i < len(formula) and level > 0:
+                c = formula[i]
+                if c == '(':
+                    level += 1
+                elif c == ')':
+                    level -= 1
+                elif c == ',' and level == 1:
+                    n += 1
+                i += 1
+            arities[name] = max(arities.get(name, 0), n)
+        for (op, arity) in Builtin_ops:
+            if re.sub('<->|->|<-', '', formula).find(op) >= 0:
+                arities[op] = arity
+    for m in re.finditer('op\s*\(\s*[^,]+,\s*([a-z_]+)\s*,\s*(\[[^]]*\]|[^)]+)\)',
+                         lang):
+        arity = Op_arity.get(m.group(1))
+        if arity is not None:
+            for name in re.findall('"([^"]+)"|([^\s,\[\]"]+)', m.group(2)):
+                arities[name[0] or name[1]] = arity
+
+    horn = [h for h in [is_horn(f) for f in all] if h is not None]
+    f = {'assumptions': len(a),
+         'goals': len(g),
+         'equality': (len([x for x in all if '=' in x]) / float(len(all))
+                      if all else 0.0),
+         'symbols': len(arities),
+         'max_arity': max(arities.values()) if arities else 0,
+         'mean_arity': (sum(arities.values()) / float(len(arities))
+                        if arities else 0.0),
+         'max_depth': max([term_depth(x) for x in all]) if all else 0,
+         'horn': len([h for h in horn if h]) / float(len(horn)) if horn else 1.0}
+    return f
+
+def vector(f):
+    return [math.log(1 + f[n]) if n in Log_features else float(f[n])
+            for n in Feature_names]
+
+def overlay(triples):
+    "The strategy part of a run's option triples, as a sorted tuple."
+    return tuple(sorted([t for t in triples if not Not_strategy.match(t[1])]))
+
+def typed_triples(triples):
+    """History triples (type name, name, value string) as options triples
+    (Flag/Parm/Stringparm, name, value), for options.set_option_triples."""
+    typed = []
+    for (type, name, value) in triples:
+        t = Option_types.index(type)
+        if type == 'flag':
+            value = value in ['True', '1']
+        elif type == 'parm':
+            value = int(value)
+        typed.append((t, name, value))
+    return typed
+
+def overlay_commands(triples):
+    "An overlay as LADR commands."
+    lines = []
+    for (type, name, value) in triples:
+        if type == 'flag':
+            lines.append('%s(%s).' % ('set' if value in ['True', '1']
+                                      else 'clear', name))
+        else:
+            lines.append('assign(%s, %s).' % (name, value))
+    return ' '.join(lines) or '(defaults)'
+
+class Recommendation:
+    def __init__(self, overlay, score, solved, tried, neighbors):
+        self.overlay = overlay      # history triples
+        self.score = score          # 0..1, 1 = fastest on all neighbors
+        self.solved = solved        # neighbors it solved
+        self.tried = tried          # neighbors it was run on
+        self.neighbors = neighbors
+
+    def __repr__(self):
+        return '<Recommendation %.2f %d/%d %s>' % (
+            self.score, self.solved, self.neighbors,
+            overlay_commands(self.overlay))
+
+# end class Recommendation
+
+class Recommender:
+    """
+    k nearest neighbors over the solved problems of the history.  The
+    features of a problem are computed once, from the input of one of its
+    runs, and kept in the history database (table features).
+    """
+    def __init__(self, history, program='Prover9'):
+        self.history = history
+        self.program = program
+        with history.lock:
+            history.db.execute('create table if not exists features '
+                               '(problem_hash text primary key, vector text)')
+            history.db.commit()
+        self.load()
+
+    def load(self):
+        "The runs of the program, by problem, and the feature vectors."
+        self.problems = {}  # problem_hash -> [(overlay, seconds or None)]
+        inputs = {}
+        for run in self.history.dicts(
+                'select id, problem_hash, input_hash, exit_code, cpu, wall '
+                'from runs where program = ?', [self.program]):
+            o = overlay(self.history.options(run['id']))
+            seconds = None
+            if run['exit_code'] == 0:
+                seconds = max(run['cpu'] or run['wall'] or 0, 0.01)
+            self.problems.setdefault(run['problem_hash'], []).append((o, seconds))
+            inputs[run['problem_hash']] = run['input_hash']
+        # only problems that were solved at least once teach anything
+        for p in self.problems.keys():
+            if not [s for (o, s) in self.problems[p] if s]:
+                del self.problems[p]
+
+        self.vectors = {}
+        with self.history.lock:
+            for (p, v) in self.history.db.execute(
+                    'select problem_hash, vector from features'):
+                if p in self.problems:
+                    self.vectors[p] = json.loads(v)
+        for p in self.problems:
+            if p not in self.vectors:
+                input = self.history.get_blob(inputs[p]) or ''
+                self.vectors[p] = vector(features(input))
+                with self.history.lock:
+                    self.history.db.execute(
+                        'insert or replace into features values (?, ?)',
+                        (p, json.dumps(self.vectors[p])))
+        with self.history.lock:
+            self.history.db.commit()
+
+        # scale each feature by its spread over the problems
+        self.scale = []
+        for i in range(len(Feature_names)):
+            values = [v[i] for v in self.vectors.values()]
+            if len(values) > 1:
+                mean = sum(values) / len(values)
+                sd = math.sqrt(sum([(x - mean) ** 2 for x in values]) /
+                               len(values))
+            else:
+                sd = 0.0
+            self.scale.append(sd or 1.0)
+
+    def distance(self, v1, v2):
+        return math.sqrt(sum([((a - b) / s) ** 2
+                              for (a, b, s) in zip(v1, v2, self.scale)]))
+
+    def neighbors(self, input, k=K):
+        "[(distance, problem_hash)] of the k nearest solved problems."
+        v = vector(features(input))
+        near = sorted([(self.distance(v, w), p)
+                       for (p, w) in self.vectors.items()])
+        return near[:k]
+
+    def recommend(self, input, k=K, limit=None):
+        """The overlays run on the k nearest solved problems, best first.
+        On each neighbor an overlay scores its speed relative to the
+        fastest run of that problem (0 if it failed or was not run); the
+        score is the average, weighted by closeness."""
+        near = self.neighbors(input, k)
+        total = sum([1.0 / (d + Epsilon) for (d, p) in near])
+        scores = {}  # overlay -> [score, solved, tried]
+        for (d, p) in near:
+            w = 1.0 / (d + Epsilon)
+            runs = self.problems[p]
+            best = min([s for (o, s) in runs if s])
+            fastest = {}  # overlay -> seconds (None if it never succeeded)
+            for (o, s) in runs:
+                if s and (fastest.get(o) is None or s < fastest[o]):
+                    fastest[o] = s
+                else:
+                    fastest.setdefault(o, None)
+            for (o, s) in fastest.items():
+                x = scores.setdefault(o, [0.0, 0, 0])
+                x[2] += 1
+                if s:
+                    x[0] += w * best / s
+                    x[1] += 1
+        ranked = [Recommendation(list(o), x[0] / total, x[1], x[2], len(near))
+                  for (o, x) in scores.items()]
+        ranked.sort(key=lambda r: (-r.score, -r.solved, len(r.overlay)))
+        return ranked[:limit] if limit else ranked
+
+# end class Recommender
+
+def recommend(input, program='Prover9', k=K, limit=None):
+    "Recommendations from the history (empty if it is off or has none)."
+    history = get_history()
+    if not history:
+        return []
+    return Recommender(history, program).recommend(input, k, limit)
+
+def main(argv):
+    parser = argparse.ArgumentParser(
+        description='Recommend options for a problem from the run history.')
+    parser.add_argument('file', help='the input file')
+    parser.add_argument('--program', default='Prover9',
+                        choices=['Prover9', 'Mace4'])
+    parser.add_argument('-k', type=int, default=K,
+                        help='the number of similar problems')
+    parser.add_argument('--limit', type=int, default=5)
+    args = parser.parse_args(argv)
+
+    input = open(args.file).read()
+    history = get_history()
+    if not history:
+        sys.stderr.write('The history is off.\n')
+        return 1
+    r = Recommender(history, args.program)
+    f = features(input)
+    print 'problem %s:  %s' % (problem_hash(input)[:12],
+                               ', '.join(['%s %g' % (n, f[n])
+                                          for n in Feature_names]))
+    for (d, p) in r.neighbors(input, args.k):
+        print '  similar: %s  (distance %.2f)' % (p[:12], d)
+    for (i, rec) in enumerate(r.recommend(input, args.k, args.limit)):
+        print '%2d. %.2f  solved %d/%d  %s' % (i + 1, rec.score, rec.solved,
+                                               rec.neighbors,
+                                               overlay_commands(rec.overlay))
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,127 @@
+#     Copyright (C) 2007 William McCune
+#
+#     This file is part of the LADR Deduction Library.
+#
+#     The LADR Deduction Library is free software; you can redistribute it
+#     and/or modify it under the terms of the GNU General Public License
+#     as published by the Free Software Foundation; either version 2 of the
+#     License, or (at your option) any later version.
+#
+#     The LADR Deduction Library is distributed in the hope that it will be
+#     useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+#     MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#     GNU General Public License for more details.
+#
+#     You should have received a copy of the GNU General Public License
+#     along with the LADR Deduction Library; if not, write to the Free Software
+#     Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+
+# system imports
+
+import os
+import time
+import threading
+
+# local imports
+
+from platforms import *
+from spool import env_int
+
+# Time slicing: when more searches are running than there are CPUs, the
+# slicer lets only as many run as there are slots, and every quantum it
+# gives the CPUs to the jobs that have had the least CPU time, with
+# interactive jobs always ahead of batch jobs.  The others are held
+# with SIGSTOP (see Run_program.hold and release).  Jobs held for
+# another reason (the memory governor) do not count.  It is off unless
+# the quantum is set:
+#
+#   PROVER9_MACE4_TIMESLICE   quantum in seconds (0 means off)
+#   PROVER9_MACE4_SLOTS       jobs that may run at once (default: CPUs)
+
+Priorities = ['interactive', 'batch']  # most urgent first
+
+Quantum = env_int('PROVER9_MACE4_TIMESLICE', 0)
+
+def cpu_count():
+    try:
+        import multiprocessing
+        return multiprocessing.cpu_count()
+    except (ImportError, NotImplementedError):
+        return 1
+
+Slots = env_int('PROVER9_MACE4_SLOTS', cpu_count())
+
+try:
+    Clock_ticks = os.sysconf('SC_CLK_TCK')
+except (AttributeError, ValueError, OSError):
+    Clock_ticks = 100
+
+def cpu_seconds(pid):
+    "User + system CPU seconds of a running process (from /proc), or None."
+    try:
+        f = open('/proc/%d/stat' % pid)
+        stat = f.read()
+        f.close()
+    except (IOError, OSError):
+        return None
+    # The command name (field 2) may contain spaces; skip past it.
+    fields = stat[stat.rfind(')') + 2:].split()
+    return (int(fields[11]) + int(fields[12])) / float(Clock_ticks)
+
+class Time_slicer:
+    """
+    Rotates the CPUs among the registered jobs.  A job needs pid,
+    priority (one of Priorities), holds (a set of reasons),
+    paused_by_user(), hold(reason) and release(reason).
+    """
+    def __init__(self, quantum=Quantum, slots=Slots):
+        self.quantum = quantum
+        self.slots = max(1, slots)
+        self.jobs = []
+        self.lock = threading.Lock()
+        self.thread = None
+
+    def enabled(self):
+        return self.quantum > 0 and not Win32()
+
+    def add(self, job):
+        if not self.enabled():
+            return
+        with self.lock:
+            self.jobs.append(job)
+            if not self.thread:
+                self.thread = threading.Thread(target=self.loop,
+                                               name='time slicer')
+                self.thread.setDaemon(True)
+                self.thread.start()
+        self.rotate()  # a new interactive job should not wait a quantum
+
+    def remove(self, job):
+        with self.lock:
+            if job in self.jobs:
+                self.jobs.remove(job)
+        job.release('slice')
+        self.rotate()
+
+    def rotate(self):
+        with self.lock:
+            jobs = [j for j in self.jobs if not j.paused_by_user() and
+                    not (j.holds - set(['slice']))]
+            def key(job):
+                cpu = cpu_seconds(job.pid)
+                return (Priorities.index(job.priority), cpu or 0.0)
+            jobs.sort(key=key)
+            for job in jobs[self.slots:]:
+                job.hold('slice')
+            for job in jobs[:self.slots]:
+                job.release('slice')
+
+    def loop(self):
+        while True:
+            time.sleep(self.quantum)
+            self.rotate()
+
+# end class Time_slicer
+
+slicer = Time_slicer()
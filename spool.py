@@ -0,0 +1,348 @@
+#     Copyright (C) 2007 William McCune
+#
+#     This file is part of the LADR Deduction Library.
+#
+#     The LADR Deduction Library is free software; you can redistribute it
+#     and/or modify it under the terms of the GNU General Public License
+#     as published by the Free Software Foundation; either version 2 of the
+#     License, or (at your option) any later version.
+#
+#     The LADR Deduction Library is distributed in the hope that it will be
+#     useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+#     MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#     GNU General Public License for more details.
+#
+#     You should have received a copy of the GNU General Public License
+#     along with the LADR Deduction Library; if not, write to the Free Software
+#     Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+
+# system imports
+
+import os
+import signal
+import threading
+import tempfile
+import subprocess
+
+# local imports
+
+from platforms import *
+from supervisor import supervisor, completions, call_later, Chunk_size
+
+# Spools hold the stdin, stdout, and stderr of the LADR programs.  Data
+# is kept in memory up to a threshold; beyond that, it spills to a file
+# in a (preferably fast) spool directory.  The following environment
+# variables control this:
+#
+#   PROVER9_MACE4_SPOOL_DIR         directory for spilled spools
+#   PROVER9_MACE4_SPOOL_MEMORY_KB   in-memory threshold for each spool
+#   PROVER9_MACE4_JOB_QUOTA_MB      disk limit for the output of one job
+#   PROVER9_MACE4_SPOOL_QUOTA_MB    disk limit for all spools together
+
+def env_int(name, default):
+    try:
+        return int(os.environ[name])
+    except (KeyError, ValueError):
+        return default
+
+Memory_threshold = env_int('PROVER9_MACE4_SPOOL_MEMORY_KB', 4096) * 1024
+Job_quota_bytes = env_int('PROVER9_MACE4_JOB_QUOTA_MB', -1) * 1024 * 1024
+Global_quota_bytes = env_int('PROVER9_MACE4_SPOOL_QUOTA_MB', -1) * 1024 * 1024
+
+# A stopped process gets this many seconds, after SIGINT, to write its
+# statistics and partial results before it is killed.
+
+Stop_grace_seconds = env_int('PROVER9_MACE4_STOP_GRACE', 5)
+
+def spool_dir():
+    "Where spilled spools go: the environment, tmpfs, or the usual tmp."
+    dir = os.environ.get('PROVER9_MACE4_SPOOL_DIR')
+    if dir and os.path.isdir(dir):
+        return dir
+    elif os.path.isdir('/dev/shm') and os.access('/dev/shm', os.W_OK):
+        return '/dev/shm'
+    else:
+        return None  # tempfile's default
+
+class Quota:
+    """
+    A limit on bytes written to disk.  Quotas nest: a job quota
+    charges its parent (the global quota) as well.  A limit < 0 means
+    no limit.
+    """
+    def __init__(self, limit, parent=None):
+        self.limit = limit
+        self.parent = parent
+        self.used = 0
+        self.lock = threading.Lock()
+
+    def reserve(self, n):
+        "Return the number of bytes (<= n) that may be written."
+        with self.lock:
+            if self.limit >= 0:
+                n = max(0, min(n, self.limit - self.used))
+            if self.parent:
+                n = self.parent.reserve(n)
+            self.used += n
+            return n
+
+    def release(self, n):
+        with self.lock:
+            self.used -= n
+        if self.parent:
+            self.parent.release(n)
+
+# end class Quota
+
+global_quota = Quota(Global_quota_bytes)
+
+def job_quota():
+    return Quota(Job_quota_bytes, global_quota)
+
+class Spool:
+    """
+    A growing byte string, in memory or (beyond the threshold) in a
+    file.  Writes and reads may come from different threads.  If the
+    quota runs out, further data is dropped and self.truncated is set.
+    """
+    def __init__(self, data='', threshold=None, quota=None):
+        self.threshold = Memory_threshold if threshold is None else threshold
+        self.quota = quota
+        self.parts = []
+        self.file = None
+        self.size = 0
+        self.disk_bytes = 0
+        self.truncated = False
+        self.closed = False
+        self.lock = threading.RLock()
+        if data:
+            self.write(data)
+
+    def __len__(self):
+        return self.size
+
+    def spilled(self):
+        return self.file != None
+
+    def write(self, data):
+        with self.lock:
+            if self.truncated or self.closed:
+                return
+            if not self.file and self.size + len(data) <= self.threshold:
+                self.parts.append(data)
+                self.size += len(data)
+                return
+            if not self.file:
+                self.spill()
+            n = len(data)
+            if self.quota:
+                n = self.quota.reserve(n)
+                if n < len(data):
+                    self.truncated = True
+            self.file.write(data[:n])
+            self.disk_bytes += n
+            self.size += n
+
+    def spill(self):
+        self.file = tempfile.TemporaryFile('w+b', dir=spool_dir())
+        data = ''.join(self.parts)
+        self.parts = []
+        n = len(data)
+        if self.quota:
+            n = self.quota.reserve(n)
+            if n < len(data):
+                self.truncated = True
+        self.file.write(data[:n])
+        self.disk_bytes = n
+        self.size = n
+
+    def getvalue(self):
+        with self.lock:
+            if self.file:
+                self.file.flush()
+                self.file.seek(0)
+                data = self.file.read()
+                self.file.seek(0, 2)  # back to the end for writing
+                return data
+            else:
+                if len(self.parts) > 1:
+                    self.parts = [''.join(self.parts)]
+                return self.parts[0] if self.parts else ''
+
+    def readlines(self):
+        return self.getvalue().splitlines(True)
+
+    def chunks(self):
+        yield self.getvalue()
+
+    def stdin_file(self):
+        """If the data is in a file, rewind it and return it, so that the
+        next process reads the same fd (no copy).  Otherwise None."""
+        with self.lock:
+            if self.file:
+                self.file.flush()
+                self.file.seek(0)
+                return self.file
+            else:
+                return None
+
+    def close(self):
+        with self.lock:
+            if self.file:
+                self.file.close()
+                self.file = None
+            if self.quota and self.disk_bytes:
+                self.quota.release(self.disk_bytes)
+                self.disk_bytes = 0
+            self.parts = []
+            self.closed = True
+
+# end class Spool
+
+def pump(pipe, spool):
+    "Copy a pipe to a spool until EOF (runs in its own thread)."
+    while True:
+        data = os.read(pipe.fileno(), Chunk_size)
+        if not data:
+            break
+        spool.write(data)
+    if hasattr(spool, 'eof'):
+        spool.eof()  # stream stages flush partial lines
+    pipe.close()
+
+def feed(pipe, chunks):
+    "Write data to a pipe and close it (runs in its own thread)."
+    try:
+        for data in chunks:
+            pipe.write(data)
+        pipe.close()
+    except IOError:
+        pass  # the process exited without reading all of its input
+
+class Piped_process:
+    """
+    A subprocess whose stdout and stderr are copied into spools, and
+    whose stdin comes from a string or a spool (or an archive).  A
+    spilled spool is given to the process as a file; otherwise the data
+    is fed through a pipe, so that small jobs never touch the disk.
+    The pipes are served by the supervisor (supervisor.py); when the
+    process has exited and its output is spooled, on_exit(exit_code),
+    if given, is called in a completion thread.
+    """
+    def __init__(self, command, input, stdout, stderr, preexec_fn=None,
+                 on_exit=None):
+        self.stdout = stdout
+        self.stderr = stderr
+        self.on_exit = on_exit
+        self.threads = []
+        self.exit_code = None
+        self.cpu = None  # user + system CPU seconds, when it has exited
+        self.stopping = False
+        self.timer = None
+        self.done = threading.Event()
+
+        if isinstance(input, basestring):  # the GUI's text is unicode
+            stdin = None
+            if isinstance(input, unicode):
+                input = input.encode('utf-8')
+            data = [input]
+        else:
+            stdin = input.stdin_file()
+            data = None if stdin else input.chunks()
+        if not stdin:
+            stdin = subprocess.PIPE
+
+        if Win32():
+            # creationflag says not to pop a DOS box
+            self.process = subprocess.Popen(
+                command, stdin=stdin,
+                stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                creationflags=win32process.CREATE_NO_WINDOW)
+        else:
+            self.process = subprocess.Popen(
+                command, stdin=stdin,
+                stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                preexec_fn=preexec_fn)
+        self.pid = self.process.pid
+
+        outputs = [(self.process.stdout, stdout),
+                   (self.process.stderr, stderr)]
+        if supervisor.enabled():
+            if stdin == subprocess.PIPE:
+                supervisor.add(self, outputs, self.process.stdin, iter(data))
+            else:
+                supervisor.add(self, outputs)
+        else:
+            # No poll() on Win32 pipes: a thread for each pipe, and one
+            # to wait for the process.
+            for (pipe, sink) in outputs:
+                self.start_thread(pump, pipe, sink)
+            if stdin == subprocess.PIPE:
+                self.start_thread(feed, self.process.stdin, data)
+            t = threading.Thread(target=self.wait_thread)
+            t.setDaemon(True)
+            t.start()
+
+    def start_thread(self, func, *args):
+        t = threading.Thread(target=func, args=args)
+        t.setDaemon(True)
+        t.start()
+        self.threads.append(t)
+
+    def wait_thread(self):
+        exit_code = self.process.wait()
+        for t in self.threads:
+            t.join()
+        self.finished(exit_code, None)
+
+    def finished(self, exit_code, cpu):
+        # From the supervisor (or wait_thread): exited, output spooled.
+        self.exit_code = exit_code
+        self.cpu = cpu
+        if self.timer:
+            self.timer.cancel()
+        self.done.set()
+        if self.on_exit:
+            completions.submit(self.on_exit, exit_code)
+
+    def kill(self):
+        if self.exit_code is not None:
+            return
+        try:
+            if Win32():
+                win32api.TerminateProcess(int(self.process._handle), -1)
+            else:
+                os.kill(self.pid, signal.SIGKILL)
+        except OSError:
+            pass  # it has just exited
+
+    def stop(self, grace=None):
+        """
+        Soft stop: SIGINT, so that the LADR programs write their
+        statistics and what they have found, then SIGKILL if the process
+        is still there after the grace period.  Returns at once.  (Win32
+        has no SIGINT for these processes, so it kills right away.)
+        """
+        if self.exit_code is not None or self.stopping:
+            return
+        if grace is None:
+            grace = Stop_grace_seconds
+        if Win32() or grace <= 0:
+            self.kill()
+            return
+        self.stopping = True
+        try:
+            os.kill(self.pid, signal.SIGINT)
+            os.kill(self.pid, signal.SIGCONT)  # in case it is paused
+        except OSError:
+            return  # already gone
+        self.timer = call_later(grace, self.kill)
+
+    def wait(self):
+        "Wait for the process and for all of its output to be spooled."
+        while not self.done.isSet():
+            self.done.wait(1.0)  # (a timeout keeps it interruptible)
+        return self.exit_code
+
+# end class Piped_process
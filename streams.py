@@ -0,0 +1,221 @@
+#     Copyright (C) 2007 William McCune
+#
+#     This file is part of the LADR Deduction Library.
+#
+#     The LADR Deduction Library is free software; you can redistribute it
+#     and/or modify it under the terms of the GNU General Public License
+#     as published by the Free Software Foundation; either version 2 of the
+#     License, or (at your option) any later version.
+#
+#     The LADR Deduction Library is distributed in the hope that it will be
+#     useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+#     MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#     GNU General Public License for more details.
+#
+#     You should have received a copy of the GNU General Public License
+#     along with the LADR Deduction Library; if not, write to the Free Software
+#     Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+
+# system imports
+
+import re
+import threading
+import collections
+
+# Stream stages for the stdout of a running job.  Each stage has
+# write(data), called with chunks as they arrive (in a pump thread),
+# and eof(), called after the last chunk.
+
+# Section markers, e.g.,
+# ============================== PROOF =================================
+
+r_marker = re.compile('^={10,} (.*?) ={3,}\s*$')
+
+def section_marker(line):
+    "If the line is a section marker, return its name, else None."
+    if line.startswith('=========='):
+        m = r_marker.match(line)
+        if m:
+            return m.group(1)
+    return None
+
+def from_marker(text, name):
+    "The text from the first marker of the named section on, or ''."
+    i = 0
+    for line in text.splitlines(True):
+        if section_marker(line) == name:
+            return text[i:]
+        i += len(line)
+    return ''
+
+class Tee:
+    "Send the stream to several stages."
+    def __init__(self, sinks):
+        self.sinks = sinks
+
+    def write(self, data):
+        for sink in self.sinks:
+            sink.write(data)
+
+    def eof(self):
+        for sink in self.sinks:
+            if hasattr(sink, 'eof'):
+                sink.eof()
+
+# end class Tee
+
+class Line_stream:
+    "Base class: cut the stream into lines and call self.line() on each."
+    def __init__(self):
+        self.partial = ''
+
+    def write(self, data):
+        lines = (self.partial + data).split('\n')
+        self.partial = lines.pop()
+        for line in lines:
+            self.line(line + '\n')
+
+    def skip(self, data):
+        "Pass over a chunk that has no interesting lines."
+        i = data.rfind('\n')
+        if i >= 0:
+            self.partial = data[i+1:]
+        else:
+            self.partial += data
+
+    def eof(self):
+        if self.partial:
+            self.line(self.partial)
+            self.partial = ''
+
+    def line(self, line):
+        pass
+
+# end class Line_stream
+
+class Given_ring(Line_stream):
+    """
+    The last n given clauses of a Prover9 search (lines 'given #...'),
+    for watching a search while it runs.  Memory use is constant.
+    """
+    def __init__(self, n):
+        Line_stream.__init__(self)
+        self.ring = collections.deque(maxlen=n)
+        self.count = 0
+        self.lock = threading.Lock()
+
+    def write(self, data):
+        # Chunks without given clauses (most of them, with print_kept)
+        # are skipped, except for remembering the last partial line.
+        if 'given #' in data or 'given #' in self.partial + data[:7]:
+            Line_stream.write(self, data)
+        else:
+            self.skip(data)
+
+    def line(self, line):
+        if line.startswith('given #'):
+            self.add(line)
+
+    def add(self, line):
+        with self.lock:
+            self.ring.append(line)
+            self.count += 1
+
+    def lines(self):
+        with self.lock:
+            return (self.count, list(self.ring))
+
+# end class Given_ring
+
+class Output_filter(Line_stream):
+    """
+    Filter for Prover9 stdout.  Everything outside the SEARCH section is
+    kept (the input echo, which prooftrans needs, and the final
+    messages); inside it, only the PROOF and STATISTICS blocks and the
+    short '%' status lines are kept.  Given clauses go to the ring, and
+    the other lines (generated/kept clauses, ...) are dropped.  'kept'
+    is a Spool (or anything with write).
+    """
+    def __init__(self, kept, ring):
+        Line_stream.__init__(self)
+        self.kept = kept
+        self.ring = ring
+        self.state = 'outside'   # outside, search, proof, statistics
+        self.resume = 'outside'  # state after a STATISTICS block
+        self.dropped = 0         # bytes
+
+    def line(self, line):
+        marker = section_marker(line)
+        if marker:
+            self.kept.write(line)
+            if marker == 'SEARCH':
+                self.state = 'search'
+            elif marker == 'end of search':
+                self.state = 'outside'
+            elif marker == 'PROOF':
+                self.state = 'proof'
+            elif marker == 'end of proof':
+                self.state = 'search'
+            elif marker == 'STATISTICS':
+                self.resume = self.state
+                self.state = 'statistics'
+            elif marker == 'end of statistics':
+                self.state = self.resume
+        elif self.state != 'search':
+            self.kept.write(line)
+        elif line.startswith('given #'):
+            self.ring.add(line)
+            self.dropped += len(line)
+        elif line.startswith('%') or line.strip() == '':
+            self.kept.write(line)
+        else:
+            self.dropped += len(line)
+
+# end class Output_filter
+
+class Block_detector(Line_stream):
+    """
+    Finds the blocks (proofs, models) in the output as they are
+    completed, and calls found(header, block) for each, in the pump
+    thread, so found() should be quick.  The header is the output up to
+    the header_end section (None for no header), which some extraction
+    programs need along with the block.  Between blocks, chunks are
+    skipped unless they might contain the start marker.
+    """
+    def __init__(self, start, end, found, header_end=None):
+        Line_stream.__init__(self)
+        self.start = start
+        self.end = end
+        self.found = found
+        self.header_end = header_end
+        self.header = []
+        self.in_header = header_end != None
+        self.block = None  # lines of the current block
+        self.count = 0
+
+    def write(self, data):
+        if (self.in_header or self.block != None or
+            self.start in data or self.start in self.partial + data[:20]):
+            Line_stream.write(self, data)
+        else:
+            self.skip(data)
+
+    def line(self, line):
+        marker = section_marker(line)
+        if self.block != None:
+            self.block.append(line)
+            if marker == self.end:
+                self.count += 1
+                self.found(''.join(self.header), ''.join(self.block))
+                self.block = None
+        elif marker == self.start:
+            self.in_header = False
+            self.block = [line]
+        elif self.in_header:
+            if marker == self.header_end:
+                self.in_header = False
+            else:
+                self.header.append(line)
+
+# end class Block_detector
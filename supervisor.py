@@ -0,0 +1,354 @@
+#     Copyright (C) 2007 William McCune
+#
+#     This file is part of the LADR Deduction Library.
+#
+#     The LADR Deduction Library is free software; you can redistribute it
+#     and/or modify it under the terms of the GNU General Public License
+#     as published by the Free Software Foundation; either version 2 of the
+#     License, or (at your option) any later version.
+#
+#     The LADR Deduction Library is distributed in the hope that it will be
+#     useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+#     MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#     GNU General Public License for more details.
+#
+#     You should have received a copy of the GNU General Public License
+#     along with the LADR Deduction Library; if not, write to the Free Software
+#     Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+
+# system imports
+
+import os
+import time
+import heapq
+import errno
+import select
+import threading
+import traceback
+import Queue
+
+try:
+    import fcntl  # Unix only
+except ImportError:
+    fcntl = None
+
+# local imports
+
+from platforms import *
+
+# One thread watches all of the LADR processes: a poll() loop over
+# every stdout, stderr and stdin pipe, which reaps each process (wait4,
+# without blocking) once its output pipes are closed, and which also
+# runs the timers (deadlines, stop grace periods).  The work to do after
+# a process exits (extraction, ...) goes to a small, fixed pool of
+# worker threads, so the number of threads does not grow with the
+# number of jobs.  Win32 has no poll() on pipes, so there each process
+# still gets its own threads (see spool.Piped_process).
+
+Chunk_size = 65536
+
+# Exit codes that the supervisor gives (see the exits of programs.py):
+# the process was reaped by someone else, so its status is lost; or its
+# output could not be kept (a spool error, a failing stream stage), so
+# it was killed.
+
+Exit_unknown = -100
+Exit_output_error = -101
+
+class Worker_pool:
+    "A fixed number of threads running the functions given to submit()."
+    def __init__(self, name, size):
+        self.name = name
+        self.size = size
+        self.queue = Queue.Queue()
+        self.threads = []
+        self.lock = threading.Lock()
+
+    def submit(self, func, *args):
+        with self.lock:
+            if not self.threads:
+                for i in range(self.size):
+                    t = threading.Thread(target=self.work,
+                                         name='%s %d' % (self.name, i))
+                    t.setDaemon(True)
+                    t.start()
+                    self.threads.append(t)
+        self.queue.put((func, args))
+
+    def work(self):
+        while True:
+            (func, args) = self.queue.get()
+            try:
+                func(*args)
+            except Exception:
+                traceback.print_exc()
+
+# end class Worker_pool
+
+# Completions may wait for extractions, never the other way around, so
+# the two pools cannot deadlock.
+
+completions = Worker_pool('completion', 4)
+extractions = Worker_pool('extraction', 2)
+
+class Timer_handle:
+    def __init__(self, when, func, args):
+        self.when = when
+        self.func = func
+        self.args = args
+        self.cancelled = False
+
+    def __lt__(self, other):
+        return self.when < other.when
+
+    def cancel(self):
+        self.cancelled = True
+
+# end class Timer_handle
+
+class Watched:
+    "The supervisor's record of one process."
+    def __init__(self, process, outputs, stdin_pipe, stdin_chunks):
+        self.process = process     # a spool.Piped_process
+        self.open_outputs = len(outputs)
+        self.stdin_pipe = stdin_pipe
+        self.stdin_chunks = stdin_chunks
+        self.stdin_buffer = ''
+        self.reap_delay = 0.01     # backoff while waiting for the exit
+        self.failed = False        # its output could not be kept
+
+# end class Watched
+
+class Supervisor:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.thread = None
+        self.poller = None
+        self.readers = {}   # fd -> (pipe, sink, watched)
+        self.writers = {}   # fd -> watched
+        self.reaping = []   # watched, outputs closed, not yet reaped
+        self.timers = []    # heap of Timer_handle
+        self.wakeup = None  # self-pipe, so other threads can wake poll()
+
+    def enabled(self):
+        return not Win32() and hasattr(select, 'poll') and fcntl != None
+
+    def start(self):
+        # with self.lock
+        if not self.thread:
+            self.poller = select.poll()
+            (r, w) = os.pipe()
+            set_nonblocking(r)
+            set_nonblocking(w)
+            self.wakeup = w
+            self.poller.register(r, select.POLLIN)
+            self.readers[r] = (None, None, None)
+            self.thread = threading.Thread(target=self.loop,
+                                           name='supervisor')
+            self.thread.setDaemon(True)
+            self.thread.start()
+
+    def wake(self):
+        try:
+            os.write(self.wakeup, 'x')
+        except OSError:
+            pass  # the pipe is full, so the loop will wake anyway
+
+    def add(self, process, outputs, stdin_pipe=None, stdin_chunks=None):
+        """
+        Watch a process: outputs is a list of (pipe, sink) pairs; if
+        stdin_pipe is given, stdin_chunks are written to it.  When the
+        outputs are closed and the process has exited, the supervisor
+        calls process.finished(exit_code, cpu) in its own thread.
+        """
+        w = Watched(process, outputs, stdin_pipe, stdin_chunks)
+        with self.lock:
+            self.start()
+            for (pipe, sink) in outputs:
+                set_nonblocking(pipe.fileno())
+                self.readers[pipe.fileno()] = (pipe, sink, w)
+                self.poller.register(pipe.fileno(),
+                                     select.POLLIN | select.POLLHUP)
+            if stdin_pipe:
+                set_nonblocking(stdin_pipe.fileno())
+                self.writers[stdin_pipe.fileno()] = w
+                self.poller.register(stdin_pipe.fileno(), select.POLLOUT)
+            if not outputs:
+                self.reaping.append(w)
+        self.wake()
+
+    def call_later(self, seconds, func, *args):
+        "Run func(*args) in the supervisor thread; returns a handle."
+        h = Timer_handle(time.time() + seconds, func, args)
+        with self.lock:
+            self.start()
+            heapq.heappush(self.timers, h)
+        self.wake()
+        return h
+
+    def timeout(self):
+        # with self.lock: milliseconds for poll(), or None
+        t = None
+        if self.reaping:
+            t = min([w.reap_delay for w in self.reaping])
+        if self.timers:
+            d = max(0, self.timers[0].when - time.time())
+            t = d if t is None else min(t, d)
+        return None if t is None else int(t * 1000) + 1
+
+    def loop(self):
+        while True:
+            with self.lock:
+                timeout = self.timeout()
+            try:
+                events = self.poller.poll(timeout)
+            except select.error as e:
+                if e.args[0] == errno.EINTR:
+                    continue
+                raise
+            for (fd, event) in events:
+                if fd in self.writers:
+                    self.write_stdin(fd, event)
+                elif fd in self.readers:
+                    self.read_output(fd)
+            self.reap()
+            self.run_timers()
+
+    def read_output(self, fd):
+        (pipe, sink, w) = self.readers[fd]
+        try:
+            data = os.read(fd, Chunk_size)
+        except OSError as e:
+            if e.errno in [errno.EAGAIN, errno.EINTR]:
+                return
+            data = ''
+        if pipe is None:
+            return  # the wakeup pipe; it has done its job
+        try:
+            if data:
+                sink.write(data)
+                return
+            # EOF
+            if hasattr(sink, 'eof'):
+                sink.eof()  # stream stages flush partial lines
+        except Exception:  # IOError (disk full), a stream stage
+            traceback.print_exc()
+            self.fail(w)
+            return
+        with self.lock:
+            self.poller.unregister(fd)
+            del self.readers[fd]
+            pipe.close()
+            w.open_outputs -= 1
+            if w.open_outputs == 0:
+                self.reaping.append(w)
+
+    def write_stdin(self, fd, event):
+        w = self.writers[fd]
+        try:
+            if event & (select.POLLERR | select.POLLHUP):
+                raise OSError(errno.EPIPE, 'closed')
+            while True:
+                if not w.stdin_buffer:
+                    w.stdin_buffer = next(w.stdin_chunks, None)
+                    if w.stdin_buffer is None:
+                        raise StopIteration
+                n = os.write(fd, w.stdin_buffer[:Chunk_size])
+                w.stdin_buffer = w.stdin_buffer[n:]
+        except OSError as e:
+            if e.errno == errno.EAGAIN:
+                return  # the pipe is full; wait for POLLOUT
+            self.close_stdin(fd)  # EPIPE: it exited without reading all
+        except StopIteration:
+            self.close_stdin(fd)
+
+    def fail(self, w):
+        "Stop serving a process whose output cannot be kept, and kill it."
+        w.failed = True
+        with self.lock:
+            for fd in [fd for fd in self.readers if self.readers[fd][2] is w]:
+                (pipe, sink, _) = self.readers.pop(fd)
+                self.poller.unregister(fd)
+                pipe.close()
+            w.open_outputs = 0
+            if w not in self.reaping:
+                self.reaping.append(w)
+            stdin = [fd for fd in self.writers if self.writers[fd] is w]
+        for fd in stdin:
+            self.close_stdin(fd)
+        w.process.kill()
+
+    def close_stdin(self, fd):
+        with self.lock:
+            w = self.writers.pop(fd)
+            self.poller.unregister(fd)
+        try:
+            w.stdin_pipe.close()
+        except IOError:
+            pass
+
+    def reap(self):
+        with self.lock:
+            reaping = list(self.reaping)
+        for w in reaping:
+            try:
+                (pid, status, usage) = os.wait4(w.process.pid, os.WNOHANG)
+            except OSError as e:
+                if e.errno == errno.EINTR:
+                    continue
+                (pid, status, usage) = (w.process.pid, None, None)  # ECHILD
+            if pid == 0:
+                w.reap_delay = min(1.0, w.reap_delay * 2)
+                continue
+            with self.lock:
+                self.reaping.remove(w)
+            if status is None:
+                # (Popen.poll() would say 0 after ECHILD.)
+                w.process.process.returncode = Exit_unknown
+                (exit_code, cpu) = (Exit_unknown, None)
+            else:
+                w.process.process._handle_exitstatus(status)
+                exit_code = w.process.process.returncode
+                cpu = usage.ru_utime + usage.ru_stime
+            if w.failed:
+                exit_code = Exit_output_error
+            w.process.finished(exit_code, cpu)
+
+    def run_timers(self):
+        now = time.time()
+        due = []
+        with self.lock:
+            while self.timers and self.timers[0].when <= now:
+                due.append(heapq.heappop(self.timers))
+        for h in due:
+            if not h.cancelled:
+                try:
+                    h.func(*h.args)
+                except Exception:
+                    traceback.print_exc()
+
+# end class Supervisor
+
+def set_nonblocking(fd):
+    flags = fcntl.fcntl(fd, fcntl.F_GETFL)
+    fcntl.fcntl(fd, fcntl.F_SETFL, flags | os.O_NONBLOCK)
+
+supervisor = Supervisor()
+
+class Thread_timer:
+    "call_later for Win32: a threading.Timer with the same cancel()."
+    def __init__(self, seconds, func, args):
+        self.timer = threading.Timer(seconds, func, args)
+        self.timer.setDaemon(True)
+        self.timer.start()
+
+    def cancel(self):
+        self.timer.cancel()
+
+def call_later(seconds, func, *args):
+    "Run func(*args) after the given time (in some other thread)."
+    if supervisor.enabled():
+        return supervisor.call_later(seconds, func, *args)
+    else:
+        return Thread_timer(seconds, func, args)
@@ -0,0 +1,218 @@
+#     Copyright (C) 2007 William McCune
+#
+#     This file is part of the LADR Deduction Library.
+#
+#     The LADR Deduction Library is free software; you can redistribute it
+#     and/or modify it under the terms of the GNU General Public License
+#     as published by the Free Software Foundation; either version 2 of the
+#     License, or (at your option) any later version.
+#
+#     The LADR Deduction Library is distributed in the hope that it will be
+#     useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+#     MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#     GNU General Public License for more details.
+#
+#     You should have received a copy of the GNU General Public License
+#     along with the LADR Deduction Library; if not, write to the Free Software
+#     Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+
+# system imports
+
+import random
+import itertools
+
+# local imports
+
+from batch import Batch, with_options, cpu_seconds
+
+# Parameter sweeps: a design (all combinations, or a Latin hypercube
+# sample) of values for some options, each point run as a job of a batch
+# with a deadline.  The option records and dependencies are those of the
+# option tables (options.P9_options, options.M4_options), passed in, so
+# that this module does not need wx.  The record indexes are the same as
+# in options.py.
+
+Flag, Parm, Stringparm = 0, 1, 2
+Type, Name, Default, Range = 4, 5, 7, 8
+
+Max_points = 1000  # a design larger than this is refused
+
+class Parameter:
+    "An option record and the values to sweep."
+    def __init__(self, opt, text):
+        self.opt = opt
+        self.name = opt[Name]
+        self.values = parse_values(opt, text)
+
+    def __repr__(self):
+        return '<Parameter %s %s>' % (self.name, self.values)
+
+# end class Parameter
+
+def parse_values(opt, text):
+    """The values given by text for an option, checked against its Range:
+    "a,b,c" or "lo:hi" or "lo:hi:step" for a parm, names for a
+    stringparm ("*" for all), anything for a flag (both values)."""
+    text = text.strip()
+    if opt[Type] == Flag:
+        return [False, True]
+    elif opt[Type] == Stringparm:
+        if text in ['', '*']:
+            return list(opt[Range])
+        values = [v.strip() for v in text.split(',') if v.strip()]
+        for v in values:
+            if v not in opt[Range]:
+                raise ValueError('%s: %s is not one of %s' %
+                                 (opt[Name], v, ', '.join(opt[Range])))
+        return values
+    else:
+        try:
+            if ':' in text:
+                parts = [int(x) for x in text.split(':')]
+                if len(parts) == 2:
+                    parts.append(1)
+                (lo, hi, step) = parts
+                if step <= 0 or hi < lo:
+                    raise ValueError
+                values = range(lo, hi + 1, step)
+            else:
+                values = [int(x) for x in text.split(',') if x.strip()]
+        except ValueError:
+            raise ValueError('%s: "%s" is not a list (a,b,c) or range '
+                             '(lo:hi or lo:hi:step) of integers' %
+                             (opt[Name], text))
+        if not values:
+            raise ValueError('%s: no values' % opt[Name])
+        (min, max) = opt[Range]
+        for v in values:
+            if v < min or v > max:
+                raise ValueError('%s: %d is outside the range [%d ... %d]' %
+                                 (opt[Name], v, min, max))
+        return values
+
+def cartesian(parameters):
+    "All combinations, as dicts name -> value."
+    names = [p.name for p in parameters]
+    return [dict(zip(names, values)) for values in
+            itertools.product(*[p.values for p in parameters])]
+
+def latin_hypercube(parameters, n, seed=None):
+    """n points, each parameter's values spread evenly over them: point i
+    takes a value from stratum perm[i] of each parameter.  Duplicate
+    points (few values) are dropped."""
+    rng = random.Random(seed)
+    columns = []
+    for p in parameters:
+        strata = range(n)
+        rng.shuffle(strata)
+        k = len(p.values)
+        columns.append([p.values[int((s + rng.random()) * k / n)]
+                        for s in strata])
+    points = []
+    for i in range(n):
+        point = dict([(p.name, col[i]) for (p, col) in zip(parameters,
+                                                           columns)])
+        if point not in points:
+            points.append(point)
+    return points
+
+def design(parameters, kind='cartesian', n=None, seed=None):
+    if kind == 'cartesian':
+        size = 1
+        for p in parameters:
+            size *= len(p.values)
+        if size > Max_points:
+            raise ValueError('%d combinations is too many (at most %d); '
+                             'use a Latin hypercube' % (size, Max_points))
+        return cartesian(parameters)
+    else:
+        if not n or n > Max_points:
+            raise ValueError('the number of samples must be 1 ... %d' %
+                             Max_points)
+        return latin_hypercube(parameters, n, seed)
+
+def dependent_values(point, dependencies):
+    """The point with the options that depend on its values (the option
+    dependencies, as in options.update_dependent), because the GUI's
+    input has set(ignore_option_dependencies).  A swept value is never
+    overridden by a dependency."""
+    values = dict(point)
+
+    def update(name):
+        v = values[name]
+        for ((n1, v1), (n2, v2)) in dependencies:
+            if n1 != name or n2 in point:
+                continue
+            if (v1 == v or v1 == 'any' or
+                (v1 == '>=0' and not isinstance(v, basestring) and v >= 0) or
+                (v1 == '>0' and not isinstance(v, basestring) and v > 0)):
+                if isinstance(v2, tuple):
+                    (op, x) = v2
+                    values[n2] = v * x if op == 'multiply' else v + x
+                else:
+                    values[n2] = v2
+                update(n2)
+
+    for name in sorted(point):
+        update(name)
+    return values
+
+class Result:
+    "The outcome of a point."
+    def __init__(self, index, point, status):
+        self.index = index
+        self.point = point
+        self.status = status
+        self.message = status['message']
+        self.solved = status['exit_code'] == 0
+        self.cpu = cpu_seconds(status)
+        stats = status['stats']
+        self.count = stats.get('Given', stats.get('Domain Size'))  # a string
+        times = status['times']
+        self.wall = (times['finished'] - times['started']
+                     if 'started' in times else None)
+
+# end class Result
+
+class Sweep:
+    """
+    Run a design: each point is the input with the point's options (and
+    their dependents), as a batch job with a deadline (wall seconds).
+    on_result(result) is called, in the batch's thread, as each is over.
+    """
+    def __init__(self, program_name, input, points, dependencies=(),
+                 deadline=None, on_result=None, client=None):
+        self.program_name = program_name
+        self.input = input
+        self.points = points
+        self.dependencies = dependencies
+        self.deadline = deadline
+        self.on_result = on_result
+        self.results = {}  # index -> Result
+        self.batch = Batch(client, self.job_done)
+
+    def start(self):
+        for (i, point) in enumerate(self.points):
+            values = dependent_values(point, self.dependencies)
+            self.batch.submit(i, self.program_name,
+                              with_options(self.input, values,
+                                           self.program_name),
+                              deadline=self.deadline)
+
+    def job_done(self, index, status):
+        result = Result(index, self.points[index], status)
+        self.results[index] = result
+        if self.on_result:
+            self.on_result(result)
+
+    def cancel(self):
+        self.batch.cancel()
+
+    def wait(self, timeout=None):
+        return self.batch.wait(timeout)
+
+    def close(self):
+        self.batch.close()
+
+# end class Sweep
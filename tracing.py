@@ -0,0 +1,144 @@
+#     Copyright (C) 2007 William McCune
+#
+#     This file is part of the LADR Deduction Library.
+#
+#     The LADR Deduction Library is free software; you can redistribute it
+#     and/or modify it under the terms of the GNU General Public License
+#     as published by the Free Software Foundation; either version 2 of the
+#     License, or (at your option) any later version.
+#
+#     The LADR Deduction Library is distributed in the hope that it will be
+#     useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+#     MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#     GNU General Public License for more details.
+#
+#     You should have received a copy of the GNU General Public License
+#     along with the LADR Deduction Library; if not, write to the Free Software
+#     Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+
+# system imports
+
+import os
+import time
+import json
+import thread
+import threading
+import collections
+
+# If this environment variable is set, the trace is written to that
+# file (Chrome trace event format) when the program exits.
+
+Trace_env = 'PROVER9_MACE4_TRACE'
+
+if os.environ.get(Trace_env):
+    Trace_path = os.path.abspath(os.environ.get(Trace_env))  # before chdir
+else:
+    Trace_path = None
+
+class Span:
+    """
+    One timed stage of the pipeline.  Use as a context manager, or call
+    finish() explicitly for spans that end somewhere else.  Extra
+    information (byte counts, exit codes, ...) goes in self.args.
+    """
+    def __init__(self, tracer, name, cat, args):
+        self.tracer = tracer
+        self.name = name
+        self.cat = cat
+        self.args = args
+        self.pid = os.getpid()
+        self.tid = thread.get_ident()
+        self.start = time.time()
+        self.end = None
+
+    def finish(self, **args):
+        if self.end is None:
+            self.end = time.time()
+            self.args.update(args)
+            self.tracer.record(self)
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, type, value, tb):
+        if type:
+            self.args['error'] = type.__name__
+        self.finish()
+        return False
+
+# end class Span
+
+class Tracer:
+    """
+    Keeps the most recent spans (bounded, so that tracing can stay on)
+    and exports them as Chrome trace events (chrome://tracing, Perfetto).
+    """
+    def __init__(self, max_spans=100000):
+        self.spans = collections.deque(maxlen=max_spans)
+        self.thread_names = {}
+        self.lock = threading.Lock()
+        self.origin = time.time()
+
+    def span(self, name, cat='gui', **args):
+        return Span(self, name, cat, args)
+
+    def record(self, span):
+        with self.lock:
+            self.spans.append(span)
+            if span.tid not in self.thread_names:
+                self.thread_names[span.tid] = threading.currentThread().getName()
+
+    def clear(self):
+        with self.lock:
+            self.spans.clear()
+
+    def chrome_events(self):
+        with self.lock:
+            spans = list(self.spans)
+            names = self.thread_names.copy()
+        events = []
+        for (tid, name) in names.items():
+            events.append({'name': 'thread_name', 'ph': 'M',
+                           'pid': os.getpid(), 'tid': tid,
+                           'args': {'name': name}})
+        for s in spans:
+            events.append({'name': s.name, 'cat': s.cat, 'ph': 'X',
+                           'ts': int((s.start - self.origin) * 1e6),
+                           'dur': int((s.end - s.start) * 1e6),
+                           'pid': s.pid, 'tid': s.tid, 'args': s.args})
+        return events
+
+    def export(self, path):
+        f = open(path, 'w')
+        json.dump({'traceEvents': self.chrome_events(),
+                   'displayTimeUnit': 'ms'}, f)
+        f.close()
+        return len(self.spans)
+
+# end class Tracer
+
+tracer = Tracer()
+
+def span(name, cat='gui', **args):
+    return tracer.span(name, cat, **args)
+
+def traced(name, cat='gui'):
+    "Decorator: record each call of the function as a span."
+    def wrap(func):
+        def wrapper(*args, **kwargs):
+            with tracer.span(name, cat):
+                return func(*args, **kwargs)
+        wrapper.__name__ = func.__name__
+        wrapper.__doc__ = func.__doc__
+        return wrapper
+    return wrap
+
+def export_from_environment():
+    "Call at exit: write the trace if the environment asks for it."
+    if Trace_path:
+        try:
+            tracer.export(Trace_path)
+        except IOError:
+            pass
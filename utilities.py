@@ -19,6 +19,16 @@
 
 import re
 
+class State:
+    """
+    For various processes and threads.
+    """
+    ready     = 0
+    running   = 1
+    suspended = 2
+    done      = 3
+    error     = 4
+
 def grep(pattern, lines):
     result = []
     for line in lines:
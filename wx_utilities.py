@@ -26,16 +26,7 @@ import wx
 # local imports
 
 from platforms import *
-
-class State:
-    """
-    For various processes and threads.
-    """
-    ready     = 0
-    running   = 1
-    suspended = 2
-    done      = 3
-    error     = 4
+from utilities import State
 
 def to_top(w):
     while w.GetParent():
@@ -119,7 +110,7 @@ class Text_frame(wx.Frame):
     def __init__(self, parent, font, title, text,
                  extension=None, saveas=True,
                  off_center=0, saved_flag=None,
-                 extra_operations=[]):
+                 extra_operations=[], save_source=None):
         
         size = size_that_fits((900,650))     # reduce if screen too small
         (x,y) = pos_for_center(size)         # position to center frame
@@ -130,6 +121,7 @@ class Text_frame(wx.Frame):
         self.extension = extension
         self.saved_flag = saved_flag
         self.text = text
+        self.save_source = save_source  # if the text shown is partial
 
         if saveas:
             saveas_btn = wx.Button(self, -1, 'Save as...')
@@ -166,9 +158,15 @@ class Text_frame(wx.Frame):
         self.SetSizer(sizer)
 
     def append(self, text):
+        self.text += text
         self.txt.AppendText(text)
         self.txt.ShowPosition(self.txt.GetLastPosition())
 
+    def replace(self, text):
+        self.text = text
+        self.txt.SetValue(text)
+        self.txt.ShowPosition(self.txt.GetLastPosition())
+
     def on_saveas(self, evt):
         (dir,style) = saveas_dir_style(to_top(self).current_path)
 
@@ -185,7 +183,10 @@ class Text_frame(wx.Frame):
             path = dlg.GetPath()      # full path
             try:
                 f = open(path, 'w')
-                f.write(self.txt.GetValue())
+                if self.save_source:
+                    self.save_source.write_to(f)
+                else:
+                    f.write(self.txt.GetValue())
                 # Do not update to_top(self).current_path
                 if self.saved_flag:
                     self.saved_flag[0] = True